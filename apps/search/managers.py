@@ -5,8 +5,8 @@ from sqlalchemy import and_, func
 
 from apps.data_tag.models import DataTag
 from apps.share.models import DataShared
-from apps.storage.models import DataInfo
-from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.storage.models import DataClosure, DataInfo
+from apps.storage.utils.queries.data_db_query import DataDBQuery, root_is
 from apps.tag.models import Tag
 from apps.user.models import User
 from apps.user.utils.managers import UserCRUDManager
@@ -62,6 +62,7 @@ class DataSearchManager(FrontendManager):
         if (not root) and (root_id is None):
             # root, root_id 둘 중에 하나 있어야 한다.
             raise ValueError()
+        dir_id = None   # 탐색 위치의 디렉토리 아이디, 최상위는 None
         if root_id is not None:
             # root_id가 주어져 있는 경우
             if root_id == 0:
@@ -72,15 +73,18 @@ class DataSearchManager(FrontendManager):
                     # 데이터 없음 or 디렉토리가 아님
                     return []
                 root = f'{root_info.root}{root_info.name}/'
+                dir_id = root_info.id
         else:
             # Root가 주어져 있는 경우
             if root != '/':
                 # Root Checking
                 splited = root[:-1].split('/')
                 root_query = ['/'.join(splited[:-1]) + '/', splited[-1]]
-                data_value = DataDBQuery().read(full_root=root_query, is_dir=True)
+                data_value = DataDBQuery().read(
+                    user_id=user_value.id, full_root=root_query, is_dir=True)
                 if not data_value:
                     return []
+                dir_id = data_value.id
         # 검색 시작
         shared_len = SERVER['data-shared-length']
         session = DatabaseGenerator.get_session()
@@ -88,9 +92,15 @@ class DataSearchManager(FrontendManager):
         query = query.outerjoin(DataShared)
         # 해당 사용자의 데이터만
         query = query.filter(DataInfo.user_id == user_value.id)
-        # Recursive 여부
-        query = query.filter(DataInfo.root == root) if not recursive \
-            else query.filter(DataInfo.root.startswith(root))        
+        # Recursive 여부, 하위 전체는 closure 조인으로 찾는다.
+        if not recursive:
+            query = query.filter(root_is(root))
+        elif dir_id is not None:
+            query = query.join(DataClosure, and_(
+                DataClosure.descendant_id == DataInfo.id,
+                DataClosure.ancestor_id == dir_id,
+                DataClosure.depth > 0,
+            ))
         if favorite:
             # 즐겨찾기 여부
             query = query.filter(DataInfo.is_favorite == True)
@@ -117,12 +127,15 @@ class DataSearchManager(FrontendManager):
             query = query.order_by(
                 DataInfo.is_dir.desc(), 
                 DataInfo.created.desc(), 
-                DataInfo.name.asc()
+                DataInfo.name.asc(),
+                DataInfo.root.asc()
             )
         elif sort_name:
+            # 이름이 같으면 상위 디렉토리 순 (조인 순서에 따라 달라지지 않도록)
             query = query.order_by(
                 DataInfo.is_dir.desc(), 
-                DataInfo.name.asc()
+                DataInfo.name.asc(),
+                DataInfo.root.asc()
             )
         elif sort_create:
             query = query.order_by(
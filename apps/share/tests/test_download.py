@@ -127,6 +127,30 @@ def test_shared_file(api: TestClient):
     assert res.status_code == status.HTTP_200_OK
     assert res.headers.get('content-type') == 'text/plain; charset=utf-8'
 
+def test_shared_file_range(api: TestClient):
+    res = api.get(
+        f'/api/datas/shares/{treedir["mydir"]["hi.txt"]["shared_id"]}/download',
+        headers={'range': 'bytes=6-'})
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert res.headers.get('content-range') == 'bytes 6-11/12'
+    assert res.content == b'world!'
+
+def test_shared_conditional(api: TestClient):
+    url = f'/api/datas/shares/{treedir["mydir"]["hi.txt"]["shared_id"]}'
+    for path in ('/download', '/info'):
+        res = api.get(f'{url}{path}')
+        assert res.status_code == status.HTTP_200_OK
+        etag = res.headers['etag']
+        res = api.get(f'{url}{path}', headers={'if-none-match': etag})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+        assert res.content == b''
+        res = api.get(f'{url}{path}',
+            headers={'if-modified-since': res.headers['last-modified']})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    res = api.get(f'{url}/info', headers={'if-none-match': '"other"'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json() == {'root': '/mydir/', 'name': 'hi.txt', 'is_dir': False}
+
 def test_shared_directory(api: TestClient):
     res = api.get(f'/api/datas/shares/{treedir["mydir"]["shared_id"]}/download')
     assert res.status_code == status.HTTP_200_OK
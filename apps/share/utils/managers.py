@@ -1,4 +1,5 @@
 from datetime import timedelta, datetime
+from typing import Mapping, Optional
 from apps.auth.utils.managers import AppAuthManager
 
 from apps.share.models import DataShared
@@ -9,7 +10,13 @@ from apps.storage.utils.queries.data_db_query import DataDBQuery
 from apps.user.models import User
 from apps.user.utils.queries.user_db_query import UserDBQuery
 from architecture.manager.base_manager import FrontendManager
-from core.exc import DataIsAlreadyShared, DataIsNotShared, DataNotFound
+from core.exc import (
+    DataIsAlreadyShared,
+    DataIsNotShared,
+    DataNotFound,
+    DataNotModified,
+)
+from core.responses import is_not_modified, make_etag, validator_headers
 from core.token_generators import LoginTokenGenerator, decode_token
 from core.permissions import (
     PermissionAdminChecker as AdminOnly,
@@ -127,7 +134,8 @@ class DataSharedManager(FrontendManager):
         else:
             return shared.id
 
-    def get_info_of_shared_data(sef, shared_id: int):
+    def get_info_of_shared_data(
+        sef, shared_id: int, conditions: Optional[Mapping[str, str]] = None):
         # Shared 정보 갖고오기
         shared: DataShared = DataSharedQuery().read(shared_id=shared_id)
         # 공유 여부 체크
@@ -140,14 +148,28 @@ class DataSharedManager(FrontendManager):
         data_info = DataDBQuery().read(data_id=shared.datainfo_id)
         if not data_info:
             raise DataNotFound()
+        # ETag, Last-Modified (DB 정보로만 구한다)
+        updated = data_info.updated or data_info.created
+        last_modified = updated.timestamp() if updated else None
+        etag = make_etag(
+            shared.id, data_info.id, data_info.root, data_info.name,
+            data_info.is_dir, updated)
+        headers = validator_headers(etag, last_modified)
+        if conditions is not None and is_not_modified(conditions, etag, last_modified):
+            raise DataNotModified(headers)
         # Return
         return {
             'root': data_info.root,
             'name': data_info.name,
             'is_dir': data_info.is_dir,
-        }
+        }, headers
 
-    def download_shared_data(self, shared_id: int):
+    def download_shared_data(
+        self,
+        shared_id: int,
+        archive: str = 'zip',
+        conditions: Optional[Mapping[str, str]] = None,
+    ):
         shared: DataShared = DataSharedQuery().read(shared_id=shared_id)
         # 공유 여부 체크
         if not shared or not shared.is_active:
@@ -167,7 +189,9 @@ class DataSharedManager(FrontendManager):
         """
         admin_token = AppAuthManager() \
             .login(admin_user.email, admin_user.passwd, hashing=False)
-        # 실제 다운로드 루트 구하기
+        # 실제 다운로드 루트 구하기 (디렉토리는 Zip 스트림)
         download_root = \
-            DataManager().read(admin_token, data_info.user_id, shared.datainfo_id, 'download')
-        return download_root['file'], data_info.is_dir
\ No newline at end of file
+            DataManager().read(
+                admin_token, data_info.user_id, shared.datainfo_id,
+                'download', archive, conditions)
+        return download_root['file'], data_info.is_dir, download_root['headers']
\ No newline at end of file
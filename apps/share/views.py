@@ -1,9 +1,18 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request, status, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from apps.share.utils.managers import DataSharedManager
-from core.exc import DataIsAlreadyShared, DataIsNotShared, DataNotFound, UserNotFound
-from core.background_tasks import background_remove_file
+from apps.storage.utils.archives import ARCHIVE_MEDIA_TYPES, archive_formats
+from apps.storage.utils.chunk_store import open_data
+from core.exc import (
+    DataIsAlreadyShared,
+    DataIsNotShared,
+    DataNotFound,
+    DataNotModified,
+    UserNotFound,
+)
+from core.responses import RangeFileResponse
 
 data_shared_router = APIRouter(
     prefix='/api/users/{user_id}/datas/{data_id}/shares',
@@ -174,14 +183,20 @@ class DataSharedDataDownloadView:
     @data_shared_download_router.get(
         path='/download',
         status_code=status.HTTP_200_OK)
-    def download_shared_data(
-        request: Request, 
-        shared_id: int, 
-        background_tasks: BackgroundTasks
-    ):
+    def download_shared_data(request: Request, shared_id: int, archive: str = 'zip'):
+        if archive not in archive_formats():
+            # 지원하지 않는 압축 형식
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='지원하지 않는 압축 형식 입니다.')
         try:
-            download_root, is_dir = \
-                DataSharedManager().download_shared_data(shared_id)
+            download_root, is_dir, headers = \
+                DataSharedManager().download_shared_data(
+                    shared_id, archive, request.headers)
+        except DataNotModified as e:
+            # 바뀌지 않음 (If-None-Match, If-Modified-Since)
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=e.headers)
         except DataIsNotShared:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -193,11 +208,14 @@ class DataSharedDataDownloadView:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail='server error')
         else:
-            data = FileResponse(download_root)
             if is_dir:
-                # 디렉토리일 경우 임시파일을 지운다.
-                background_tasks.add_task(background_remove_file, download_root)
-            return data
+                # 디렉토리는 압축하면서 바로 보낸다
+                return StreamingResponse(
+                    download_root, media_type=ARCHIVE_MEDIA_TYPES[archive],
+                    headers=headers)
+            # 파일은 Range 요청을 지원한다
+            return RangeFileResponse(
+                download_root, request.headers, opener=open_data, headers=headers)
 
     @staticmethod
     @data_shared_download_router.get(
@@ -206,7 +224,12 @@ class DataSharedDataDownloadView:
     def get_info_of_shared(request: Request, shared_id: int):
         
         try:
-            data_info = DataSharedManager().get_info_of_shared_data(shared_id)
+            data_info, headers = DataSharedManager().get_info_of_shared_data(
+                shared_id, request.headers)
+        except DataNotModified as e:
+            # 바뀌지 않음 (If-None-Match, If-Modified-Since)
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=e.headers)
         except DataIsNotShared:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -220,4 +243,4 @@ class DataSharedDataDownloadView:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail='server error')
         else:
-            return data_info
\ No newline at end of file
+            return JSONResponse(jsonable_encoder(data_info), headers=headers)
\ No newline at end of file
@@ -1,7 +1,8 @@
 from sqlalchemy import (
     Boolean, Column, DateTime, ForeignKey, BigInteger,
-    Integer, String, Text, UniqueConstraint
+    Index, Integer, String, Text, UniqueConstraint
 )
+from datetime import datetime
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
 
@@ -11,20 +12,74 @@ Base = DatabaseGenerator.get_base()
 
 class DataInfo(Base):
     __tablename__ = 'datainfo'
-    """
-    TODO root key에 대한 해결 필요
     __table_args__ = (
-        UniqueConstraint('root', 'name', 'is_dir'),
+        # 같은 디렉토리에 같은 이름은 하나만 (root는 Text라서 parent_id로 대신한다.)
+        # 기존 DB는 마이그레이션(system/migrations.py)에서 추가한다.
+        UniqueConstraint('user_id', 'parent_id', 'name', name='uq_datainfo_user_parent_name'),
+        # 같은 내용의 파일 찾기 (업로드 전 체크섬 확인)
+        Index('ix_datainfo_user_sha256', 'user_id', 'sha256'),
+        # 디렉토리 목록, (root, name) 검색, 하위 데이터 범위 검색
+        Index('ix_datainfo_user_root_prefix', 'user_id', 'root_prefix', 'name'),
+        Index('ix_datainfo_parent', 'parent_id'),
+        # 즐겨찾기, 생성 순 검색
+        Index('ix_datainfo_user_favorite', 'user_id', 'is_favorite'),
+        Index('ix_datainfo_user_created', 'user_id', 'created'),
     )
-    """
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     root = Column(Text(65535), nullable=False)
+    # root의 앞부분 (ROOT_PREFIX_LENGTH자), Text에는 인덱스를 걸 수 없으므로 검색에 대신 사용한다.
+    root_prefix = Column(String(255), nullable=True)
+    # 상위 디렉토리 아이디, 최상위(/)에 있는 데이터는 0 (API의 data_id와 같다.)
+    parent_id = Column(Integer, nullable=True)
     name = Column(String(255), nullable=False)
     is_dir = Column(Boolean, nullable=False)
     created = Column(DateTime(timezone=True), server_default=func.now())
     is_favorite = Column(Boolean, nullable=True, default=False)
     size = Column(BigInteger, nullable=False, default=0)
+    # 마지막 수정 시각, 디렉토리 압축 캐시의 키에 쓰이므로 마이크로초까지 기록한다.
+    updated = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
+    # 파일 체크섬 (16진수), 업로드할 때 계산한다. 디렉토리와 계산 전인 파일은 None
+    sha256 = Column(String(64), nullable=True)
+    adler32 = Column(String(8), nullable=True)
+    # 디렉토리 집계 (파일은 0), 하위 데이터가 바뀌면 같은 트랜잭션에서 모든 상위 디렉토리에 반영한다.
+    # 바로 아래 데이터 수, 하위 전체의 파일 수와 파일 크기의 합 (byte)
+    # 이전 버전 DB에 추가된 경우 마이그레이션(rebuild_aggregates) 전까지는 NULL
+    child_count = Column(Integer, default=0)
+    file_count = Column(Integer, default=0)
+    total_size = Column(BigInteger, default=0)
 
     user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE', onupdate='CASCADE'))
     user = relationship('User', backref=backref('user', cascade='delete'))
+
+
+class DataClosure(Base):
+    """
+    디렉토리 계층의 closure table
+    데이터마다 자기 자신(depth 0)과 모든 상위 디렉토리와의 쌍을 가진다.
+    하위 데이터 전체, 상위 디렉토리 전체를 root 문자열 없이 조인 한번으로 찾는다.
+    """
+    __tablename__ = 'dataclosure'
+    __table_args__ = (
+        # 상위 디렉토리 목록
+        Index('ix_dataclosure_descendant', 'descendant_id', 'depth'),
+    )
+
+    ancestor_id = Column(
+        Integer, ForeignKey('datainfo.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(
+        Integer, ForeignKey('datainfo.id', ondelete='CASCADE'), primary_key=True)
+    # ancestor에서 descendant까지의 거리
+    depth = Column(Integer, nullable=False)
+
+
+class DataChunk(Base):
+    """
+    청크 저장소(STORAGE_BACKEND=chunks)에 저장된 청크의 참조 수
+    refs가 0이 되면 행과 청크 파일을 삭제한다.
+    """
+    __tablename__ = 'datachunk'
+
+    hash = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    refs = Column(BigInteger, nullable=False, default=0)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel, validator
 
 
@@ -13,7 +14,8 @@ class DataInfoBase(BaseModel):
 
     @validator('name')
     def validate_name(cls, name: str):
-        if not DataInfoBase._check_filename(name):
+        # 빈 이름은 상위 디렉토리 자체를 가리키게 되므로 허용하지 않는다.
+        if (not name) or (not DataInfoBase._check_filename(name)):
             raise ValueError('파일 또는 폴더 이름이 유효하지 않습니다.')
         return name
 
@@ -33,6 +35,8 @@ class DataInfoCreate(DataInfoBase):
     is_dir: bool
     user_id: int
     size: int
+    sha256: Optional[str] = None
+    adler32: Optional[str] = None
 
 class DataInfoUpdate(DataInfoBase):
     user_id: int
@@ -42,6 +46,17 @@ class DataInfoRead(DataInfoBase):
     is_dir: bool
     created: datetime
     id: int
+    sha256: Optional[str] = None
+    adler32: Optional[str] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class DataBatchFailed(BaseModel):
+    name: str
+    detail: str
+
+class DataBatchRead(BaseModel):
+    created: List[DataInfoRead]
+    failed: List[DataBatchFailed]
@@ -0,0 +1,149 @@
+import os
+import pytest
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from apps.storage.utils.archive_cache import ArchiveCache, archive_fingerprint
+from settings.base import SERVER
+
+
+@pytest.fixture
+def cache(tmp_path):
+    prev = SERVER['storage'], SERVER['archive-cache-size']
+    SERVER['storage'] = str(tmp_path)
+    SERVER['archive-cache-size'] = 1024
+    ArchiveCache._loaded_root = None
+    ArchiveCache._stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+    yield ArchiveCache
+    SERVER['storage'], SERVER['archive-cache-size'] = prev
+    ArchiveCache._loaded_root = None
+    ArchiveCache._entries, ArchiveCache._total = OrderedDict(), 0
+
+
+def counting_build(data: bytes, calls: list, gate: threading.Event = None):
+    def build():
+        calls.append(1)
+        for i in range(0, len(data), 10):
+            if gate:
+                gate.wait(5)
+            yield data[i:i + 10]
+    return build
+
+
+def test_fingerprint():
+    entry = SimpleNamespace(
+        id=1, root='/mydir/sub/', name='a.txt', is_dir=False, size=3, updated=None)
+    renamed = SimpleNamespace(**{**entry.__dict__, 'root': '/other/sub/'})
+    changed = SimpleNamespace(**{**entry.__dict__, 'size': 4})
+    key = archive_fingerprint([entry], '/mydir/', 'zip')
+    # 디렉토리 이름만 바뀐 경우 같은 키
+    assert archive_fingerprint([renamed], '/other/', 'zip') == key
+    assert archive_fingerprint([changed], '/mydir/', 'zip') != key
+    assert archive_fingerprint([entry], '/mydir/', 'tar') != key
+
+
+def test_hit_and_miss(cache):
+    calls = []
+    data = b'archive-data' * 10
+    assert b''.join(cache.open('k1', counting_build(data, calls))) == data
+    assert b''.join(cache.open('k1', counting_build(data, calls))) == data
+    assert len(calls) == 1
+
+    stats = cache.read_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['hit_ratio'] == 0.5
+    assert stats['bytes_saved'] == len(data)
+    assert stats['entries'] == 1 and stats['size'] == len(data)
+
+
+def test_single_flight(cache):
+    calls = []
+    data = bytes(range(200))
+    gate = threading.Event()
+    build = counting_build(data, calls, gate)
+    # 첫번째 요청이 만드는 동안 같은 키 요청이 들어온다
+    readers = [cache.open('k2', build) for _ in range(3)]
+    results = [None] * 3
+
+    def read(i):
+        results[i] = b''.join(readers[i])
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert results == [data] * 3
+    assert len(calls) == 1
+    assert cache.read_stats()['bytes_saved'] == 2 * len(data)
+
+
+def test_lru_eviction(cache):
+    SERVER['archive-cache-size'] = 250
+    for key in ('a', 'b', 'c'):
+        b''.join(cache.open(key, counting_build(b'x' * 100, [])))
+    # 'a'가 밀려남
+    assert list(cache._entries) == ['b', 'c']
+    # 'b'를 사용하면 다음엔 'c'가 밀려난다
+    b''.join(cache.open('b', counting_build(b'x' * 100, [])))
+    b''.join(cache.open('d', counting_build(b'x' * 100, [])))
+    assert list(cache._entries) == ['b', 'd']
+    assert cache.read_stats()['size'] == 200
+
+
+def test_not_stored(cache):
+    calls = []
+    # 만드는 동안 바뀐 경우
+    b''.join(cache.open('k3', counting_build(b'data', calls), lambda: False))
+    b''.join(cache.open('k3', counting_build(b'data', calls), lambda: False))
+    assert len(calls) == 2
+    # 용량보다 큰 경우
+    SERVER['archive-cache-size'] = 10
+    b''.join(cache.open('k4', counting_build(b'x' * 100, calls)))
+    assert 'k4' not in cache._entries
+
+
+def tmp_files(cache) -> list:
+    return [name for name in os.listdir(cache.root()) if name.startswith('.tmp-')]
+
+
+def test_overflow(cache):
+    calls = []
+    SERVER['archive-cache-size'] = 50
+    data = bytes(range(200))
+    gate = threading.Event()
+    reader = cache.open('k5', counting_build(data, calls, gate))
+    gate.set()
+    # 용량을 넘으면 압축을 멈추고, 읽던 요청은 직접 압축한 나머지를 받는다
+    assert b''.join(reader) == data
+    assert len(calls) == 2
+    assert 'k5' not in cache._entries
+    assert tmp_files(cache) == []
+
+
+def test_reader_disconnect(cache):
+    SERVER['archive-cache-size'] = 10 ** 9
+    closed = threading.Event()
+
+    def build():
+        try:
+            while True:
+                yield b'x' * 10
+        finally:
+            closed.set()
+
+    reader = cache.open('k6', build)
+    assert next(reader).startswith(b'x')
+    # 마지막으로 읽던 요청이 끊기면 압축도 멈춘다
+    reader.close()
+    assert closed.wait(5)
+    for _ in range(100):
+        if 'k6' not in cache._builds and not tmp_files(cache):
+            break
+        time.sleep(0.05)
+    assert 'k6' not in cache._builds
+    assert 'k6' not in cache._entries
+    assert tmp_files(cache) == []
@@ -0,0 +1,174 @@
+import io
+import os
+import pytest
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.storage.utils import archives
+from apps.storage.utils.archives import (
+    ZIP_DEFLATED,
+    ZIP_STORED,
+    TarStream,
+    ZipStream,
+    archive_stream,
+    choose_method,
+)
+
+
+def make_tree(root):
+    (root / 'a.txt').write_bytes(b'a' * 1000)
+    (root / '.cm-upload-1234').write_bytes(b'partial')
+    (root / 'empty').mkdir()
+    (root / 'sub').mkdir()
+    (root / 'sub' / '한글.txt').write_bytes(b'hello world!')
+
+
+def skip_temp(name):
+    return name.startswith('.cm-upload-')
+
+
+def test_zip_stream(tmp_path):
+    make_tree(tmp_path)
+    data = b''.join(ZipStream(str(tmp_path), skip=skip_temp))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        # skip 대상은 제외
+        assert archive.namelist() == ['a.txt', 'empty/', 'sub/', 'sub/한글.txt']
+        assert archive.read('a.txt') == b'a' * 1000
+        assert archive.read('sub/한글.txt') == b'hello world!'
+        assert archive.getinfo('empty/').is_dir()
+
+
+def test_zip_stream_zip64(tmp_path):
+    # 제한을 낮춰서 Zip64 경로를 확인
+    make_tree(tmp_path)
+    stream = ZipStream(str(tmp_path))
+    stream.zip64_limit = 16
+    data = b''.join(stream)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read('a.txt') == b'a' * 1000
+        assert archive.read('sub/한글.txt') == b'hello world!'
+
+
+def test_zip_stream_chunks(tmp_path):
+    # 큰 파일도 조각 단위로 나온다
+    (tmp_path / 'big.bin').write_bytes(bytes(range(256)) * 8192)
+    stream = ZipStream(str(tmp_path))
+    stream.chunk_size = 4096
+    chunks = list(stream)
+    assert len(chunks) > 1
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.read('big.bin') == bytes(range(256)) * 8192
+
+
+def test_zip_stream_parallel(tmp_path, monkeypatch):
+    text = b''.join(b'line %d of a compressible file\n' % i for i in range(50000))
+    (tmp_path / 'big.txt').write_bytes(text)
+    (tmp_path / 'random.dat').write_bytes(os.urandom(300 * 1024))
+    for i in range(20):
+        (tmp_path / f'small{i:02}.txt').write_bytes(b'small file %d ' % i * 100)
+
+    # 동시에 압축하는 블록 수 기록
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    deflate_block = archives._deflate_block
+
+    def tracking_deflate_block(*args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.002)
+        try:
+            return deflate_block(*args)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(archives, '_deflate_block', tracking_deflate_block)
+    # 코어 수와 관계없이 요청별 제한이 지켜지는 지 확인
+    monkeypatch.setattr(archives, '_executor', ThreadPoolExecutor(max_workers=8))
+    stream = ZipStream(str(tmp_path), workers=3)
+    stream.block_size = 64 * 1024
+    data = b''.join(stream)
+    assert 1 < peak[0] <= 3
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.read('big.txt') == text
+        assert archive.getinfo('big.txt').compress_size < len(text) // 4
+        assert archive.getinfo('random.dat').compress_type == ZIP_STORED
+        for i in range(20):
+            assert archive.read(f'small{i:02}.txt') == b'small file %d ' % i * 100
+
+    # 한 스레드에서 만든 결과와 내용이 같다
+    with zipfile.ZipFile(io.BytesIO(b''.join(ZipStream(str(tmp_path))))) as archive:
+        assert archive.read('big.txt') == text
+
+
+def test_zip_stream_empty(tmp_path):
+    data = b''.join(ZipStream(str(tmp_path)))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == []
+
+
+def test_choose_method():
+    text = b'hello world! ' * 1000
+    assert choose_method('a.txt', text, 6) == ZIP_DEFLATED
+    # 확장자
+    assert choose_method('photo.JPG', text, 6) == ZIP_STORED
+    # 시그니처
+    assert choose_method('image.bin', b'\x89PNG\r\n\x1a\n' + text, 6) == ZIP_STORED
+    assert choose_method('video', b'\x00\x00\x00\x18ftypmp42' + text, 6) == ZIP_STORED
+    # 압축해도 줄지 않는 데이터
+    assert choose_method('random.dat', os.urandom(100 * 1024), 6) == ZIP_STORED
+    # 압축 레벨 0
+    assert choose_method('a.txt', text, 0) == ZIP_STORED
+
+
+def test_zip_stream_methods(tmp_path):
+    (tmp_path / 'a.txt').write_bytes(b'hello world! ' * 1000)
+    (tmp_path / 'photo.jpg').write_bytes(os.urandom(1000))
+    (tmp_path / 'random.dat').write_bytes(os.urandom(100 * 1024))
+    data = b''.join(ZipStream(str(tmp_path)))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.getinfo('a.txt').compress_type == ZIP_DEFLATED
+        assert archive.getinfo('photo.jpg').compress_type == ZIP_STORED
+        assert archive.getinfo('random.dat').compress_type == ZIP_STORED
+        assert archive.read('random.dat') == (tmp_path / 'random.dat').read_bytes()
+
+
+def test_tar_stream(tmp_path):
+    make_tree(tmp_path)
+    stream = TarStream(str(tmp_path), skip=skip_temp)
+    stream.chunk_size = 64
+    data = b''.join(stream)
+    assert len(data) % tarfile.RECORDSIZE == 0
+
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:') as archive:
+        assert archive.getnames() == ['a.txt', 'empty', 'sub', 'sub/한글.txt']
+        assert archive.getmember('empty').isdir()
+        assert archive.extractfile('a.txt').read() == b'a' * 1000
+        assert archive.extractfile('sub/한글.txt').read() == b'hello world!'
+
+
+def test_tar_zst_stream(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    make_tree(tmp_path)
+    data = b''.join(archive_stream(str(tmp_path), 'tar.zst', skip=skip_temp))
+    raw = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    with tarfile.open(fileobj=io.BytesIO(raw), mode='r:') as archive:
+        assert archive.extractfile('sub/한글.txt').read() == b'hello world!'
+
+
+def test_archive_stream_unsupported(tmp_path):
+    with pytest.raises(ValueError):
+        archive_stream(str(tmp_path), 'rar')
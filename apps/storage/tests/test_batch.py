@@ -0,0 +1,161 @@
+import pytest
+import os
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from system.bootloader import Bootloader
+from apps.auth.utils.managers import AppAuthManager
+from apps.user.utils.managers import UserCRUDManager
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from settings.base import SERVER
+
+
+client_info, other_info = None, None
+mydir_id = None
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info, other_info, mydir_id
+    # Load Application
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    # Add Client
+    client_info = {
+        'email': 'seokbong60@gmail.com',
+        'name': 'jeonhyun',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    user = UserCRUDManager().create(**client_info)
+    client_info['id'] = user.id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+    # Add Other
+    other_info = {
+        'email': 'seokbong61@gmail.com',
+        'name': 'jeonhyun2',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    user = UserCRUDManager().create(**other_info)
+    other_info['id'] = user.id
+    other_info['token'] = AppAuthManager().login(
+        other_info['email'], other_info['passwd'])
+    # mydir
+    #   `-subdir
+    mydir_id = DataDirectoryCRUDManager().create(
+        root_id=0, user_id=client_info['id'], dirname='mydir').id
+    DataDirectoryCRUDManager().create(
+        root_id=mydir_id, user_id=client_info['id'], dirname='subdir')
+    # Return test api
+    yield TestClient(app)
+    # Remove all data
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def upload(api: TestClient, files, token=None, data_id=None):
+    return api.post(
+        f'/api/users/{client_info["id"]}/datas/{mydir_id if data_id is None else data_id}/batch',
+        headers={'token': token or client_info['token']},
+        files=[('files', f) for f in files],
+    )
+
+
+def test_no_token(api: TestClient):
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/{mydir_id}/batch',
+        files=[('files', ('a.txt', b'a'))],
+    )
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_other_access_failed(api: TestClient):
+    res = upload(api, [('a.txt', b'a')], token=other_info['token'])
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_no_exists_root(api: TestClient):
+    res = upload(api, [('a.txt', b'a')], data_id=99999999)
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_request_nothing(api: TestClient):
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/{mydir_id}/batch',
+        headers={'token': client_info['token']},
+        json={'dirname': 'abc'},
+    )
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_batch_upload(api: TestClient):
+    files = [(f'file{i}.txt', f'content {i}'.encode()) for i in range(20)]
+    res = upload(api, files)
+    assert res.status_code == status.HTTP_201_CREATED
+    output = res.json()
+    assert output['failed'] == []
+    assert [data['name'] for data in output['created']] == \
+        [name for name, _ in files]
+    for data, (name, content) in zip(output['created'], files):
+        assert data['root'] == '/mydir/'
+        assert data['size'] == len(content)
+        assert not data['is_dir']
+        with open(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/{name}', 'rb') as f:
+            assert f.read() == content
+    assert len(DataDBQuery().read_entries(client_info['id'], '/mydir/')) == 21
+
+
+def test_partial_failure(api: TestClient):
+    prev = DataDBQuery().read_entries(client_info['id'], '/mydir/')
+    prev_id = {data.name: data.id for data in prev}['file0.txt']
+    res = upload(api, [
+        ('file0.txt', b'overwritten'),  # 덮어쓰기
+        ('subdir', b'abc'),             # 같은 이름의 디렉토리
+        ('a:b.txt', b'abc'),            # 잘못된 이름
+        ('new.txt', b'new'),
+        ('new.txt', b'twice'),          # 같은 요청 안에 같은 이름
+    ])
+    assert res.status_code == status.HTTP_201_CREATED
+    output = res.json()
+    assert [data['name'] for data in output['created']] == ['new.txt', 'file0.txt']
+    assert output['created'][1]['id'] == prev_id
+    assert output['created'][1]['size'] == len(b'overwritten')
+    assert [data['name'] for data in output['failed']] == \
+        ['subdir', 'a:b.txt', 'new.txt']
+    root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir'
+    with open(f'{root}/new.txt', 'rb') as f:
+        assert f.read() == b'new'
+    with open(f'{root}/file0.txt', 'rb') as f:
+        assert f.read() == b'overwritten'
+    assert os.path.isdir(f'{root}/subdir')
+
+
+def test_broken_body(api: TestClient):
+    # 본문이 중간에 끊기면 저장했던 파일도 전부 삭제된다.
+    boundary = 'cloudmodularboundary'
+    body = (
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="files"; filename="ok.txt"\r\n\r\n'
+        'ok\r\n'
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="files"; filename="broken.txt"\r\n\r\n'
+        'broken'
+    ).encode()
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/{mydir_id}/batch',
+        headers={
+            'token': client_info['token'],
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+        },
+        data=body,
+    )
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir'
+    assert not os.path.exists(f'{root}/ok.txt')
+    assert not os.path.exists(f'{root}/broken.txt')
+    names = {data.name for data in DataDBQuery().read_entries(client_info['id'], '/mydir/')}
+    assert 'ok.txt' not in names
@@ -0,0 +1,99 @@
+import pytest
+import hashlib
+import os
+import zlib
+from fastapi import UploadFile
+
+from main import app
+from apps.storage.models import DataInfo
+from apps.storage.utils.checksums import (
+    ContentHasher,
+    backfill_checksums,
+    digest_header,
+    hash_file,
+)
+from apps.storage.utils.managers import DataFileCRUDManager
+from apps.user.utils.managers import UserCRUDManager
+from settings.base import SERVER
+from system.bootloader import Bootloader
+from system.connection.generators import DatabaseGenerator
+
+
+@pytest.fixture(scope='module')
+def user_id():
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    user = UserCRUDManager().create(
+        email='checksum@gmail.com', name='checksum',
+        passwd='password0123', storage_size=1)
+    yield user.id
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def test_hasher(tmp_path):
+    content = os.urandom(300 * 1024)
+    hasher = ContentHasher(fast=True)
+    for i in range(0, len(content), 7000):
+        hasher.update(content[i:i + 7000])
+    assert hasher.length == len(content)
+    assert hasher.sha256 == hashlib.sha256(content).hexdigest()
+    assert hasher.adler32 == f'{zlib.adler32(content):08x}'
+    assert ContentHasher(fast=False).adler32 is None
+
+    # 앞부분을 계산한 hasher에 이어서 계산
+    path = tmp_path / 'data.bin'
+    path.write_bytes(content)
+    hasher = ContentHasher(fast=True)
+    hasher.update(content[:1000])
+    hash_file(str(path), hasher=hasher, offset=1000, chunk_size=4096)
+    assert hasher.sha256 == hashlib.sha256(content).hexdigest()
+    assert hasher.adler32 == f'{zlib.adler32(content):08x}'
+
+
+def test_digest_header():
+    sha256 = hashlib.sha256(b'abc').hexdigest()
+    assert digest_header(None) is None
+    assert digest_header(sha256) == 'sha-256=ungWv48Bz+pBQUDeXa4iI7ADYaOWF3qctBD/YfIAFa0='
+    assert digest_header(sha256, '024d0127') == \
+        'sha-256=ungWv48Bz+pBQUDeXa4iI7ADYaOWF3qctBD/YfIAFa0=, adler32=024d0127'
+
+
+def test_backfill(user_id, tmp_path):
+    ids = []
+    for name, content in (('a.txt', b'aaa'), ('b.txt', b'bbbb'), ('c.txt', b'c')):
+        path = tmp_path / name
+        path.write_bytes(content)
+        with open(path, 'rb') as f:
+            ids.append(DataFileCRUDManager().create(
+                root_id=0, user_id=user_id,
+                file=UploadFile(filename=name, file=f)).id)
+
+    # 체크섬 도입 전에 올라간 파일
+    session = DatabaseGenerator.get_session()
+    try:
+        session.query(DataInfo).filter(DataInfo.id.in_(ids)) \
+            .update({DataInfo.sha256: None}, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+    # DB와 크기가 다른 파일은 건너뛴다.
+    with open(f'{SERVER["storage"]}/storage/{user_id}/root/c.txt', 'wb') as f:
+        f.write(b'cc')
+
+    assert backfill_checksums(workers=2, batch_size=2) == (2, 1)
+    session = DatabaseGenerator.get_session()
+    try:
+        rows = {
+            data.name: data.sha256 for data in
+            session.query(DataInfo).filter(DataInfo.id.in_(ids)).all()
+        }
+    finally:
+        session.close()
+    assert rows == {
+        'a.txt': hashlib.sha256(b'aaa').hexdigest(),
+        'b.txt': hashlib.sha256(b'bbbb').hexdigest(),
+        'c.txt': None,
+    }
+    # 다시 실행하면 남은 파일만 확인한다.
+    assert backfill_checksums() == (0, 1)
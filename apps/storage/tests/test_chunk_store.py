@@ -0,0 +1,250 @@
+import pytest
+import hashlib
+import io
+import os
+import random
+import zipfile
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from apps.auth.utils.managers import AppAuthManager
+from apps.storage.utils.chunk_store import (
+    Chunker,
+    ChunkStore,
+    ChunkWriter,
+    data_size,
+    decode_manifest,
+    encode_manifest,
+    open_data,
+    remove_data,
+    replace_data,
+)
+from apps.storage.utils.checksums import digest_header
+from apps.storage.utils.delta import make_delta
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.user.utils.managers import UserCRUDManager
+from settings.base import JWT, SERVER
+from system.bootloader import Bootloader
+
+
+client_info = None
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    backend, avg_size = SERVER['storage-backend'], SERVER['chunk-avg-size']
+    SERVER['storage-backend'], SERVER['chunk-avg-size'] = 'chunks', 16 * 1024
+    client_info = {
+        'email': 'chunks@gmail.com',
+        'name': 'chunks',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    user = UserCRUDManager().create(**client_info)
+    client_info['id'] = user.id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+    yield TestClient(app)
+    SERVER['storage-backend'], SERVER['chunk-avg-size'] = backend, avg_size
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def chunk_files():
+    # 청크 파일 (manifest.key 제외)
+    return sorted(
+        name for _, _, filenames in os.walk(ChunkStore.root())
+        for name in filenames if name != 'manifest.key')
+
+
+def split(chunker: Chunker, content: bytes, piece: int):
+    chunks = []
+    for i in range(0, len(content), piece):
+        chunks += chunker.feed(content[i:i + piece])
+    return chunks + chunker.finish()
+
+
+def test_chunker_boundaries():
+    content = random.Random(0).randbytes(1024 * 1024)
+    chunks = split(Chunker(16 * 1024), content, 100 * 1000)
+    assert b''.join(chunks) == content
+    assert all(4 * 1024 <= len(chunk) <= 64 * 1024 for chunk in chunks[:-1])
+    # 넣는 단위와 상관없이 같은 경계
+    assert split(Chunker(16 * 1024), content, 7777) == chunks
+
+    # 앞에 데이터가 끼어들어도 뒤쪽 청크는 그대로
+    edited = split(Chunker(16 * 1024), b'inserted' + content, 100 * 1000)
+    shared = set(chunks) & set(edited)
+    assert len(shared) >= len(chunks) - 2
+
+
+def test_manifest():
+    entries = [(hashlib.sha256(b'a').digest(), 1), (hashlib.sha256(b'bc').digest(), 2)]
+    manifest = encode_manifest(entries)
+    assert decode_manifest(manifest) == entries
+    assert decode_manifest(encode_manifest([])) == []
+    # 서명이 맞지 않거나 형식이 다르면 일반 파일
+    forged = bytearray(manifest)
+    forged[-1] ^= 1
+    assert decode_manifest(bytes(forged)) is None
+    assert decode_manifest(manifest[:-1]) is None
+    assert decode_manifest(b'hello world!') is None
+
+
+def test_manifest_key():
+    manifest = encode_manifest([(hashlib.sha256(b'a').digest(), 1)])
+    path = f'{ChunkStore.root()}/manifest.key'
+    with open(path, 'rb') as f:
+        key = f.read()
+    # 인증 키와 무관하게 저장소 키로 서명한다
+    prev = JWT['key']
+    JWT['key'] = 'changed'
+    try:
+        assert decode_manifest(manifest) is not None
+    finally:
+        JWT['key'] = prev
+    # 저장소 키가 바뀌면 기존 매니페스트는 읽을 수 없다
+    os.remove(path)
+    assert decode_manifest(manifest) is None
+    with open(path, 'wb') as f:
+        f.write(key)
+    assert decode_manifest(manifest) is not None
+
+
+def test_dedup_and_refs(api, tmp_path):
+    content = random.Random(1).randbytes(200 * 1024)
+    roots = []
+    for name in ('a.bin', 'b.bin'):
+        root, tmp_root = str(tmp_path / name), str(tmp_path / f'{name}.tmp')
+        writer = ChunkWriter()
+        try:
+            writer.write(content)
+            with open(tmp_root, 'wb') as f:
+                f.write(writer.finish())
+            replace_data(tmp_root, root)
+            writer.commit()
+        finally:
+            writer.close()
+        roots.append(root)
+    stored = chunk_files()
+    # 같은 내용은 한번만 저장
+    assert sum(os.path.getsize(ChunkStore.path(h)) for h in stored) == len(content)
+    assert ChunkStore.read_stats()['logical'] == 2 * len(content)
+    for root in roots:
+        assert data_size(root) == len(content)
+        with open_data(root) as f:
+            assert f.read() == content
+            assert f.pread(10, 100 * 1024 - 5) == content[100 * 1024 - 5:100 * 1024 + 5]
+
+    # 읽는 중에 삭제되어도 끝까지 읽을 수 있다
+    f = open_data(roots[0])
+    remove_data(roots[0])
+    remove_data(roots[1])
+    assert chunk_files() == stored
+    assert f.read() == content
+    f.close()
+    assert chunk_files() == []
+    assert ChunkStore.read_stats()['chunks'] == 0
+
+    # commit 하지 않으면 참조 수와 청크를 되돌린다
+    writer = ChunkWriter()
+    writer.write(content)
+    writer.finish()
+    writer.close()
+    assert chunk_files() == []
+    assert ChunkStore.read_stats()['chunks'] == 0
+
+
+def test_upload_download(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    dir_id = DataDirectoryCRUDManager().create(
+        root_id=0, user_id=user_id, dirname='datasets').id
+    url = f'/api/users/{user_id}/datas/{dir_id}'
+    content = random.Random(2).randbytes(300 * 1024)
+    edited = content[:150 * 1024] + b'edited' + content[150 * 1024:]
+
+    ids = []
+    for name, data in (('a.bin', content), ('b.bin', content), ('c.bin', edited)):
+        res = api.put(
+            f'{url}/content', params={'name': name}, headers={'token': token}, data=data)
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json()['size'] == len(data)
+        ids.append(res.json()['id'])
+    stats = ChunkStore.read_stats()
+    assert stats['logical'] == 2 * len(content) + len(edited)
+    # 편집된 파일도 대부분의 청크를 공유한다
+    assert stats['stored'] < len(content) * 1.5
+    # 사용자 용량은 원래 크기 기준
+    res = api.get(f'/api/users/{user_id}/usage', headers={'token': token})
+    assert res.json()['used'] == 2 * len(content) + len(edited)
+
+    data_url = f'/api/users/{user_id}/datas/{ids[2]}'
+    res = api.get(data_url, params={'method': 'download'}, headers={'token': token})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.content == edited
+    assert int(res.headers['content-length']) == len(edited)
+    assert res.headers['digest'] == digest_header(hashlib.sha256(edited).hexdigest())
+    res = api.get(data_url, params={'method': 'download'}, headers={
+        'token': token, 'range': f'bytes={150 * 1024 - 2}-{150 * 1024 + 7}'})
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert res.content == edited[150 * 1024 - 2:150 * 1024 + 8]
+    res = api.get(data_url, params={'method': 'info'}, headers={'token': token})
+    assert res.json()['size'] == len(edited)
+
+    res = api.get(url, params={'method': 'download'}, headers={'token': token})
+    with zipfile.ZipFile(io.BytesIO(res.content)) as archive:
+        assert archive.testzip() is None
+        assert archive.read('a.bin') == content
+        assert archive.read('c.bin') == edited
+
+    # 같은 내용으로 생성하면 매니페스트를 새로 만들고 참조 수만 올린다
+    stored = ChunkStore.read_stats()['stored']
+    res = api.post(f'{url}/content/by-hash', headers={'token': token}, json={
+        'name': 'd.bin', 'size': len(edited), 'sha256': hashlib.sha256(edited).hexdigest()})
+    assert res.status_code == status.HTTP_201_CREATED
+    stats = ChunkStore.read_stats()
+    assert stats['stored'] == stored
+    assert stats['logical'] == 2 * len(content) + 2 * len(edited)
+    res = api.get(
+        f'/api/users/{user_id}/datas/{res.json()["id"]}',
+        params={'method': 'download'}, headers={'token': token})
+    assert res.content == edited
+
+    # 복사도 청크 참조 수만 올린다
+    res = api.post(f'{data_url}/copy', headers={'token': token}, json={
+        'target': dir_id, 'name': 'e.bin'})
+    assert res.status_code == status.HTTP_201_CREATED
+    stats = ChunkStore.read_stats()
+    assert stats['stored'] == stored
+    assert stats['logical'] == 2 * len(content) + 3 * len(edited)
+    res = api.get(
+        f'/api/users/{user_id}/datas/{res.json()["id"]}',
+        params={'method': 'download'}, headers={'token': token})
+    assert res.content == edited
+
+    # 차분 업로드는 청크로 저장된 기존 파일에서 구간을 읽는다
+    res = api.get(f'{data_url}/signature', headers={'token': token})
+    newer = edited[:1000] + b'delta' + edited[1000:]
+    res = api.put(
+        f'{data_url}/delta', data=make_delta(res.json(), newer),
+        headers={'token': token, 'if-match': res.json()['etag']})
+    assert res.status_code == status.HTTP_201_CREATED
+    res = api.get(data_url, params={'method': 'download'}, headers={'token': token})
+    assert res.content == newer
+
+    # 덮어쓰기와 삭제 후에는 참조되지 않는 청크가 남지 않는다
+    res = api.put(
+        f'{url}/content', params={'name': 'b.bin'}, headers={'token': token}, data=b'small')
+    assert res.status_code == status.HTTP_201_CREATED
+    res = api.delete(f'/api/users/{user_id}/datas/{ids[0]}', headers={'token': token})
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    assert chunk_files() != []
+    # 디렉토리 삭제
+    res = api.delete(url, headers={'token': token})
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    assert chunk_files() == []
+    assert ChunkStore.read_stats()['chunks'] == 0
@@ -0,0 +1,175 @@
+import pytest
+import os
+import time
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from apps.auth.utils.managers import AppAuthManager
+from apps.storage.utils.clone import copy_file
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.user.utils.managers import UserCRUDManager
+from settings.base import SERVER
+from system.bootloader import Bootloader
+
+
+client_info, other_info = None, None
+tree = dict()
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info, other_info
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    client_info = {
+        'email': 'copy@gmail.com',
+        'name': 'copy',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    other_info = {
+        'email': 'copy2@gmail.com',
+        'name': 'copy2',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    for info in (client_info, other_info):
+        info['id'] = UserCRUDManager().create(**info).id
+        info['token'] = AppAuthManager().login(info['email'], info['passwd'])
+
+    """
+    mydir
+        `-hi.txt
+        `-sub_dir
+            `-hi.txt
+    target
+    """
+    user_id = client_info['id']
+    tree['mydir'] = DataDirectoryCRUDManager().create(
+        root_id=0, user_id=user_id, dirname='mydir').id
+    tree['sub_dir'] = DataDirectoryCRUDManager().create(
+        root_id=tree['mydir'], user_id=user_id, dirname='sub_dir').id
+    tree['target'] = DataDirectoryCRUDManager().create(
+        root_id=0, user_id=user_id, dirname='target').id
+    client = TestClient(app)
+    for root_id, content in ((tree['mydir'], b'hello'), (tree['sub_dir'], b'world!')):
+        res = client.put(
+            f'/api/users/{user_id}/datas/{root_id}/content',
+            params={'name': 'hi.txt'}, headers={'token': client_info['token']},
+            data=content)
+        tree[root_id] = res.json()['id']
+    yield client
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def storage_root(user_id: int, root: str) -> str:
+    return f'{SERVER["storage"]}/storage/{user_id}/root{root}'
+
+
+def test_copy_file(tmp_path):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    src.write_bytes(os.urandom(300 * 1024))
+    copied = []
+    method = copy_file(str(src), str(dst), copied.append, chunk_size=64 * 1024)
+    assert method in ('reflink', 'copy_file_range', 'copy')
+    assert dst.read_bytes() == src.read_bytes()
+    assert sum(copied) == src.stat().st_size
+    # 이미 있으면 덮어쓰지 않는다
+    with pytest.raises(FileExistsError):
+        copy_file(str(src), str(dst))
+
+
+def test_copy(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    url = f'/api/users/{user_id}/datas'
+
+    # 파일 복사
+    res = api.post(
+        f'{url}/{tree[tree["mydir"]]}/copy', headers={'token': token},
+        json={'target': tree['target'], 'name': 'copied.txt'})
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()['root'] == '/target/'
+    assert res.json()['size'] == 5
+    res = api.get(
+        f'{url}/{res.json()["id"]}', params={'method': 'download'},
+        headers={'token': token})
+    assert res.content == b'hello'
+
+    # 디렉토리 복사
+    res = api.post(
+        f'{url}/{tree["mydir"]}/copy', headers={'token': token},
+        json={'target': tree['target']})
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()['root'] == '/target/'
+    assert res.json()['name'] == 'mydir'
+    with open(storage_root(user_id, '/target/mydir/sub_dir/hi.txt'), 'rb') as f:
+        assert f.read() == b'world!'
+    copied = DataDBQuery().read_subtree(user_id, '/target/mydir/')
+    assert sorted((data.root, data.name, data.size) for data in copied) == [
+        ('/target/mydir/', 'hi.txt', 5),
+        ('/target/mydir/', 'sub_dir', 0),
+        ('/target/mydir/sub_dir/', 'hi.txt', 6),
+    ]
+    # 원본은 그대로
+    with open(storage_root(user_id, '/mydir/sub_dir/hi.txt'), 'rb') as f:
+        assert f.read() == b'world!'
+    res = api.get(f'/api/users/{user_id}/usage', headers={'token': token})
+    assert res.json()['used'] == 2 * (5 + 6) + 5
+
+    # 같은 이름, 자기 자신의 하위, 다른 사용자
+    res = api.post(
+        f'{url}/{tree["mydir"]}/copy', headers={'token': token},
+        json={'target': tree['target']})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    res = api.post(
+        f'{url}/{tree["mydir"]}/copy', headers={'token': token},
+        json={'target': tree['sub_dir']})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    res = api.post(
+        f'{url}/{tree["mydir"]}/copy', headers={'token': other_info['token']},
+        json={'target': 0, 'name': 'other'})
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+    res = api.post(
+        f'{url}/{tree["mydir"]}/copy', headers={'token': token}, json={})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_copy_background(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    size = SERVER['copy-background-size']
+    SERVER['copy-background-size'] = 0
+    try:
+        res = api.post(
+            f'/api/users/{user_id}/datas/{tree["mydir"]}/copy',
+            headers={'token': token}, json={'target': 0, 'name': 'mydir2'})
+    finally:
+        SERVER['copy-background-size'] = size
+    assert res.status_code == status.HTTP_202_ACCEPTED
+    job = res.json()
+    assert job['total_files'] == 2
+    assert job['total_bytes'] == 11
+
+    job_url = f'/api/users/{user_id}/copy-jobs/{job["id"]}'
+    for _ in range(100):
+        job = api.get(job_url, headers={'token': token}).json()
+        if job['status'] != 'running':
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'done'
+    assert job['copied_files'] == 2
+    assert job['copied_bytes'] == 11
+    res = api.get(
+        f'/api/users/{user_id}/datas/{job["data_id"]}',
+        params={'method': 'info'}, headers={'token': token})
+    assert res.json()['root'] == '/'
+    assert res.json()['name'] == 'mydir2'
+    assert res.json()['size'] == 2
+
+    # 다른 사용자의 작업은 볼 수 없다
+    res = api.get(
+        f'/api/users/{other_info["id"]}/copy-jobs/{job["id"]}',
+        headers={'token': other_info['token']})
+    assert res.status_code == status.HTTP_404_NOT_FOUND
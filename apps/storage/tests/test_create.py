@@ -1,4 +1,5 @@
 import pytest
+import hashlib
 import os
 from fastapi.testclient import TestClient
 from fastapi import status
@@ -8,6 +9,8 @@ from main import app
 from system.bootloader import Bootloader
 from apps.auth.utils.managers import AppAuthManager
 from apps.user.utils.managers import UserCRUDManager
+from apps.user.utils.queries.user_db_query import UserDBQuery
+from apps.user.utils.quota import UsageReservation
 from settings.base import SERVER
 
 from apps.storage.models import DataInfo
@@ -23,6 +26,10 @@ f1_id = None
 
 TEST_EXAMLE_ROOT = 'apps/storage/tests/example'
 
+
+def sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
 @pytest.fixture(scope='module')
 def api():
     global admin_info
@@ -240,6 +247,8 @@ def test_success_directory(api: TestClient):
         'name': 'mydir',
         'size': 0,
         'created': main_mydir['created'],
+        'sha256': None,
+        'adler32': None,
     }
     # 제대로 디렉토리가 생성되어 있는 지 확인
     assert os.path.isdir(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir')
@@ -259,7 +268,9 @@ def test_success_directory(api: TestClient):
         'root': '/mydir/',
         'name': 'subdir',
         'size': 0,
-        'created': sub_subdir['created']
+        'created': sub_subdir['created'],
+        'sha256': None,
+        'adler32': None
     }
     # 제대로 생성되어 있는 지 확인
     assert os.path.isdir(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/subdir')
@@ -301,7 +312,9 @@ def admin_can_create_to_other_storage(api: TestClient):
         'root': '/mydir/',
         'name': 'mydir',
         'size': 0,
-        'created': sub_mydir['created']
+        'created': sub_mydir['created'],
+        'sha256': None,
+        'adler32': None
     }
     # 제대로 생성되어 있는 지 확인
     assert os.path.isdir(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/mydir')
@@ -338,7 +351,9 @@ def test_file_upload(api: TestClient):
         'root': '/',
         'name': 'hi.txt',
         'size': 12,
-        'created': output['created']
+        'created': output['created'],
+        'sha256': sha256(b'hello world!'),
+        'adler32': None
     }
     
 
@@ -355,7 +370,9 @@ def test_file_upload(api: TestClient):
         'root': '/',
         'name': 'hi2.txt',
         'size': 6,
-        'created': output['created']
+        'created': output['created'],
+        'sha256': sha256(b'hello2'),
+        'adler32': None
     }
 
     # 서브 디렉토리 파일 업로드 + 관리자가 특정 클라이언트의 스토리지에 업로드 가능
@@ -375,7 +392,9 @@ def test_file_upload(api: TestClient):
         'root': '/mydir/',
         'name': 'hi.txt',
         'size': 12,
-        'created': output['created']
+        'created': output['created'],
+        'sha256': sha256(b'hello world!'),
+        'adler32': None
     }
     
     res = api.post(
@@ -391,7 +410,9 @@ def test_file_upload(api: TestClient):
         'root': '/mydir/',
         'name': 'hi2.txt',
         'size': 6,
-        'created': output['created']
+        'created': output['created'],
+        'sha256': sha256(b'hello2'),
+        'adler32': None
     }
     # 파일 생성 확인
     assert os.path.isfile(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/hi.txt')
@@ -414,6 +435,205 @@ def test_rewrite_file(api: TestClient):
     # 파일 존재 확인
     assert os.path.isfile(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/hi.txt')
 
+def test_multipart_streaming(api: TestClient):
+    # 파일 파트 앞뒤의 다른 form 데이터는 무시하고 파일만 저장한다.
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    content = os.urandom(300 * 1024)
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/0',
+        headers={'token': token},
+        data={'note': 'hello'},
+        files = [('file', ('stream.bin', content))]
+    )
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()['size'] == len(content)
+    with open(f'{SERVER["storage"]}/storage/{client_info["id"]}/root/stream.bin', 'rb') as f:
+        assert f.read() == content
+
+    # 파일 파트가 없는 경우
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/0',
+        headers={'token': token},
+        files = [('note', (None, 'hello'))]
+    )
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    # 본문이 중간에 끊긴 경우 파일이 남지 않아야 한다.
+    boundary = 'cloudmodularboundary'
+    body = (
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="file"; filename="broken.bin"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + content
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/0',
+        headers={
+            'token': token,
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+        },
+        data=body,
+    )
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert not os.path.isfile(
+        f'{SERVER["storage"]}/storage/{client_info["id"]}/root/broken.bin')
+
+def test_raw_upload(api: TestClient):
+    # 요청 본문을 그대로 파일로 저장
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{created_dirs["mydir"]["id"]}/content'
+    root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/raw.bin'
+
+    assert api.put(f'{url}?name=raw.bin', data=b'abc').status_code \
+        == status.HTTP_401_UNAUTHORIZED
+    admin_token = AppAuthManager().login(admin_info['email'], admin_info['passwd'])
+    assert api.put(
+        f'/api/users/{admin_info["id"]}/datas/0/content?name=raw.bin',
+        headers={'token': token}, data=b'abc',
+    ).status_code == status.HTTP_401_UNAUTHORIZED
+
+    content = os.urandom(200 * 1024)
+    res = api.put(f'{url}?name=raw.bin', headers={'token': token}, data=content)
+    assert res.status_code == status.HTTP_201_CREATED
+    output = res.json()
+    assert output == {
+        'is_dir': False,
+        'id': output['id'],
+        'root': '/mydir/',
+        'name': 'raw.bin',
+        'size': len(content),
+        'created': output['created'],
+        'sha256': sha256(content),
+        'adler32': None
+    }
+    with open(root, 'rb') as f:
+        assert f.read() == content
+
+    # 같은 이름이면 덮어쓴다.
+    res = api.put(f'{url}?name=raw.bin', headers={'token': admin_token}, data=b'new')
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()['id'] == output['id']
+    assert res.json()['size'] == 3
+    assert res.json()['sha256'] == sha256(b'new')
+    with open(root, 'rb') as f:
+        assert f.read() == b'new'
+
+    # 잘못된 이름
+    assert api.put(f'{url}?name=', headers={'token': token}, data=b'abc') \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    assert api.put(f'{url}?name=a:b', headers={'token': token}, data=b'abc') \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    # 같은 이름의 디렉토리
+    assert api.put(
+        f'/api/users/{client_info["id"]}/datas/0/content?name=mydir',
+        headers={'token': token}, data=b'abc',
+    ).status_code == status.HTTP_400_BAD_REQUEST
+    # 상위 디렉토리 없음
+    assert api.put(
+        f'/api/users/{client_info["id"]}/datas/99999999/content?name=raw.bin',
+        headers={'token': token}, data=b'abc',
+    ).status_code == status.HTTP_404_NOT_FOUND
+
+def test_atomic_overwrite(api: TestClient):
+    # 덮어쓰기는 다 쓴 다음 교체되므로 읽던 파일은 기존 내용 그대로 읽힌다.
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{created_dirs["mydir"]["id"]}/content'
+    dir_root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir'
+
+    old_content = os.urandom(100 * 1024)
+    assert api.put(f'{url}?name=atomic.bin', headers={'token': token}, data=old_content) \
+        .status_code == status.HTTP_201_CREATED
+    reader = open(f'{dir_root}/atomic.bin', 'rb')
+    try:
+        new_content = os.urandom(50 * 1024)
+        assert api.put(f'{url}?name=atomic.bin', headers={'token': token}, data=new_content) \
+            .status_code == status.HTTP_201_CREATED
+        assert reader.read() == old_content
+    finally:
+        reader.close()
+    with open(f'{dir_root}/atomic.bin', 'rb') as f:
+        assert f.read() == new_content
+
+    # 용량 초과로 실패하면 기존 파일은 그대로 남는다.
+    usage = UserDBQuery().read_usage(client_info['id'])
+    reservation = UsageReservation(
+        client_info['id'], usage['entire'] - usage['used'])
+    try:
+        assert api.put(f'{url}?name=atomic.bin', headers={'token': token}, data=old_content) \
+            .status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    finally:
+        reservation.release()
+    with open(f'{dir_root}/atomic.bin', 'rb') as f:
+        assert f.read() == new_content
+    # 임시파일이 남지 않아야 한다.
+    assert not [name for name in os.listdir(dir_root) if name.startswith('.cm-upload-')]
+
+def test_upload_by_hash(api: TestClient):
+    # 같은 내용의 파일이 있으면 본문 없이 생성
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    mydir_url = f'/api/users/{client_info["id"]}/datas/{created_dirs["mydir"]["id"]}'
+    dir_root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir'
+    content = os.urandom(30 * 1024)
+    assert api.put(f'{mydir_url}/content?name=origin.bin', headers={'token': token}, data=content) \
+        .status_code == status.HTTP_201_CREATED
+
+    url = f'/api/users/{client_info["id"]}/datas/0/content/by-hash'
+    req = {'name': 'linked.bin', 'size': len(content), 'sha256': sha256(content).upper()}
+    assert api.post(url, json=req).status_code == status.HTTP_401_UNAUTHORIZED
+    admin_token = AppAuthManager().login(admin_info['email'], admin_info['passwd'])
+    assert api.post(
+        f'/api/users/{admin_info["id"]}/datas/0/content/by-hash',
+        headers={'token': token}, json=req,
+    ).status_code == status.HTTP_401_UNAUTHORIZED
+
+    res = api.post(url, headers={'token': token}, json=req)
+    assert res.status_code == status.HTTP_201_CREATED
+    output = res.json()
+    assert output == {
+        'is_dir': False,
+        'id': output['id'],
+        'root': '/',
+        'name': 'linked.bin',
+        'size': len(content),
+        'created': output['created'],
+        'sha256': sha256(content),
+        'adler32': None
+    }
+    linked_root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/linked.bin'
+    with open(linked_root, 'rb') as f:
+        assert f.read() == content
+    # 원본을 덮어써도 링크한 파일은 그대로
+    assert api.put(f'{mydir_url}/content?name=origin.bin', headers={'token': token}, data=b'new') \
+        .status_code == status.HTTP_201_CREATED
+    with open(linked_root, 'rb') as f:
+        assert f.read() == content
+    # 같은 이름이면 덮어쓴다.
+    res = api.post(url, headers={'token': token}, json={**req, 'name': 'linked.bin'})
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()['id'] == output['id']
+
+    # 같은 내용이 없으면 업로드가 필요하다.
+    res = api.post(url, headers={'token': token}, json={**req, 'size': len(content) + 1})
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    res = api.post(url, headers={'token': token}, json={**req, 'sha256': sha256(b'other')})
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    # 다른 사용자의 파일은 찾지 않는다.
+    res = api.post(
+        f'/api/users/{admin_info["id"]}/datas/0/content/by-hash',
+        headers={'token': admin_token}, json=req)
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    # 잘못된 요청
+    assert api.post(url, headers={'token': token}, json={'name': 'a.bin'}) \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    assert api.post(url, headers={'token': token}, json={**req, 'sha256': 'abc'}) \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    assert api.post(url, headers={'token': token}, json={**req, 'name': 'a:b'}) \
+        .status_code == status.HTTP_400_BAD_REQUEST
+    assert not [name for name in os.listdir(dir_root) if name.startswith('.cm-upload-')]
+
 def test_try_create_on_file(api: TestClient):
     # 파일위에 파일/디렉토리를 생성하는 것은 불가능
     # 디렉토리를 못찾은 걸로 간주
@@ -438,6 +658,8 @@ def test_usage_limited(api: TestClient):
     tmp_size, target.size = target.size, 10 * (10 ** 9)
     session.commit()
     session.refresh(target)
+    # 사용량은 DB를 직접 수정한 경우 다시 맞춰야 반영된다.
+    UserDBQuery().reconcile_usage(client_info['id'])
     # 테스트
     email, passwd = client_info['email'], client_info['passwd']
     token = AppAuthManager().login(email, passwd)
@@ -453,6 +675,28 @@ def test_usage_limited(api: TestClient):
     session.commit()
     session.refresh(target)
     session.close()
+    UserDBQuery().reconcile_usage(client_info['id'])
+
+def test_usage_reserved_by_other_upload(api: TestClient):
+    # 다른 업로드가 남은 용량을 전부 예약한 경우 업로드 불가능
+    # 이때 파일은 스토리지에 기록되지 않아야 한다.
+    usage = UserDBQuery().read_usage(client_info['id'])
+    reservation = UsageReservation(
+        client_info['id'], usage['entire'] - usage['used'])
+    try:
+        email, passwd = client_info['email'], client_info['passwd']
+        token = AppAuthManager().login(email, passwd)
+        reload_file()
+        res = api.post(
+            f'/api/users/{client_info["id"]}/datas/0',
+            headers={'token': token},
+            files = [('file', ('reserved.txt', f3))]
+        )
+        assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert not os.path.isfile(
+            f'{SERVER["storage"]}/storage/{client_info["id"]}/root/reserved.txt')
+    finally:
+        reservation.release()
 
 def test_db_no_exists_but_storage_exists(api: TestClient):
     # DB에는 같은 이름의 파일 또는 디렉토리가 없는데 스토리지에는 존재하는 경우
@@ -482,6 +726,8 @@ def test_db_no_exists_but_storage_exists(api: TestClient):
         'name': 'mydir',
         'size': 0,
         'created': output['created'],
+        'sha256': None,
+        'adler32': None,
     }
 
 def test_failed_over_size_of_file(api: TestClient):
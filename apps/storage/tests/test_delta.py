@@ -0,0 +1,131 @@
+import pytest
+import asyncio
+import hashlib
+import random
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from apps.auth.utils.managers import AppAuthManager
+from apps.storage.utils.delta import (
+    DeltaReader,
+    apply_delta,
+    file_signature,
+    make_delta,
+)
+from apps.user.utils.managers import UserCRUDManager
+from system.bootloader import Bootloader
+
+
+client_info = None
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    client_info = {
+        'email': 'delta@gmail.com',
+        'name': 'delta',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    client_info['id'] = UserCRUDManager().create(**client_info).id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+    yield TestClient(app)
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def edit(content: bytes, seed: int) -> bytes:
+    # 중간에 끼워넣기, 덮어쓰기, 뒤에 붙이기
+    rand = random.Random(seed)
+    pos = rand.randrange(len(content) // 2)
+    content = content[:pos] + b'inserted' + content[pos:]
+    pos = rand.randrange(len(content) // 2, len(content))
+    return content[:pos] + b'overwritten' + content[pos + 11:] + b'appended'
+
+
+async def collect(chunks) -> bytes:
+    return b''.join([chunk async for chunk in chunks])
+
+
+async def stream(data: bytes, piece: int = 1000):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+def test_make_delta(tmp_path):
+    base = random.Random(0).randbytes(300 * 1024 + 123)
+    new = edit(base, 1)
+    root = tmp_path / 'base'
+    root.write_bytes(base)
+    with open(root, 'rb') as f:
+        signature = file_signature(f, 4096)
+        assert signature['size'] == len(base)
+        assert len(signature['blocks']) == len(base) // 4096 + 1
+
+        delta = make_delta(signature, new)
+        # 바뀐 블록 몇개만 전송
+        assert len(delta) < 5 * 4096
+        reader = DeltaReader(stream(delta))
+        assert asyncio.run(collect(apply_delta(f, reader))) == new
+        reader.verify(hashlib.sha256(new).hexdigest())
+
+        # 처음부터 다시 만드는 경우 / 같은 파일
+        assert asyncio.run(collect(apply_delta(
+            f, DeltaReader(stream(make_delta(signature, b'')))))) == b''
+        assert asyncio.run(collect(apply_delta(
+            f, DeltaReader(stream(make_delta(signature, base)))))) == base
+
+        # 잘린 delta, 파일 범위 밖 복사
+        with pytest.raises(ValueError):
+            asyncio.run(collect(apply_delta(f, DeltaReader(stream(delta[:-10])))))
+        with pytest.raises(ValueError):
+            asyncio.run(collect(apply_delta(f, DeltaReader(stream(
+                b'CMDELTA1C' + (len(base)).to_bytes(8, 'little')
+                + (1).to_bytes(8, 'little'))))))
+
+
+def test_upload_delta(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    base = random.Random(2).randbytes(200 * 1024)
+    new = edit(base, 3)
+    res = api.put(
+        f'/api/users/{user_id}/datas/0/content', params={'name': 'disk.img'},
+        headers={'token': token}, data=base)
+    url = f'/api/users/{user_id}/datas/{res.json()["id"]}'
+
+    res = api.get(f'{url}/signature', params={'block_size': 2048}, headers={'token': token})
+    assert res.status_code == status.HTTP_200_OK
+    signature = res.json()
+    assert res.headers['etag'] == signature['etag']
+    assert signature['block_size'] == 2048
+    res = api.get(f'{url}/signature', params={'block_size': 10}, headers={'token': token})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    delta = make_delta(signature, new)
+    assert len(delta) < len(new) // 10
+
+    # If-Match 없음, 체크섬 불일치
+    res = api.put(f'{url}/delta', headers={'token': token}, data=delta)
+    assert res.status_code == status.HTTP_428_PRECONDITION_REQUIRED
+    res = api.put(f'{url}/delta', headers={
+        'token': token, 'if-match': signature['etag']}, data=delta[:-1] + b'\0')
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    res = api.get(url, params={'method': 'download'}, headers={'token': token})
+    assert res.content == base
+
+    res = api.put(f'{url}/delta', headers={
+        'token': token, 'if-match': signature['etag']}, data=delta)
+    assert res.status_code == status.HTTP_201_CREATED
+    assert res.json()['size'] == len(new)
+    assert res.json()['sha256'] == hashlib.sha256(new).hexdigest()
+    res = api.get(url, params={'method': 'download'}, headers={'token': token})
+    assert res.content == new
+
+    # 이미 바뀐 파일에 같은 delta를 다시 보냄
+    res = api.put(f'{url}/delta', headers={
+        'token': token, 'if-match': signature['etag']}, data=delta)
+    assert res.status_code == status.HTTP_412_PRECONDITION_FAILED
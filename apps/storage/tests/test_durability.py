@@ -0,0 +1,65 @@
+import pytest
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.storage.utils.durability import GroupCommitter, replace
+from settings.base import DURABILITY_MODES, SERVER, _get_choice
+
+
+@pytest.fixture
+def durability():
+    prev = SERVER['storage-durability']
+    yield
+    SERVER['storage-durability'] = prev
+
+
+def test_unknown_mode(monkeypatch):
+    # 잘못된 정책은 설정을 읽을 때 거부한다
+    monkeypatch.setenv('STORAGE_DURABILITY', 'fsync')
+    with pytest.raises(ValueError):
+        _get_choice('STORAGE_DURABILITY', 'on-close', DURABILITY_MODES)
+    monkeypatch.setenv('STORAGE_DURABILITY', 'group-commit')
+    assert _get_choice('STORAGE_DURABILITY', 'on-close', DURABILITY_MODES) == 'group-commit'
+
+
+@pytest.mark.parametrize('mode', DURABILITY_MODES)
+def test_replace(tmp_path, durability, mode):
+    SERVER['storage-durability'] = mode
+    dst = tmp_path / 'data.txt'
+    dst.write_bytes(b'old')
+    src = tmp_path / '.cm-upload-test'
+    src.write_bytes(b'new')
+
+    replace(str(src), str(dst))
+    assert dst.read_bytes() == b'new'
+    assert not src.exists()
+
+
+def test_group_commit_batch(tmp_path):
+    # 동시에 들어온 교체 요청들이 전부 처리되어야 한다.
+    dirs = [tmp_path / 'a', tmp_path / 'b']
+    for d in dirs:
+        d.mkdir()
+    jobs = []
+    for i in range(30):
+        src = dirs[i % 2] / f'.cm-upload-{i}'
+        src.write_bytes(str(i).encode())
+        jobs.append((str(src), str(dirs[i % 2] / f'{i}.txt')))
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        futures = [pool.submit(lambda job: GroupCommitter.submit(*job).result(5), job) for job in jobs]
+        for future in futures:
+            future.result()
+    for i, (src, dst) in enumerate(jobs):
+        assert not os.path.exists(src)
+        with open(dst, 'rb') as f:
+            assert f.read() == str(i).encode()
+
+    # 실패한 요청은 해당 요청만 에러를 받는다.
+    src = dirs[0] / '.cm-upload-ok'
+    src.write_bytes(b'ok')
+    ok = GroupCommitter.submit(str(src), str(dirs[0] / 'ok.txt'))
+    missing = GroupCommitter.submit(str(dirs[0] / '.cm-upload-missing'), str(dirs[0] / 'missing.txt'))
+    assert ok.result(5) == str(dirs[0] / 'ok.txt')
+    with pytest.raises(FileNotFoundError):
+        missing.result(5)
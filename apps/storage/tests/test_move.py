@@ -0,0 +1,147 @@
+import pytest
+import os
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from apps.auth.utils.managers import AppAuthManager
+from apps.storage.schemas import DataInfoCreate
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.user.utils.managers import UserCRUDManager
+from settings.base import SERVER
+from system.bootloader import Bootloader
+
+
+client_info = None
+tree = dict()
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    client_info = {
+        'email': 'move@gmail.com',
+        'name': 'move',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    client_info['id'] = UserCRUDManager().create(**client_info).id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+
+    """
+    my_dir
+        `-hi.txt
+        `-sub_dir
+            `-hi.txt
+    myxdir
+        `-hi.txt
+    target
+    """
+    user_id = client_info['id']
+    for dirname, root_id in (
+            ('my_dir', 0), ('sub_dir', 'my_dir'), ('myxdir', 0), ('target', 0)):
+        tree[dirname] = DataDirectoryCRUDManager().create(
+            root_id=tree.get(root_id, 0), user_id=user_id, dirname=dirname).id
+    client = TestClient(app)
+    for dirname in ('my_dir', 'sub_dir', 'myxdir'):
+        res = client.put(
+            f'/api/users/{user_id}/datas/{tree[dirname]}/content',
+            params={'name': 'hi.txt'}, headers={'token': client_info['token']},
+            data=dirname.encode())
+        tree[f'{dirname}/hi.txt'] = res.json()['id']
+    yield client
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def storage_root(root: str) -> str:
+    return f'{SERVER["storage"]}/storage/{client_info["id"]}/root{root}'
+
+
+def test_move(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    url = f'/api/users/{user_id}/datas/{tree["target"]}/move'
+
+    # 자기 자신의 하위, 상위와 하위를 같이, 없는 데이터
+    res = api.post(
+        f'/api/users/{user_id}/datas/{tree["sub_dir"]}/move',
+        headers={'token': token}, json={'ids': [tree['my_dir']]})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    res = api.post(url, headers={'token': token}, json={
+        'ids': [tree['my_dir'], tree['sub_dir/hi.txt']]})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    res = api.post(url, headers={'token': token}, json={
+        'ids': [tree['my_dir'], 10000]})
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    # 같은 이름 (하나라도 실패하면 아무것도 옮기지 않는다)
+    res = api.post(url, headers={'token': token}, json={
+        'ids': [tree['my_dir/hi.txt'], tree['myxdir/hi.txt']]})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    assert os.path.isfile(storage_root('/my_dir/hi.txt'))
+    assert not os.path.exists(storage_root('/target/hi.txt'))
+
+    res = api.post(url, headers={'token': token}, json={'ids': [tree['my_dir']]})
+    assert res.status_code == status.HTTP_200_OK
+    assert [(data['root'], data['name']) for data in res.json()] == [
+        ('/target/', 'my_dir')]
+    # 비슷한 이름의 디렉토리 하위 데이터는 그대로
+    assert [data.name for data in DataDBQuery().read_entries(user_id, '/myxdir/')] \
+        == ['hi.txt']
+    res = api.post(url, headers={'token': token}, json={
+        'ids': [tree['myxdir/hi.txt'], tree['my_dir']]})
+    assert res.status_code == status.HTTP_200_OK
+    assert [(data['root'], data['name']) for data in res.json()] == [
+        ('/target/', 'hi.txt'), ('/target/', 'my_dir')]
+    with open(storage_root('/target/my_dir/sub_dir/hi.txt'), 'rb') as f:
+        assert f.read() == b'sub_dir'
+    assert not os.path.exists(storage_root('/my_dir'))
+    # 하위 데이터 루트는 앞부분만 바뀐다
+    assert sorted(
+        (data.root, data.name)
+        for data in DataDBQuery().read_subtree(user_id, '/target/')
+    ) == [
+        ('/target/', 'hi.txt'),
+        ('/target/', 'my_dir'),
+        ('/target/my_dir/', 'hi.txt'),
+        ('/target/my_dir/', 'sub_dir'),
+        ('/target/my_dir/sub_dir/', 'hi.txt'),
+    ]
+    assert [data.name for data in DataDBQuery().read_entries(user_id, '/myxdir/')] == []
+    res = api.get(
+        f'/api/users/{user_id}/datas/{tree["sub_dir/hi.txt"]}',
+        params={'method': 'download'}, headers={'token': token})
+    assert res.content == b'sub_dir'
+
+    # 최상위로 되돌리기
+    res = api.post(
+        f'/api/users/{user_id}/datas/0/move',
+        headers={'token': token}, json={'ids': [tree['my_dir']]})
+    assert res.status_code == status.HTTP_200_OK
+    assert os.path.isfile(storage_root('/my_dir/sub_dir/hi.txt'))
+    assert DataDBQuery().read(
+        user_id=user_id, data_id=tree['sub_dir/hi.txt']).root == '/my_dir/sub_dir/'
+
+
+def test_move_many(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    names = [f'{i}.txt' for i in range(1200)]
+    os.makedirs(storage_root('/many'))
+    for name in names:
+        with open(storage_root(f'/many/{name}'), 'wb') as f:
+            f.write(b'x')
+    datas = DataDBQuery().bulk_create([
+        DataInfoCreate(name=name, root='/many/', user_id=user_id, is_dir=False, size=1)
+        for name in names
+    ])
+    res = api.post(
+        f'/api/users/{user_id}/datas/{tree["target"]}/move',
+        headers={'token': token}, json={'ids': [data.id for data in datas]})
+    assert res.status_code == status.HTTP_200_OK
+    assert len(res.json()) == len(names)
+    assert sorted(os.listdir(storage_root('/target'))) \
+        == sorted(names + ['hi.txt'])
+    assert len(DataDBQuery().read_entries(user_id, '/target/')) == len(names) + 1
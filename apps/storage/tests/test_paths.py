@@ -0,0 +1,369 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from apps.auth.utils.managers import AppAuthManager
+from apps.storage.models import DataClosure, DataInfo
+from apps.storage.schemas import DataInfoCreate
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.user.utils.managers import UserCRUDManager
+from core.exc import DataAlreadyExists
+from system.bootloader import Bootloader
+from system.connection.generators import DatabaseGenerator
+from system.migrations import MIGRATIONS, current_version, migrate
+
+
+client_info = None
+tree = dict()
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    client_info = {
+        'email': 'paths@gmail.com',
+        'name': 'paths',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    client_info['id'] = UserCRUDManager().create(**client_info).id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+
+    """
+    a
+        `-b
+            `-a
+                `-hi.txt
+    a_b
+        `-hi.txt
+    """
+    user_id = client_info['id']
+    for key, dirname, root_id in (
+            ('a', 'a', 0), ('a/b', 'b', 'a'), ('a/b/a', 'a', 'a/b'), ('a_b', 'a_b', 0)):
+        tree[key] = DataDirectoryCRUDManager().create(
+            root_id=tree.get(root_id, 0), user_id=user_id, dirname=dirname).id
+    client = TestClient(app)
+    for key in ('a/b/a', 'a_b'):
+        res = client.put(
+            f'/api/users/{user_id}/datas/{tree[key]}/content',
+            params={'name': 'hi.txt'}, headers={'token': client_info['token']},
+            data=b'hi')
+        tree[f'{key}/hi.txt'] = res.json()['id']
+    yield client
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def parent_ids():
+    session = DatabaseGenerator.get_session()
+    try:
+        return {
+            data.id: data.parent_id for data in session.query(DataInfo).filter(
+                DataInfo.user_id == client_info['id'])
+        }
+    finally:
+        session.close()
+
+
+def closure():
+    session = DatabaseGenerator.get_session()
+    try:
+        return {
+            tuple(row) for row in session.query(
+                DataClosure.ancestor_id, DataClosure.descendant_id, DataClosure.depth)
+        }
+    finally:
+        session.close()
+
+
+def expected_closure():
+    # parent_id로 계산한 closure
+    parents, rows = parent_ids(), set()
+    for data_id in parents:
+        ancestor, depth = data_id, 0
+        while ancestor:
+            rows.add((ancestor, data_id, depth))
+            ancestor, depth = parents[ancestor], depth + 1
+    return rows
+
+
+def test_parent_id(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    parents = parent_ids()
+    assert parents[tree['a']] == 0
+    assert parents[tree['a/b']] == tree['a']
+    assert parents[tree['a/b/a']] == tree['a/b']
+    assert parents[tree['a/b/a/hi.txt']] == tree['a/b/a']
+    assert parents[tree['a_b/hi.txt']] == tree['a_b']
+
+    # 같이 생성한 디렉토리가 상위인 경우
+    datas = DataDBQuery().bulk_create([
+        DataInfoCreate(name='c', root='/a_b/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='hi.txt', root='/a_b/c/', user_id=user_id, is_dir=False, size=0),
+    ])
+    parents = parent_ids()
+    assert parents[datas[0].id] == tree['a_b']
+    assert parents[datas[1].id] == datas[0].id
+
+    # 옮긴 데이터만 상위 디렉토리가 바뀐다
+    res = api.post(
+        f'/api/users/{user_id}/datas/0/move',
+        headers={'token': token}, json={'ids': [tree['a/b']]})
+    assert res.status_code == status.HTTP_200_OK
+    parents = parent_ids()
+    assert parents[tree['a/b']] == 0
+    assert parents[tree['a/b/a']] == tree['a/b']
+
+
+def test_rename_prefix(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    # /b/a/b/a/ 처럼 같은 경로가 반복되어도 앞부분(/b/)만 바뀌어야 한다
+    datas = DataDBQuery().bulk_create([
+        DataInfoCreate(name='b', root='/b/a/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='a', root='/b/a/b/', user_id=user_id, is_dir=True, size=0),
+    ])
+    res = api.patch(
+        f'/api/users/{user_id}/datas/{tree["a/b"]}',
+        headers={'token': token}, json={'name': 'x'})
+    assert res.status_code == status.HTTP_200_OK
+    assert DataDBQuery().read(
+        user_id=user_id, data_id=tree['a/b/a/hi.txt']).root == '/x/a/'
+    assert DataDBQuery().read(user_id=user_id, data_id=datas[1].id).root == '/x/a/b/'
+    # 비슷한 이름의 디렉토리는 그대로
+    assert DataDBQuery().read(
+        user_id=user_id, full_root=('/', 'a_b')).id == tree['a_b']
+    assert sorted(data.name for data in DataDBQuery().read_entries(user_id, '/a_b/')) \
+        == ['c', 'hi.txt']
+    # 다른 사용자의 데이터는 읽을 수 없다
+    assert DataDBQuery().read(user_id=user_id + 1, data_id=tree['a_b']) is None
+
+
+def test_long_root(api: TestClient):
+    user_id = client_info['id']
+    # root_prefix보다 긴 루트
+    root = '/'
+    for i in range(30):
+        name = f'{i:02d}' + 'x' * 10
+        DataDBQuery().bulk_create([
+            DataInfoCreate(name=name, root=root, user_id=user_id, is_dir=True, size=0)])
+        root = f'{root}{name}/'
+    assert len(root) > 255
+    DataDBQuery().bulk_create([
+        DataInfoCreate(name='hi.txt', root=root, user_id=user_id, is_dir=False, size=0)])
+    data = DataDBQuery().read(user_id=user_id, full_root=(root, 'hi.txt'))
+    assert data.root == root
+    assert parent_ids()[data.id]
+    assert [data.name for data in DataDBQuery().read_entries(user_id, root)] \
+        == ['hi.txt']
+    parent = root[:-len('29xxxxxxxxxx/')]
+    assert sorted(data.name for data in DataDBQuery().read_subtree(user_id, parent)) \
+        == ['29xxxxxxxxxx', 'hi.txt']
+
+
+def test_backfill_paths(api: TestClient):
+    # 이전 버전 DB처럼 경로 컬럼을 비우고 다시 채운다
+    expected = parent_ids()
+    session = DatabaseGenerator.get_session()
+    try:
+        session.query(DataInfo).update({
+            DataInfo.root_prefix: None,
+            DataInfo.parent_id: None,
+        }, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+    assert DataDBQuery().read_entries(client_info['id'], '/a_b/') == []
+
+    assert DataDBQuery().backfill_paths() > 0
+    assert parent_ids() == expected
+    assert len(DataDBQuery().read_entries(client_info['id'], '/a_b/')) == 2
+    # 채울 데이터가 없으면 아무것도 하지 않는다
+    assert DataDBQuery().backfill_paths() == 0
+    assert closure() == expected_closure()
+
+
+def test_ancestors(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    url = f'/api/users/{user_id}/datas'
+    res = api.get(f'{url}/{tree["a/b/a/hi.txt"]}/ancestors', headers={'token': token})
+    assert res.status_code == status.HTTP_200_OK
+    assert [(data['root'], data['name']) for data in res.json()] == [
+        ('/', 'x'), ('/x/', 'a'), ('/x/a/', 'hi.txt')]
+    res = api.get(f'{url}/0/ancestors', headers={'token': token})
+    assert res.json() == []
+    res = api.get(f'{url}/99999/ancestors', headers={'token': token})
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    res = api.get(f'{url}/{tree["a_b"]}/ancestors')
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_backfill_closure(api: TestClient):
+    expected = closure()
+    session = DatabaseGenerator.get_session()
+    try:
+        session.query(DataClosure).delete()
+        session.commit()
+    finally:
+        session.close()
+    assert DataDBQuery().backfill_closure() == len(expected)
+    assert closure() == expected
+    assert DataDBQuery().backfill_closure() == 0
+
+
+def test_destroy_subtree(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    res = api.delete(
+        f'/api/users/{user_id}/datas/{tree["a/b"]}', headers={'token': token})
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    assert DataDBQuery().read(user_id=user_id, data_id=tree['a/b/a/hi.txt']) is None
+    assert DataDBQuery().read_subtree(user_id, '/x/') == []
+    assert closure() == expected_closure()
+
+
+def test_unique_name(api: TestClient):
+    user_id = client_info['id']
+
+    def create(is_dir: bool):
+        try:
+            return DataDBQuery().create(DataInfoCreate(
+                name='same', root='/a/', user_id=user_id, is_dir=is_dir, size=0)).id
+        except DataAlreadyExists:
+            return None
+
+    # 동시에 같은 이름으로 생성해도 하나만 생성된다 (파일/디렉토리 구분 없음)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        created = [
+            data_id for data_id in pool.map(create, [True, False] * 8)
+            if data_id is not None
+        ]
+    assert len(created) == 1
+    assert [data.id for data in DataDBQuery().read_entries(user_id, '/a/')] == created
+    assert parent_ids()[created[0]] == tree['a']
+    # 이름 수정도 같은 이름으로는 안된다
+    data = DataDBQuery().create(DataInfoCreate(
+        name='other', root='/a/', user_id=user_id, is_dir=False, size=0))
+    with pytest.raises(DataAlreadyExists):
+        DataDBQuery().update(new_name='same', user_id=user_id, data_id=data.id)
+
+
+def aggregates(data_id: int):
+    data = DataDBQuery().read(user_id=client_info['id'], data_id=data_id)
+    return data.child_count, data.file_count, data.total_size
+
+
+def test_aggregates(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    url = f'/api/users/{user_id}/datas'
+    """
+    agg
+        `-p
+            `-q
+                `-1.txt (3)
+        `-2.txt (5)
+    """
+    agg = DataDirectoryCRUDManager().create(root_id=0, user_id=user_id, dirname='agg').id
+    p = DataDirectoryCRUDManager().create(root_id=agg, user_id=user_id, dirname='p').id
+    q = DataDirectoryCRUDManager().create(root_id=p, user_id=user_id, dirname='q').id
+    for data_id, name, content in ((q, '1.txt', b'abc'), (agg, '2.txt', b'hello')):
+        res = api.put(f'{url}/{data_id}/content', params={'name': name},
+            headers={'token': token}, data=content)
+        assert res.status_code == status.HTTP_201_CREATED
+    assert aggregates(agg) == (2, 2, 8)
+    assert aggregates(p) == (1, 1, 3)
+    assert aggregates(q) == (1, 1, 3)
+    res = api.get(f'{url}/{agg}', params={'method': 'info'}, headers={'token': token})
+    assert (res.json()['size'], res.json()['file_count'], res.json()['total_size']) \
+        == (2, 2, 8)
+
+    # 덮어쓰기, 여러개 생성 (같이 생성한 디렉토리 포함)
+    res = api.put(f'{url}/{q}/content', params={'name': '1.txt'},
+        headers={'token': token}, data=b'abcdef')
+    assert aggregates(agg) == (2, 2, 11)
+    DataDBQuery().bulk_create([
+        DataInfoCreate(name='r', root='/agg/p/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='3.txt', root='/agg/p/r/', user_id=user_id, is_dir=False, size=7),
+        DataInfoCreate(name='4.txt', root='/agg/p/', user_id=user_id, is_dir=False, size=1),
+    ])
+    assert aggregates(agg) == (2, 4, 19)
+    assert aggregates(p) == (3, 3, 14)
+
+    # 옮기면 이전/새 상위 디렉토리 모두 바뀐다
+    res = api.post(f'{url}/{agg}/move', headers={'token': token}, json={'ids': [q]})
+    assert res.status_code == status.HTTP_200_OK
+    assert aggregates(agg) == (3, 4, 19)
+    assert aggregates(p) == (2, 2, 8)
+
+    # 하위 데이터 전체 삭제
+    res = api.delete(f'{url}/{p}', headers={'token': token})
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    assert aggregates(agg) == (2, 2, 11)
+    assert DataDBQuery().rebuild_aggregates() == 0
+
+
+def test_move_many(api: TestClient):
+    user_id = client_info['id']
+    """
+    many
+        `-s
+            `-5.txt (2)
+        `-t
+            `-6.txt (4)
+            `-u
+                `-7.txt (8)
+        `-dst
+    """
+    datas = DataDBQuery().bulk_create([
+        DataInfoCreate(name='many', root='/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='s', root='/many/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='5.txt', root='/many/s/', user_id=user_id, is_dir=False, size=2),
+        DataInfoCreate(name='t', root='/many/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='6.txt', root='/many/t/', user_id=user_id, is_dir=False, size=4),
+        DataInfoCreate(name='u', root='/many/t/', user_id=user_id, is_dir=True, size=0),
+        DataInfoCreate(name='7.txt', root='/many/t/u/', user_id=user_id, is_dir=False, size=8),
+        DataInfoCreate(name='dst', root='/many/', user_id=user_id, is_dir=True, size=0),
+    ])
+    many, s, t, u, dst = (datas[i].id for i in (0, 1, 3, 5, 7))
+    # 상위 디렉토리가 다른 데이터를 한번에 옮긴다
+    moved = DataDBQuery().read_many(user_id, [datas[2].id, u])
+    assert DataDBQuery().move(user_id, moved, '/many/dst/') == 3
+    assert DataDBQuery().read(user_id=user_id, data_id=datas[6].id).root == '/many/dst/u/'
+    assert closure() == expected_closure()
+    assert aggregates(s) == (0, 0, 0)
+    assert aggregates(t) == (1, 1, 4)
+    assert aggregates(u) == (1, 1, 8)
+    assert aggregates(dst) == (2, 2, 10)
+    assert aggregates(many) == (3, 3, 14)
+    assert DataDBQuery().rebuild_aggregates() == 0
+
+
+def test_rebuild_aggregates(api: TestClient):
+    agg = DataDBQuery().read(user_id=client_info['id'], full_root=('/', 'agg'))
+    expected = aggregates(agg.id)
+    session = DatabaseGenerator.get_session()
+    try:
+        session.query(DataInfo).update({
+            DataInfo.child_count: None,
+            DataInfo.file_count: None,
+            DataInfo.total_size: None,
+        }, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+    assert DataDBQuery().rebuild_aggregates() > 0
+    assert aggregates(agg.id) == expected
+    # 파일은 0
+    assert aggregates(tree['a_b/hi.txt']) == (0, 0, 0)
+    assert DataDBQuery().rebuild_aggregates() == 0
+
+
+def test_migrate(api: TestClient):
+    # 이미 적용된 버전은 다시 실행하지 않는다
+    assert current_version() == MIGRATIONS[-1][0]
+    assert migrate(DatabaseGenerator.get_engine()) == []
+    assert DataDBQuery().dedupe_names() == 0
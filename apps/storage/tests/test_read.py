@@ -1,11 +1,18 @@
 import pytest
+import base64
+import hashlib
+import io
 import os
+import tarfile
+import zipfile
 from fastapi.testclient import TestClient
 from fastapi import UploadFile, status
 
 from main import app
 from apps.auth.utils.managers import AppAuthManager
 from apps.user.utils.managers import UserCRUDManager
+from apps.storage.utils.archive_cache import ArchiveCache
+from apps.storage.utils.queries.data_db_query import DataDBQuery
 from apps.storage.utils.managers import (
     DataFileCRUDManager,
     DataDirectoryCRUDManager,
@@ -194,6 +201,8 @@ def test_search_directory(api: TestClient):
         'is_dir': True,
         'name': 'mydir',
         'size': 3,
+        'file_count': 3,
+        'total_size': 12 + 6 + 12,
     }
 
 def test_admin_can_search_client_repo(api: TestClient):
@@ -211,6 +220,8 @@ def test_admin_can_search_client_repo(api: TestClient):
         'is_dir': True,
         'name': 'mydir',
         'size': 3,
+        'file_count': 3,
+        'total_size': 12 + 6 + 12,
     }
 
 def test_size_changed_illeagal_in_db(api: TestClient):
@@ -227,6 +238,8 @@ def test_size_changed_illeagal_in_db(api: TestClient):
     data.size = 9999
     session.commit()
     session.close()
+    # 상위 디렉토리 집계도 DB 값에 맞춘다 (동기화할 때 차이만큼 되돌린다)
+    DataDBQuery().rebuild_aggregates()
 
     # 테스트
     email, passwd = admin_info['email'], admin_info['passwd']
@@ -255,6 +268,51 @@ def test_download_file(api: TestClient):
     )
     assert res.status_code == status.HTTP_200_OK
     assert res.headers.get('content-type') == 'text/plain; charset=utf-8'
+    assert res.headers.get('accept-ranges') == 'bytes'
+    # 크기가 DB와 달랐던 파일(test_size_changed_illeagal_in_db)은 체크섬을 보내지 않는다.
+    assert 'digest' not in res.headers
+    assert res.content == b'hello world!'
+
+def test_download_file_range(api: TestClient):
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["hi.txt"]["id"]}'
+    params = {'method': 'download'}
+
+    # 한 구간
+    res = api.get(url, params=params, headers={'token': token, 'range': 'bytes=0-4'})
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert res.headers.get('content-range') == 'bytes 0-4/12'
+    assert res.content == b'hello'
+
+    # 마지막 n 바이트
+    res = api.get(url, params=params, headers={'token': token, 'range': 'bytes=-6'})
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert res.content == b'world!'
+
+    # 여러 구간
+    res = api.get(url, params=params, headers={'token': token, 'range': 'bytes=0-1,6-7'})
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert res.headers.get('content-type').startswith('multipart/byteranges; boundary=')
+    assert int(res.headers.get('content-length')) == len(res.content)
+    assert b'Content-Range: bytes 0-1/12\r\n\r\nhe\r\n' in res.content
+    assert b'Content-Range: bytes 6-7/12\r\n\r\nwo\r\n' in res.content
+
+    # 범위 밖
+    res = api.get(url, params=params, headers={'token': token, 'range': 'bytes=100-'})
+    assert res.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert res.headers.get('content-range') == 'bytes */12'
+
+    # If-Range가 맞으면 부분, 다르면 전체
+    etag = api.get(url, params=params, headers={'token': token}).headers['etag']
+    res = api.get(url, params=params, headers={
+        'token': token, 'range': 'bytes=6-', 'if-range': etag})
+    assert res.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert res.content == b'world!'
+    res = api.get(url, params=params, headers={
+        'token': token, 'range': 'bytes=6-', 'if-range': '"stale"'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.content == b'hello world!'
 
 def test_download_directory(api: TestClient):
     email, passwd = client_info['email'], client_info['passwd']
@@ -267,6 +325,168 @@ def test_download_directory(api: TestClient):
     )
     assert res.status_code == status.HTTP_200_OK
     assert res.headers.get('content-type') == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(res.content)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == [
+            'hi.txt', 'hi2.txt', 'subdir/', 'subdir/hi.txt']
+        assert archive.read('subdir/hi.txt') == b'hello world!'
+
+    # 같은 디렉토리는 캐시된 압축 파일을 받는다
+    res2 = api.get(
+        f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["id"]}',
+        headers={'token': token},
+        params={'method': 'download'}
+    )
+    assert res2.content == res.content
+
+    # 캐시 현황은 Admin만 볼 수 있다
+    res = api.get('/api/storage/archive-cache', headers={'token': token})
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+    admin_token = AppAuthManager().login(admin_info['email'], admin_info['passwd'])
+    res = api.get('/api/storage/archive-cache', headers={'token': admin_token})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json()['hits'] >= 1
+    assert res.json()['bytes_saved'] >= len(res2.content)
+
+    # 내용이 바뀌면 (크기가 같아도) 새로 압축한다
+    res = api.put(
+        f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["id"]}/content',
+        headers={'token': token},
+        params={'name': 'hi.txt'},
+        data=b'HELLO WORLD!',
+    )
+    assert res.status_code == status.HTTP_201_CREATED
+    res = api.get(
+        f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["id"]}',
+        headers={'token': token},
+        params={'method': 'download'}
+    )
+    with zipfile.ZipFile(io.BytesIO(res.content)) as archive:
+        assert archive.read('hi.txt') == b'HELLO WORLD!'
+
+def test_download_directory_archive_format(api: TestClient):
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["id"]}'
+
+    res = api.get(url, headers={'token': token},
+        params={'method': 'download', 'archive': 'tar'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers.get('content-type') == 'application/x-tar'
+    with tarfile.open(fileobj=io.BytesIO(res.content), mode='r:') as archive:
+        assert archive.getnames() == ['hi.txt', 'hi2.txt', 'subdir', 'subdir/hi.txt']
+
+    res = api.get(url, headers={'token': token},
+        params={'method': 'download', 'archive': 'rar'})
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+
+def test_download_directory_over_cache_size(api: TestClient, monkeypatch):
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["id"]}'
+
+    # 하위 파일 크기의 합이 캐시 용량보다 크면 캐시를 거치지 않는다
+    monkeypatch.setitem(SERVER, 'archive-cache-size', 1)
+    before = ArchiveCache.read_stats()
+    res = api.get(url, headers={'token': token},
+        params={'method': 'download', 'archive': 'tar'})
+    assert res.status_code == status.HTTP_200_OK
+    with tarfile.open(fileobj=io.BytesIO(res.content), mode='r:') as archive:
+        assert archive.getnames() == ['hi.txt', 'hi2.txt', 'subdir', 'subdir/hi.txt']
+    after = ArchiveCache.read_stats()
+    assert (after['hits'], after['misses']) == (before['hits'], before['misses'])
+
+
+def test_conditional_info(api: TestClient, monkeypatch):
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["subdir"]["id"]}'
+
+    res = api.get(url, headers={'token': token}, params={'method': 'info'})
+    assert res.status_code == status.HTTP_200_OK
+    etag, last_modified = res.headers['etag'], res.headers['last-modified']
+
+    # 바뀌지 않았으면 디렉토리를 읽지 않고 304
+    def listdir(*args, **kwargs):
+        raise AssertionError('listdir on 304')
+    with monkeypatch.context() as m:
+        m.setattr(os, 'listdir', listdir)
+        res = api.get(url, headers={'token': token, 'if-none-match': etag},
+            params={'method': 'info'})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+        assert res.content == b''
+        assert res.headers['etag'] == etag
+        res = api.get(url, headers={'token': token, 'if-modified-since': last_modified},
+            params={'method': 'info'})
+        assert res.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # 하위 데이터가 바뀌면 ETag도 바뀐다
+    res = api.put(f'{url}/content', params={'name': 'tmp.txt'},
+        headers={'token': token}, data=b'tmp')
+    assert res.status_code == status.HTTP_201_CREATED
+    tmp_id = res.json()['id']
+    res = api.get(url, headers={'token': token, 'if-none-match': etag},
+        params={'method': 'info'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers['etag'] != etag
+    assert (res.json()['size'], res.json()['file_count'], res.json()['total_size']) \
+        == (2, 2, 12 + 3)
+    etag = res.headers['etag']
+    res = api.delete(
+        f'/api/users/{client_info["id"]}/datas/{tmp_id}', headers={'token': token})
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    res = api.get(url, headers={'token': token, 'if-none-match': etag},
+        params={'method': 'info'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json()['size'] == 1
+
+def test_conditional_download(api: TestClient, monkeypatch):
+    email, passwd = client_info['email'], client_info['passwd']
+    token = AppAuthManager().login(email, passwd)
+    url = f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["hi2.txt"]["id"]}'
+
+    res = api.get(url, headers={'token': token}, params={'method': 'download'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers['digest'] == 'sha-256=' + \
+        base64.b64encode(hashlib.sha256(b'hello2').digest()).decode()
+    etag, last_modified = res.headers['etag'], res.headers['last-modified']
+
+    # 304는 파일을 읽지 않는다
+    def pread(*args, **kwargs):
+        raise AssertionError('pread on 304')
+    with monkeypatch.context() as m:
+        m.setattr(os, 'pread', pread)
+        for headers in (
+            {'if-none-match': etag},
+            {'if-none-match': f'"other", W/{etag}'},
+            {'if-modified-since': last_modified},
+        ):
+            res = api.get(url, headers={'token': token, **headers},
+                params={'method': 'download'})
+            assert res.status_code == status.HTTP_304_NOT_MODIFIED
+            assert res.content == b''
+            assert res.headers['etag'] == etag
+
+    # ETag가 다르면 If-Modified-Since는 보지 않는다
+    res = api.get(url,
+        headers={'token': token, 'if-none-match': '"other"', 'if-modified-since': last_modified},
+        params={'method': 'download'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.content == b'hello2'
+
+    # 디렉토리는 weak ETag
+    url = f'/api/users/{client_info["id"]}/datas/{treedir["mydir"]["id"]}'
+    res = api.get(url, headers={'token': token}, params={'method': 'download'})
+    assert res.status_code == status.HTTP_200_OK
+    assert res.headers['etag'].startswith('W/')
+    res = api.get(url, headers={'token': token, 'if-none-match': res.headers['etag']},
+        params={'method': 'download'})
+    assert res.status_code == status.HTTP_304_NOT_MODIFIED
+    res = api.get(url, headers={'token': token, 'if-none-match': res.headers['etag']},
+        params={'method': 'download', 'archive': 'tar'})
+    assert res.status_code == status.HTTP_200_OK
 
 
     """
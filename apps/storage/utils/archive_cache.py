@@ -0,0 +1,316 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from settings.base import SERVER
+
+"""
+디렉토리 압축 파일 캐시
+
+같은 디렉토리를 여러번 다운로드 받을 때 매번 새로 압축하지 않도록
+만들어진 압축 파일을 {storage}/archive-cache 에 저장해둔다.
+
+키는 하위 데이터들의 DataInfo (아이디, 상대 경로, 크기, 수정 시각)로 만든 지문이다.
+하위 데이터가 하나라도 추가/삭제/수정되면 키가 바뀌므로 예전 캐시는 쓰이지 않고
+LRU로 밀려나서 삭제된다.
+"""
+
+
+def archive_fingerprint(entries: Iterable, dir_root: str, *options: str) -> str:
+    """
+    디렉토리 하위 데이터로 캐시 키를 만든다.
+    경로는 디렉토리 기준 상대 경로를 쓰므로 디렉토리 이름만 바뀐 경우에는 그대로 쓸 수 있다.
+
+    :param entries: 디렉토리 하위의 DataInfo 리스트
+    :param dir_root: 디렉토리 루트 (/mydir/)
+    :param options: 압축 형식 등 결과물에 영향을 주는 값
+    """
+    h = hashlib.sha256('\0'.join(options).encode('utf-8'))
+    rows = sorted(
+        (
+            f'{entry.root[len(dir_root):]}{entry.name}',
+            entry.id,
+            bool(entry.is_dir),
+            entry.size or 0,
+            entry.updated.isoformat() if entry.updated else '',
+        ) for entry in entries
+    )
+    for row in rows:
+        h.update(repr(row).encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+class _Build:
+    # 만들고 있는 압축 파일의 진행 상황
+    def __init__(self, key: str, tmp_root: str):
+        self.key = key
+        self.tmp_root = tmp_root
+        self.written = 0
+        self.done = False
+        self.error: Optional[Exception] = None
+        # 따라 읽고 있는 요청 수, 0이 되면 압축을 멈춘다
+        self.readers = 0
+        # 캐시 용량을 넘어서 중단됨, 따라 읽던 요청은 직접 압축한다
+        self.overflow = False
+
+
+class ArchiveCache:
+    """
+    디렉토리 압축 파일 캐시
+
+    - 전체 크기가 SERVER['archive-cache-size']를 넘으면 가장 오래 안쓰인 것부터 삭제한다.
+    - 같은 키에 대한 요청이 동시에 들어오면 압축은 하나만 진행하고
+      나머지 요청은 만들어지고 있는 파일을 따라 읽는다.
+    - 압축은 별도 스레드에서 진행하며, 따라 읽는 요청이 모두 끊기면 멈추고 임시파일을 지운다.
+    - 쓰여진 크기가 캐시 용량을 넘으면 바로 멈추고 임시파일을 지운다.
+      따라 읽던 요청은 직접 압축하면서 이미 보낸 만큼 건너뛴다.
+
+    사용법
+        chunks = ArchiveCache.open(key, lambda: ZipStream(raw_root))
+    """
+    chunk_size = 256 * 1024
+
+    _lock = threading.Lock()
+    _cond = threading.Condition(_lock)
+    # 키: 파일 크기 (오래 안쓰인 순서)
+    _entries: 'OrderedDict[str, int]' = OrderedDict()
+    _total = 0
+    _builds: Dict[str, _Build] = dict()
+    _loaded_root: Optional[str] = None
+    _stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+
+    @staticmethod
+    def root() -> str:
+        return f'{SERVER["storage"]}/archive-cache'
+
+    @staticmethod
+    def enabled() -> bool:
+        return SERVER['archive-cache-size'] > 0
+
+    @classmethod
+    def open(
+        cls,
+        key: str,
+        build: Callable[[], Iterable[bytes]],
+        validate: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[bytes]:
+        """
+        캐시된 압축 파일을 읽는다. 없으면 build로 만들면서 읽는다.
+
+        :param key: archive_fingerprint로 만든 키
+        :param build: 압축 파일 조각을 만드는 함수
+        :param validate: 다 만든 다음 캐시에 저장해도 되는 지 확인하는 함수
+                         (압축하는 동안 디렉토리가 바뀌었으면 저장하지 않는다)
+        """
+        with cls._cond:
+            root = cls.root()
+            cls._load(root)
+            if key in cls._entries:
+                try:
+                    f = open(f'{root}/{key}', 'rb')
+                except FileNotFoundError:
+                    # 밖에서 지워진 경우
+                    cls._total -= cls._entries.pop(key)
+                else:
+                    cls._entries.move_to_end(key)
+                    cls._stats['hits'] += 1
+                    cls._stats['bytes_saved'] += cls._entries[key]
+                    return cls._read(f)
+
+            in_progress = cls._builds.get(key)
+            joined = in_progress is not None
+            if not joined:
+                cls._stats['misses'] += 1
+                os.makedirs(root, exist_ok=True)
+                in_progress = _Build(key, f'{root}/.tmp-{uuid.uuid4().hex}')
+                out = open(in_progress.tmp_root, 'wb', buffering=0)
+                cls._builds[key] = in_progress
+                threading.Thread(
+                    target=cls._build, args=(in_progress, build, validate, out),
+                    name='archive-cache-build', daemon=True).start()
+            else:
+                # 이미 만들고 있는 압축 파일을 같이 읽는다
+                cls._stats['hits'] += 1
+            # 교체되기 전에 열어두면 교체/삭제 후에도 계속 읽을 수 있다
+            f = open(in_progress.tmp_root, 'rb')
+            in_progress.readers += 1
+        return cls._follow(in_progress, f, build, validate, saved=joined)
+
+    @classmethod
+    def read_stats(cls) -> Dict[str, float]:
+        with cls._lock:
+            requests = cls._stats['hits'] + cls._stats['misses']
+            return {
+                'hits': cls._stats['hits'],
+                'misses': cls._stats['misses'],
+                'hit_ratio': cls._stats['hits'] / requests if requests else 0.0,
+                'bytes_saved': cls._stats['bytes_saved'],
+                'entries': len(cls._entries),
+                'size': cls._total,
+                'budget': SERVER['archive-cache-size'],
+            }
+
+    @classmethod
+    def _load(cls, root: str):
+        # 처음 사용할 때 남아있는 캐시 파일을 불러온다 (수정 시각 순서)
+        if cls._loaded_root == root:
+            return
+        cls._entries, cls._total, cls._loaded_root = OrderedDict(), 0, root
+        if not os.path.isdir(root):
+            return
+        files = []
+        for entry in os.scandir(root):
+            if entry.name.startswith('.tmp-'):
+                # 만들다 만 파일
+                os.remove(entry.path)
+            elif entry.is_file():
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(files):
+            cls._entries[name] = size
+            cls._total += size
+        cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        root = cls.root()
+        while cls._total > SERVER['archive-cache-size'] and cls._entries:
+            key, size = cls._entries.popitem(last=False)
+            cls._total -= size
+            try:
+                os.remove(f'{root}/{key}')
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def _build(
+        cls,
+        in_progress: _Build,
+        build: Callable[[], Iterable[bytes]],
+        validate: Optional[Callable[[], bool]],
+        out,
+    ):
+        stopped = False
+        try:
+            with out:
+                chunks = build()
+                try:
+                    for chunk in chunks:
+                        out.write(chunk)
+                        with cls._cond:
+                            in_progress.written += len(chunk)
+                            if in_progress.written > SERVER['archive-cache-size']:
+                                # 캐시에 저장할 수 없으므로 더 만들 필요가 없다
+                                in_progress.overflow = True
+                            stopped = in_progress.overflow or not in_progress.readers
+                            if stopped and cls._builds.get(in_progress.key) is in_progress:
+                                # 새로 들어오는 요청은 따라 읽지 않고 새로 만든다
+                                del cls._builds[in_progress.key]
+                            cls._cond.notify_all()
+                        if stopped:
+                            break
+                finally:
+                    if hasattr(chunks, 'close'):
+                        chunks.close()
+            valid = not stopped and (validate() if validate else True)
+        except Exception as e:
+            with cls._cond:
+                in_progress.error = e
+                cls._end(in_progress)
+            cls._remove(in_progress.tmp_root)
+            return
+
+        # 중단됐거나 만드는 동안 디렉토리가 바뀌었으면 저장하지 않는다
+        cached = False
+        with cls._cond:
+            if valid and cls._loaded_root == os.path.dirname(in_progress.tmp_root):
+                size = in_progress.written
+                try:
+                    os.replace(in_progress.tmp_root, f'{cls._loaded_root}/{in_progress.key}')
+                except OSError:
+                    pass
+                else:
+                    cls._entries[in_progress.key] = size
+                    cls._total += size
+                    cls._evict()
+                    cached = True
+            cls._end(in_progress)
+        if not cached:
+            cls._remove(in_progress.tmp_root)
+
+    @classmethod
+    def _end(cls, in_progress: _Build):
+        # _lock을 잡은 상태에서 호출한다
+        in_progress.done = True
+        if cls._builds.get(in_progress.key) is in_progress:
+            del cls._builds[in_progress.key]
+        cls._cond.notify_all()
+
+    @staticmethod
+    def _remove(root: str):
+        try:
+            os.remove(root)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def _read(cls, f) -> Iterator[bytes]:
+        with f:
+            while chunk := f.read(cls.chunk_size):
+                yield chunk
+
+    @classmethod
+    def _follow(
+        cls,
+        in_progress: _Build,
+        f,
+        build: Callable[[], Iterable[bytes]],
+        validate: Optional[Callable[[], bool]],
+        saved: bool,
+    ) -> Iterator[bytes]:
+        # 만들어지고 있는 파일을 쓰여진 만큼씩 따라 읽는다
+        pos, overflow = 0, False
+        try:
+            with f:
+                while True:
+                    with cls._cond:
+                        while in_progress.written <= pos and not in_progress.done:
+                            cls._cond.wait()
+                        available = in_progress.written - pos
+                        error = in_progress.error
+                        overflow = in_progress.overflow
+                    if overflow:
+                        break
+                    if available > 0:
+                        chunk = f.read(min(available, cls.chunk_size))
+                        pos += len(chunk)
+                        yield chunk
+                    elif error is not None:
+                        raise RuntimeError('archive build failed') from error
+                    else:
+                        break
+        finally:
+            with cls._cond:
+                # 마지막으로 읽던 요청이 끊기면 압축 스레드가 멈춘다
+                in_progress.readers -= 1
+                if saved and not overflow:
+                    cls._stats['bytes_saved'] += pos
+        if overflow:
+            if pos and validate and not validate():
+                # 이미 보낸 부분과 새로 만든 결과물이 다를 수 있다
+                raise RuntimeError('archive source changed')
+            yield from cls._skip(build(), pos)
+
+    @staticmethod
+    def _skip(chunks: Iterable[bytes], size: int) -> Iterator[bytes]:
+        # 앞의 size 바이트를 건너뛴다
+        for chunk in chunks:
+            if size >= len(chunk):
+                size -= len(chunk)
+                continue
+            yield chunk[size:] if size else chunk
+            size = 0
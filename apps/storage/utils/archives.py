@@ -0,0 +1,585 @@
+import os
+import stat
+import struct
+import tarfile
+import time
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Deque, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    # tar.zst 형식은 zstandard가 설치된 경우에만 지원한다.
+    zstandard = None
+
+"""
+디렉토리 다운로드용 스트리밍 압축
+
+임시 파일을 만들지 않고 디렉토리를 순회하면서 바로 압축 바이트를 만들어 보낸다.
+
+zip         파일마다 STORED/DEFLATE를 고른다. 이미 압축된 파일(jpg, mp4, zip 등)은
+            확장자, 파일 시그니처, 앞부분 압축 시험으로 골라내서 압축하지 않는다.
+            파일 크기와 CRC는 다 읽은 다음에 알 수 있으므로 각 파일 뒤에 data descriptor를 붙이고
+            크기나 오프셋이 4GB 근처를 넘으면 Zip64 필드를 사용한다.
+tar         압축하지 않은 tar (PAX)
+tar.zst     tar 전체를 zstd로 압축 (zstandard 설치 필요)
+
+StreamingResponse가 동기 iterator를 threadpool에서 한 조각씩 꺼내므로
+클라이언트가 받는 속도에 맞춰서 읽고 압축한다.
+"""
+
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+_UNIX = 3
+
+ARCHIVE_MEDIA_TYPES = {
+    'zip': 'application/zip',
+    'tar': 'application/x-tar',
+    'tar.zst': 'application/zstd',
+}
+
+# 이미 압축되어 있어서 다시 압축해도 줄어들지 않는 확장자
+INCOMPRESSIBLE_EXTENSIONS = {
+    # 이미지
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif', '.avif',
+    # 영상, 음성
+    '.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi', '.wmv', '.flv',
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac',
+    # 압축 파일, 압축된 문서
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.lz4',
+    '.jar', '.apk', '.docx', '.xlsx', '.pptx', '.odt', '.epub',
+}
+
+# (오프셋, 시그니처)
+_INCOMPRESSIBLE_MAGICS = (
+    (0, b'\xff\xd8\xff'),            # jpeg
+    (0, b'\x89PNG\r\n\x1a\n'),        # png
+    (0, b'GIF8'),                     # gif
+    (8, b'WEBP'),                     # webp
+    (4, b'ftyp'),                     # mp4, mov, heic
+    (0, b'\x1aE\xdf\xa3'),            # mkv, webm
+    (0, b'ID3'),                      # mp3
+    (0, b'OggS'),                     # ogg
+    (0, b'fLaC'),                     # flac
+    (0, b'PK\x03\x04'),               # zip, docx, jar
+    (0, b'\x1f\x8b'),                 # gzip
+    (0, b'BZh'),                      # bzip2
+    (0, b'\xfd7zXZ\x00'),              # xz
+    (0, b'(\xb5/\xfd'),                # zstd
+    (0, b'7z\xbc\xaf\x27\x1c'),         # 7z
+    (0, b'Rar!'),                     # rar
+)
+
+# 앞부분을 시험 압축할 크기와 압축할 가치가 있다고 보는 비율
+_PROBE_SIZE = 64 * 1024
+_PROBE_RATIO = 0.9
+
+
+def archive_formats() -> Tuple[str, ...]:
+    # 지원하는 압축 형식
+    if zstandard is None:
+        return ('zip', 'tar')
+    return ('zip', 'tar', 'tar.zst')
+
+
+def choose_method(name: str, head: bytes, compress_level: int) -> int:
+    """
+    ZIP 엔트리 하나의 압축 방식을 고른다.
+
+    :param name: 파일 이름
+    :param head: 파일의 앞부분
+    :param compress_level: deflate 압축 레벨, 0이면 압축하지 않는다.
+    :return: ZIP_STORED 또는 ZIP_DEFLATED
+    """
+    if compress_level == 0 or not head:
+        return ZIP_STORED
+    if os.path.splitext(name)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return ZIP_STORED
+    for offset, magic in _INCOMPRESSIBLE_MAGICS:
+        if head[offset:offset + len(magic)] == magic:
+            return ZIP_STORED
+    # 가장 빠른 레벨로 앞부분만 압축해보고 거의 줄지 않으면 그대로 저장
+    sample = head[:_PROBE_SIZE]
+    if len(zlib.compress(sample, 1)) > len(sample) * _PROBE_RATIO:
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+
+class ZipEntry(NamedTuple):
+    name: bytes
+    flags: int
+    method: int
+    dostime: int
+    dosdate: int
+    crc: int
+    compress_size: int
+    file_size: int
+    header_offset: int
+    external_attr: int
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dostime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dosdate = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dostime, dosdate
+
+
+def _open_file(path: str) -> BinaryIO:
+    return open(path, 'rb')
+
+
+class DirectoryStream:
+    """
+    root 디렉토리를 순회하면서 압축 바이트를 조각 단위로 내보내는 스트림의 공통 부분
+
+    :param root: 압축할 디렉토리 루트
+    :param skip: 파일 이름을 받아서 제외할 지 판단하는 함수
+    :param opener: 파일을 여는 함수, 리턴한 객체에 size가 있으면 fstat 크기 대신 사용한다.
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        root: str,
+        skip: Optional[Callable[[str], bool]] = None,
+        opener: Optional[Callable[[str], BinaryIO]] = None,
+    ):
+        self.root = root
+        self.skip = skip
+        self.opener = opener or _open_file
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        raise NotImplementedError()
+
+    def _walk(self) -> Iterator[Tuple[str, str, bool]]:
+        # 디렉토리 하나씩 읽어가며 (압축 내 이름, 실제 루트, 디렉토리 여부)를 만든다.
+        for dir_root, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            rel = os.path.relpath(dir_root, self.root)
+            prefix = '' if rel == '.' else rel.replace(os.sep, '/') + '/'
+            if prefix:
+                yield prefix, dir_root, True
+            for name in sorted(filenames):
+                if self.skip and self.skip(name):
+                    continue
+                yield f'{prefix}{name}', os.path.join(dir_root, name), False
+
+    def _write(self, data: bytes):
+        self._buffer += data
+        self._offset += len(data)
+
+    def _flush(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class _PendingEntry:
+    # 아직 출력되지 않은 ZIP 엔트리의 정보
+    def __init__(
+        self, name: bytes, flags: int, method: int,
+        dostime: int, dosdate: int, zip64: bool, external_attr: int
+    ):
+        self.name = name
+        self.flags = flags
+        self.method = method
+        self.dostime = dostime
+        self.dosdate = dosdate
+        self.zip64 = zip64
+        self.external_attr = external_attr
+        self.crc = 0
+        self.compress_size = 0
+        self.file_size = 0
+        self.header_offset = 0
+
+
+def _deflate_block(data: bytes, level: int, zdict: Optional[bytes], final: bool) -> bytes:
+    """
+    파일의 한 블록을 raw deflate로 압축한다.
+    마지막 블록이 아니면 Z_SYNC_FLUSH로 바이트 경계에서 끝내므로
+    블록들의 결과를 순서대로 이어 붙이면 하나의 deflate 스트림이 된다. (pigz와 같은 방식)
+    zdict로 바로 앞 블록의 끝 32KB를 주면 블록 경계에서도 압축률이 유지된다.
+    """
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(data)
+    return data + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # 모든 요청이 같이 쓰는 압축 스레드 (zlib은 압축하는 동안 GIL을 놓는다)
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix='archive-compress')
+        return _executor
+
+
+class ZipStream(DirectoryStream):
+    """
+    root 디렉토리를 ZIP으로 만들면서 조각(bytes) 단위로 내보낸다.
+
+    workers가 2 이상이면 파일을 block_size 단위 블록으로 나눠서 여러 스레드에서 압축하고
+    출력은 원래 순서대로 이어 붙인다. 작은 파일은 파일 하나가 블록 하나가 되므로
+    여러 파일이 동시에 압축된다. 한 요청이 동시에 압축하는 블록은 workers개를 넘지 않는다.
+
+    사용법
+        stream = ZipStream(raw_root, skip=is_upload_temp)
+        return StreamingResponse(stream, media_type='application/zip')
+
+    :param root: 압축할 디렉토리 루트
+    :param skip: 파일 이름을 받아서 제외할 지 판단하는 함수
+    :param compress_level: deflate 압축 레벨 (0이면 전부 STORED)
+    :param workers: 이 요청이 동시에 쓸 수 있는 압축 스레드 수 (1이면 순서대로 압축)
+    :param opener: 파일을 여는 함수
+    """
+    zip64_limit = ZIP64_LIMIT
+    block_size = 1024 * 1024
+
+    def __init__(
+        self,
+        root: str,
+        skip: Optional[Callable[[str], bool]] = None,
+        compress_level: int = 6,
+        workers: int = 1,
+        opener: Optional[Callable[[str], BinaryIO]] = None,
+    ):
+        super().__init__(root, skip, opener)
+        self.compress_level = compress_level
+        self.workers = max(workers, 1)
+        self._entries: List[ZipEntry] = []
+        # 출력 순서대로 대기 중인 항목
+        #   ('header', entry)           로컬 헤더
+        #   ('data', entry, bytes)      압축이 필요 없는 데이터
+        #   ('future', entry, Future)   압축 중인 블록
+        #   ('end', entry)              data descriptor 및 central directory 등록
+        self._pending: Deque[tuple] = deque()
+        self._in_flight = 0
+        self._pending_bytes = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            for arcname, path, is_dir in self._walk():
+                if is_dir:
+                    self._add_directory(arcname, path)
+                else:
+                    yield from self._add_file(arcname, path)
+                yield from self._drain()
+            yield from self._drain(wait_all=True)
+            self._write_central_directory()
+            yield self._flush()
+        finally:
+            # 클라이언트가 끊긴 경우 아직 시작하지 않은 압축 작업은 취소
+            for item in self._pending:
+                if item[0] == 'future':
+                    item[2].cancel()
+
+    def _local_header(
+        self, name: bytes, flags: int, method: int,
+        dostime: int, dosdate: int, zip64: bool
+    ) -> bytes:
+        if zip64:
+            # 크기는 data descriptor에 기록되므로 0으로 둔다
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+            size = 0xFFFFFFFF
+        else:
+            extra = b''
+            size = 0
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50,
+            _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT,
+            flags, method, dostime, dosdate,
+            0, size, size, len(name), len(extra)) + name + extra
+
+    def _drain(self, wait_all: bool = False) -> Iterator[bytes]:
+        """
+        대기 중인 항목을 순서대로 출력한다.
+        앞에 있는 블록의 압축이 끝나지 않았으면 기다리지 않고 멈추지만
+        동시에 압축 중인 블록이 workers개 이상이거나 쌓인 데이터가 많으면 기다린다.
+        """
+        limit_bytes = self.block_size * self.workers
+        while self._pending:
+            item = self._pending[0]
+            if item[0] == 'future' and not item[2].done() and not wait_all \
+                    and self._in_flight < self.workers \
+                    and self._pending_bytes < limit_bytes:
+                break
+            self._pending.popleft()
+            kind, entry = item[0], item[1]
+            if kind == 'header':
+                entry.header_offset = self._offset
+                self._write(self._local_header(
+                    entry.name, entry.flags, entry.method,
+                    entry.dostime, entry.dosdate, entry.zip64))
+            elif kind == 'data':
+                self._pending_bytes -= len(item[2])
+                entry.compress_size += len(item[2])
+                self._write(item[2])
+            elif kind == 'future':
+                self._in_flight -= 1
+                data = item[2].result()
+                entry.compress_size += len(data)
+                self._write(data)
+            else:
+                self._end_entry(entry)
+            if len(self._buffer) >= self.chunk_size:
+                yield self._flush()
+
+    def _end_entry(self, entry: _PendingEntry):
+        if entry.flags & _FLAG_DATA_DESCRIPTOR:
+            if not entry.zip64 \
+                    and max(entry.file_size, entry.compress_size) > self.zip64_limit:
+                # 파일은 교체로만 저장되므로 열린 파일이 커질 일은 없다
+                raise RuntimeError(
+                    f'File {entry.name.decode("utf-8")} grew while archiving.')
+            if entry.zip64:
+                self._write(struct.pack(
+                    '<IIQQ', 0x08074b50, entry.crc, entry.compress_size, entry.file_size))
+            else:
+                self._write(struct.pack(
+                    '<IIII', 0x08074b50, entry.crc, entry.compress_size, entry.file_size))
+        self._entries.append(ZipEntry(
+            name=entry.name, flags=entry.flags, method=entry.method,
+            dostime=entry.dostime, dosdate=entry.dosdate, crc=entry.crc,
+            compress_size=entry.compress_size, file_size=entry.file_size,
+            header_offset=entry.header_offset,
+            external_attr=entry.external_attr))
+
+    def _add_directory(self, arcname: str, path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        dostime, dosdate = _dos_datetime(st.st_mtime)
+        entry = _PendingEntry(
+            name=arcname.encode('utf-8'), flags=_FLAG_UTF8, method=ZIP_STORED,
+            dostime=dostime, dosdate=dosdate, zip64=False,
+            external_attr=((st.st_mode & 0xFFFF) << 16) | 0x10)
+        self._pending.append(('header', entry))
+        self._pending.append(('end', entry))
+
+    def _add_file(self, arcname: str, path: str) -> Iterator[bytes]:
+        try:
+            f = self.opener(path)
+        except FileNotFoundError:
+            # 순회하는 사이에 삭제된 파일
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                return
+            size = getattr(f, 'size', st.st_size)
+            read_size = self.block_size if self.workers > 1 else self.chunk_size
+            chunk = f.read(read_size)
+            dostime, dosdate = _dos_datetime(st.st_mtime)
+            entry = _PendingEntry(
+                name=arcname.encode('utf-8'),
+                flags=_FLAG_UTF8 | _FLAG_DATA_DESCRIPTOR,
+                method=choose_method(arcname, chunk, self.compress_level),
+                dostime=dostime, dosdate=dosdate,
+                # deflate 결과가 원본보다 약간 커질 수 있으므로 여유를 둔다 (zipfile과 동일)
+                zip64=size * 1.05 > self.zip64_limit,
+                external_attr=(st.st_mode & 0xFFFF) << 16)
+            self._pending.append(('header', entry))
+
+            compressor = None
+            if entry.method == ZIP_DEFLATED and self.workers == 1:
+                compressor = zlib.compressobj(
+                    self.compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            zdict = None
+            while chunk:
+                next_chunk = f.read(read_size)
+                entry.file_size += len(chunk)
+                entry.crc = zlib.crc32(chunk, entry.crc)
+                if entry.method == ZIP_STORED:
+                    self._pending.append(('data', entry, chunk))
+                    self._pending_bytes += len(chunk)
+                elif compressor:
+                    data = compressor.compress(chunk)
+                    if not next_chunk:
+                        data += compressor.flush()
+                    self._pending.append(('data', entry, data))
+                    self._pending_bytes += len(data)
+                else:
+                    future = _get_executor().submit(
+                        _deflate_block, chunk, self.compress_level, zdict, not next_chunk)
+                    self._pending.append(('future', entry, future))
+                    self._in_flight += 1
+                    zdict = chunk[-32 * 1024:]
+                yield from self._drain()
+                chunk = next_chunk
+            self._pending.append(('end', entry))
+
+    def _write_central_directory(self):
+        limit = self.zip64_limit
+        cd_offset = self._offset
+        for entry in self._entries:
+            # 4바이트를 넘는 값은 Zip64 extra field에 순서대로 기록한다
+            extra_values = []
+            file_size, compress_size, header_offset = \
+                entry.file_size, entry.compress_size, entry.header_offset
+            if file_size > limit:
+                extra_values.append(file_size)
+                file_size = 0xFFFFFFFF
+            if compress_size > limit:
+                extra_values.append(compress_size)
+                compress_size = 0xFFFFFFFF
+            if header_offset > limit:
+                extra_values.append(header_offset)
+                header_offset = 0xFFFFFFFF
+            extra = b''
+            version = _VERSION_DEFAULT
+            if extra_values:
+                extra = struct.pack(
+                    f'<HH{len(extra_values)}Q',
+                    0x0001, 8 * len(extra_values), *extra_values)
+                version = _VERSION_ZIP64
+            self._write(struct.pack(
+                '<IBBHHHHHIIIHHHHHII', 0x02014b50,
+                version, _UNIX, version, entry.flags, entry.method,
+                entry.dostime, entry.dosdate, entry.crc,
+                compress_size, file_size,
+                len(entry.name), len(extra), 0, 0, 0,
+                entry.external_attr, header_offset) + entry.name + extra)
+
+        count = len(self._entries)
+        cd_size = self._offset - cd_offset
+        if count > 0xFFFF or cd_size > limit or cd_offset > limit:
+            # Zip64 end of central directory record + locator
+            zip64_offset = self._offset
+            self._write(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44,
+                _VERSION_ZIP64, _VERSION_ZIP64, 0, 0,
+                count, count, cd_size, cd_offset))
+            self._write(struct.pack('<IIQI', 0x07064b50, 0, zip64_offset, 1))
+        self._write(struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0,
+            min(count, 0xFFFF), min(count, 0xFFFF),
+            min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF), 0))
+
+
+class TarStream(DirectoryStream):
+    """
+    root 디렉토리를 압축하지 않은 tar (PAX)로 만들면서 조각 단위로 내보낸다.
+    """
+
+    def __iter__(self) -> Iterator[bytes]:
+        for arcname, path, is_dir in self._walk():
+            if is_dir:
+                self._write_directory(arcname, path)
+            else:
+                yield from self._write_file(arcname, path)
+            if len(self._buffer) >= self.chunk_size:
+                yield self._flush()
+        # 끝을 나타내는 빈 블록 2개, 전체를 레코드 크기에 맞춘다
+        self._write(tarfile.NUL * (tarfile.BLOCKSIZE * 2))
+        remainder = self._offset % tarfile.RECORDSIZE
+        if remainder:
+            self._write(tarfile.NUL * (tarfile.RECORDSIZE - remainder))
+        yield self._flush()
+
+    def _header(self, info: tarfile.TarInfo) -> bytes:
+        return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+    def _write_directory(self, arcname: str, path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return
+        info = tarfile.TarInfo(arcname)
+        info.type = tarfile.DIRTYPE
+        info.mode = st.st_mode & 0o7777
+        info.mtime = int(st.st_mtime)
+        self._write(self._header(info))
+
+    def _write_file(self, arcname: str, path: str) -> Iterator[bytes]:
+        try:
+            f = self.opener(path)
+        except FileNotFoundError:
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                return
+            size = getattr(f, 'size', st.st_size)
+            info = tarfile.TarInfo(arcname)
+            info.size = size
+            info.mode = st.st_mode & 0o7777
+            info.mtime = int(st.st_mtime)
+            self._write(self._header(info))
+
+            remaining = size
+            while remaining:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    raise RuntimeError(f'File at path {path} shrank while archiving.')
+                remaining -= len(chunk)
+                self._write(chunk)
+                if len(self._buffer) >= self.chunk_size:
+                    yield self._flush()
+            padding = size % tarfile.BLOCKSIZE
+            if padding:
+                self._write(tarfile.NUL * (tarfile.BLOCKSIZE - padding))
+
+
+def zstd_stream(chunks: Iterable[bytes], level: int = 3, workers: int = 1) -> Iterator[bytes]:
+    # 조각들을 하나의 zstd 프레임으로 압축 (workers가 2 이상이면 zstd 자체 멀티스레드 사용)
+    compressor = zstandard.ZstdCompressor(
+        level=level, threads=workers if workers > 1 else 0).compressobj()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def archive_stream(
+    root: str,
+    archive: str = 'zip',
+    skip: Optional[Callable[[str], bool]] = None,
+    compress_level: int = 6,
+    workers: int = 1,
+    opener: Optional[Callable[[str], BinaryIO]] = None,
+) -> Iterable[bytes]:
+    """
+    형식에 맞는 디렉토리 압축 스트림을 만든다.
+
+    :param archive: 압축 형식 (archive_formats 중 하나)
+    :param compress_level: zip은 deflate 레벨, tar.zst는 zstd 레벨로 사용한다.
+    :param workers: 이 스트림이 동시에 쓸 수 있는 압축 스레드 수
+    :param opener: 파일을 여는 함수 (기본값: open)
+    """
+    if archive not in archive_formats():
+        raise ValueError(f'unsupported archive format: {archive}')
+    if archive == 'zip':
+        return ZipStream(
+            root, skip=skip, compress_level=compress_level, workers=workers,
+            opener=opener)
+    elif archive == 'tar':
+        return TarStream(root, skip=skip, opener=opener)
+    else:
+        return zstd_stream(
+            TarStream(root, skip=skip, opener=opener),
+            level=max(compress_level, 1), workers=workers)
@@ -0,0 +1,136 @@
+import base64
+import hashlib
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from apps.storage.utils.chunk_store import data_size, open_data
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from settings.base import SERVER
+
+"""
+파일 체크섬
+
+업로드 데이터를 디스크에 쓰면서 같이 계산하므로 파일을 다시 읽지 않는다.
+    sha256  항상 계산, 무결성 확인용
+    adler32 SERVER['checksum-fast']일 때만 계산, 빠른 비교용
+다운로드 시 Digest 헤더(RFC 3230)로 보낸다.
+"""
+
+
+class ContentHasher:
+    """
+    데이터가 들어오는 순서대로 체크섬을 계산한다.
+
+    사용법
+        hasher = ContentHasher()
+        hasher.update(chunk)
+        hasher.apply(data_format)   # DataInfoCreate에 체크섬 반영
+
+    :param fast: adler32 계산 여부 (None이면 SERVER['checksum-fast'])
+    """
+    def __init__(self, fast: Optional[bool] = None):
+        self.fast = SERVER['checksum-fast'] if fast is None else fast
+        self.length = 0
+        self._sha256 = hashlib.sha256()
+        self._adler32 = 1
+
+    def update(self, data: bytes):
+        # hashlib은 큰 데이터에 대해 GIL을 풀기 때문에 threadpool에서 호출한다.
+        self._sha256.update(data)
+        if self.fast:
+            self._adler32 = zlib.adler32(data, self._adler32)
+        self.length += len(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def adler32(self) -> Optional[str]:
+        return f'{self._adler32:08x}' if self.fast else None
+
+    def apply(self, data_format):
+        """
+        DataInfoCreate에 체크섬을 반영한다.
+        """
+        data_format.sha256 = self.sha256
+        data_format.adler32 = self.adler32
+
+
+def hash_file(
+    root: str,
+    fast: Optional[bool] = None,
+    hasher: Optional[ContentHasher] = None,
+    offset: int = 0,
+    chunk_size: int = 1024 * 1024,
+) -> ContentHasher:
+    """
+    이미 저장된 파일의 체크섬을 계산한다.
+
+    :param root: 파일의 실제 루트
+    :param fast: adler32 계산 여부
+    :param hasher: 이어서 계산할 hasher (offset 앞부분은 이미 계산됨)
+    :param offset: 계산을 시작할 위치
+    """
+    hasher = hasher or ContentHasher(fast)
+    with open_data(root) as f:
+        f.seek(offset)
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher
+
+
+def digest_header(sha256: Optional[str], adler32: Optional[str] = None) -> Optional[str]:
+    """
+    Digest 헤더 값 (RFC 3230)
+    sha-256은 base64, adler32는 16진수 8자리로 표현한다.
+    """
+    if not sha256:
+        return None
+    digests = [f'sha-256={base64.b64encode(bytes.fromhex(sha256)).decode("ascii")}']
+    if adler32:
+        digests.append(f'adler32={adler32}')
+    return ', '.join(digests)
+
+
+def backfill_checksums(
+    workers: Optional[int] = None, batch_size: int = 500
+) -> Tuple[int, int]:
+    """
+    체크섬이 없는 기존 파일들을 병렬로 계산해서 DB에 반영한다.
+    계산하는 동안 파일이 교체되었거나 DB 크기와 다르면 건너뛴다.
+    그 사이 업로드로 체크섬이 채워진 경우에는 덮어쓰지 않는다.
+
+    :param workers: 계산 스레드 수 (기본값: CPU 코어 수)
+    :param batch_size: 한번에 DB에 반영하는 개수
+
+    :return: (반영한 파일 수, 건너뛴 파일 수)
+    """
+    def compute(row) -> Optional[Tuple[int, str, Optional[str]]]:
+        data_id, user_id, root, name, size = row
+        raw_root = f'{SERVER["storage"]}/storage/{user_id}/root{root}{name}'
+        try:
+            before = os.stat(raw_root)
+            if data_size(raw_root) != size:
+                return None
+            hasher = hash_file(raw_root)
+            after = os.stat(raw_root)
+        except OSError:
+            return None
+        if (before.st_ino, before.st_mtime_ns) != (after.st_ino, after.st_mtime_ns) \
+                or hasher.length != size:
+            return None
+        return data_id, hasher.sha256, hasher.adler32
+
+    updated = skipped = 0
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        while rows := DataDBQuery().read_unhashed(last_id, batch_size):
+            last_id = rows[-1][0]
+            results: List = list(pool.map(compute, rows))
+            checksums = [result for result in results if result]
+            updated += DataDBQuery().update_checksums(checksums)
+            skipped += len(rows) - len(checksums)
+    return updated, skipped
@@ -0,0 +1,594 @@
+import bisect
+import hashlib
+import hmac
+import math
+import os
+import shutil
+import struct
+import threading
+import uuid
+from collections import Counter
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from apps.storage.utils.durability import fsync_root, replace, replace_async
+from apps.storage.utils.queries.data_chunk_query import DataChunkQuery
+from settings.base import DURABILITY_NONE, SERVER
+
+"""
+청크 저장소 (STORAGE_BACKEND=chunks)
+
+같은 설치 파일이나 데이터셋이 반복해서 올라오는 경우를 위해
+파일을 내용 기준(content-defined)으로 청크로 나누고, 같은 청크는 한번만 저장한다.
+
+    {storage}/chunks/ab/cd/abcd...      청크 파일 (이름은 sha256)
+    {storage}/chunks/manifest.key       매니페스트 서명용 저장소 키
+    {storage}/storage/{user_id}/root/.. 매니페스트 (청크 목록)
+
+사용자 경로에는 원래 파일 대신 매니페스트가 저장되므로 이름 변경, 디렉토리 구조는 그대로이며
+읽을 때 청크들을 이어서 원래 파일로 보여준다.
+청크의 참조 수는 DB(DataChunk)에 기록하고 0이 되면 청크 파일을 삭제한다.
+DataInfo.size는 원래 파일 크기이므로 용량 계산은 논리 크기 기준 그대로다.
+
+매니페스트에는 저장소 키({storage}/chunks/manifest.key)로 만든 HMAC이 붙어 있어서
+사용자가 매니페스트 형식의 파일을 올려도 매니페스트로 취급되지 않는다.
+저장소 키는 처음 매니페스트를 만들 때 무작위로 생성되며 인증 키(JWT_KEY)와는 무관하다.
+키가 바뀌거나 지워지면 저장된 매니페스트를 더 이상 읽을 수 없으므로 절대 바꾸면 안된다.
+STORAGE_BACKEND를 files로 되돌려도 이미 저장된 매니페스트는 계속 읽을 수 있다.
+"""
+
+MANIFEST_MAGIC = b'CMCHUNK1'
+_MAC_SIZE = 32
+# 전체 크기, 청크 수
+_MANIFEST_HEADER = struct.Struct('<QI')
+# 청크 sha256, 청크 크기
+_MANIFEST_ENTRY = struct.Struct('<32sI')
+_MANIFEST_PREFIX = len(MANIFEST_MAGIC) + _MAC_SIZE + _MANIFEST_HEADER.size
+
+# 바이트마다 0/1을 정해둔 표 (고정값이어야 경계가 항상 같다)
+_BIT_TABLE = bytes(
+    hashlib.sha256(b'cloudmodular-chunk' + bytes([i])).digest()[0] & 1
+    for i in range(256)
+)
+
+ManifestEntry = Tuple[bytes, int]
+
+
+class Chunker:
+    """
+    내용 기준 청크 분할
+
+    각 바이트를 표로 0/1로 바꾼 다음, 1이 연속으로 pattern_size개 나오는 위치를 경계로 삼는다.
+    경계는 바로 앞 pattern_size 바이트로만 결정되므로 파일 중간에 데이터가 끼어들어도
+    그 뒤의 경계는 다시 같은 자리로 돌아온다.
+    바이트 단위 rolling hash 대신 bytes.translate와 find를 써서 파이썬에서도 빠르게 나눈다.
+
+    :param avg_size: 평균 청크 크기 (byte), 최소 avg_size/4, 최대 avg_size*4
+    """
+    def __init__(self, avg_size: int):
+        self.min_size = max(avg_size // 4, 64)
+        self.max_size = max(avg_size * 4, self.min_size * 2)
+        # 연속 k개가 나올 때까지 평균 2^(k+1) 바이트
+        k = round(math.log2(max(avg_size - self.min_size, 4))) - 1
+        self._pattern = b'\x01' * min(max(k, 1), self.min_size - 1)
+        self._step = max(avg_size, len(self._pattern) * 2)
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        데이터를 넣고 경계가 확정된 청크들을 받는다.
+        """
+        self._buffer += data
+        chunks = []
+        while len(self._buffer) >= self.max_size:
+            chunks.append(self._cut())
+        return chunks
+
+    def finish(self) -> List[bytes]:
+        """
+        남은 데이터를 청크로 나눈다.
+        """
+        chunks = []
+        while self._buffer:
+            chunks.append(self._cut())
+        return chunks
+
+    def _boundary(self) -> int:
+        buf = self._buffer
+        end = min(len(buf), self.max_size)
+        if end <= self.min_size:
+            return end
+        k = len(self._pattern)
+        pos = self.min_size - k
+        while True:
+            block_end = min(pos + self._step, end)
+            i = buf[pos:block_end].translate(_BIT_TABLE).find(self._pattern)
+            if i >= 0:
+                return pos + i + k
+            if block_end == end:
+                return end
+            # 블록 경계에 걸친 패턴도 찾을 수 있게 겹쳐서 읽는다
+            pos = block_end - (k - 1)
+
+    def _cut(self) -> bytes:
+        cut = self._boundary()
+        chunk = bytes(self._buffer[:cut])
+        del self._buffer[:cut]
+        return chunk
+
+
+_KEY_SIZE = 32
+_key_lock = threading.Lock()
+_keys: Dict[str, bytes] = dict()
+
+
+def _manifest_key(create: bool = False) -> Optional[bytes]:
+    """
+    매니페스트 서명용 저장소 키
+    저장소에 한번 만들어진 키는 바뀌지 않아야 한다.
+
+    :param create: 키가 없으면 새로 만든다.
+    :return: 키가 없으면 None (저장된 매니페스트도 없다)
+    """
+    path = f'{ChunkStore.root()}/manifest.key'
+    key = _keys.get(path)
+    # 저장소를 통째로 지운 경우 다시 읽는다
+    if key is not None and os.path.exists(path):
+        return key
+    with _key_lock:
+        if not os.path.exists(path):
+            if not create:
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{uuid.uuid4().hex}'
+            with open(tmp, 'wb') as f:
+                f.write(os.urandom(_KEY_SIZE))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                # 이미 있으면 실패하므로 먼저 만든 키가 유지된다
+                os.link(tmp, path)
+                fsync_root(os.path.dirname(path))
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp)
+        with open(path, 'rb') as f:
+            key = f.read()
+        if len(key) != _KEY_SIZE:
+            raise ValueError(f'invalid chunk manifest key: {path}')
+        _keys[path] = key
+        return key
+
+
+def encode_manifest(entries: List[ManifestEntry]) -> bytes:
+    """
+    청크 목록으로 매니페스트를 만든다.
+
+    :param entries: [(청크 sha256 digest, 청크 크기)]
+    """
+    body = _MANIFEST_HEADER.pack(sum(size for _, size in entries), len(entries)) \
+        + b''.join(_MANIFEST_ENTRY.pack(digest, size) for digest, size in entries)
+    mac = hmac.new(_manifest_key(create=True), body, hashlib.sha256).digest()
+    return MANIFEST_MAGIC + mac + body
+
+
+def decode_manifest(data: bytes) -> Optional[List[ManifestEntry]]:
+    """
+    매니페스트를 청크 목록으로 바꾼다.
+    매니페스트가 아니거나 서명이 맞지 않으면 None
+    """
+    if len(data) < _MANIFEST_PREFIX or not data.startswith(MANIFEST_MAGIC):
+        return None
+    body = data[len(MANIFEST_MAGIC) + _MAC_SIZE:]
+    total, count = _MANIFEST_HEADER.unpack_from(body)
+    if len(body) != _MANIFEST_HEADER.size + count * _MANIFEST_ENTRY.size:
+        return None
+    key = _manifest_key()
+    if key is None:
+        return None
+    mac = hmac.new(key, body, hashlib.sha256).digest()
+    if not hmac.compare_digest(mac, data[len(MANIFEST_MAGIC):len(MANIFEST_MAGIC) + _MAC_SIZE]):
+        return None
+    entries = list(_MANIFEST_ENTRY.iter_unpack(body[_MANIFEST_HEADER.size:]))
+    if sum(size for _, size in entries) != total:
+        return None
+    return entries
+
+
+def _read_manifest_file(f: BinaryIO) -> Optional[List[ManifestEntry]]:
+    # 앞부분만 보고 매니페스트가 아니면 바로 포기한다
+    head = f.read(_MANIFEST_PREFIX)
+    if len(head) < _MANIFEST_PREFIX or not head.startswith(MANIFEST_MAGIC):
+        return None
+    _, count = _MANIFEST_HEADER.unpack_from(head, _MANIFEST_PREFIX - _MANIFEST_HEADER.size)
+    if os.fstat(f.fileno()).st_size != _MANIFEST_PREFIX + count * _MANIFEST_ENTRY.size:
+        return None
+    return decode_manifest(head + f.read())
+
+
+def _counts(entries: Iterable[ManifestEntry]) -> Counter:
+    return Counter(digest.hex() for digest, _ in entries)
+
+
+class ChunkStore:
+    """
+    청크 파일과 참조 수 관리
+
+    - 저장 중이거나 읽고 있는 청크는 pin 해두고, 참조 수가 0이 되어도 pin이 풀릴 때까지 삭제하지 않는다.
+    - 참조 수가 0인 청크(_orphans)는 pin이 모두 풀리면 삭제한다.
+    - 같은 경로의 매니페스트 교체/삭제는 경로별 lock으로 순서를 맞춘다.
+    lock은 프로세스 안에서만 유효하므로 한 저장소를 여러 프로세스가 같이 쓰면 안된다.
+    """
+    _lock = threading.Lock()
+    _pins: Counter = Counter()
+    _orphans = set()
+    _path_locks = [threading.Lock() for _ in range(64)]
+
+    @staticmethod
+    def root() -> str:
+        return f'{SERVER["storage"]}/chunks'
+
+    @staticmethod
+    def enabled() -> bool:
+        # 새로 저장하는 파일을 청크로 나눌 지 여부
+        return SERVER['storage-backend'] == 'chunks'
+
+    @classmethod
+    def used(cls) -> bool:
+        # 저장된 매니페스트가 있을 수 있는 지 여부
+        # 한번도 청크 저장소를 쓰지 않았으면 매니페스트 확인을 건너뛴다.
+        return cls.enabled() or os.path.isdir(cls.root())
+
+    @classmethod
+    def path(cls, chunk_hash: str) -> str:
+        return f'{cls.root()}/{chunk_hash[:2]}/{chunk_hash[2:4]}/{chunk_hash}'
+
+    @classmethod
+    def path_lock(cls, root: str) -> threading.Lock:
+        return cls._path_locks[hash(root) % len(cls._path_locks)]
+
+    @classmethod
+    def put(cls, chunk_hash: str, data: bytes):
+        """
+        청크를 pin 하고, 저장되어 있지 않으면 저장한다.
+        참조 수는 ref로 따로 올린다.
+        """
+        path = cls.path(chunk_hash)
+        with cls._lock:
+            cls._pins[chunk_hash] += 1
+            if os.path.isfile(path):
+                return
+            # 참조되기 전까지는 삭제 대상
+            cls._orphans.add(chunk_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_root = f'{path}.tmp-{uuid.uuid4().hex}'
+        durable = SERVER['storage-durability'] != DURABILITY_NONE
+        try:
+            with open(tmp_root, 'wb') as f:
+                f.write(data)
+                f.flush()
+                if durable:
+                    # 매니페스트보다 청크가 먼저 디스크에 반영되어야 한다
+                    os.fsync(f.fileno())
+            os.replace(tmp_root, path)
+        except Exception as e:
+            if os.path.isfile(tmp_root):
+                os.remove(tmp_root)
+            cls.unpin([chunk_hash])
+            raise e
+        if durable:
+            fsync_root(os.path.dirname(path))
+
+    @classmethod
+    def ref(cls, counts: Counter, sizes: Dict[str, int]):
+        """
+        참조 수를 올린다.
+
+        :param counts: {청크 해시: 올릴 참조 수}
+        :param sizes: {청크 해시: 청크 크기}
+        """
+        with cls._lock:
+            DataChunkQuery().add_refs({
+                chunk_hash: (sizes[chunk_hash], count)
+                for chunk_hash, count in counts.items()
+            })
+            cls._orphans.difference_update(counts)
+
+    @classmethod
+    def release(cls, counts: Counter):
+        """
+        참조 수를 내리고 더 이상 참조되지 않는 청크를 삭제한다.
+        """
+        with cls._lock:
+            removed = DataChunkQuery().remove_refs(dict(counts))
+            cls._orphans.update(removed)
+            cls._delete_unpinned(removed)
+
+    @classmethod
+    def pin(cls, hashes: Iterable[str]):
+        with cls._lock:
+            cls._pins.update(hashes)
+
+    @classmethod
+    def unpin(cls, hashes: Iterable[str]):
+        with cls._lock:
+            hashes = list(hashes)
+            cls._pins.subtract(hashes)
+            cls._delete_unpinned(hashes)
+
+    @classmethod
+    def _delete_unpinned(cls, hashes: Iterable[str]):
+        for chunk_hash in set(hashes):
+            if cls._pins[chunk_hash] > 0:
+                continue
+            cls._pins.pop(chunk_hash, None)
+            if chunk_hash in cls._orphans:
+                cls._orphans.discard(chunk_hash)
+                try:
+                    os.remove(cls.path(chunk_hash))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def read_stats() -> Dict[str, int]:
+        """
+        :return: 청크 수, 실제 저장된 크기, 참조 기준(논리) 크기
+        """
+        count, stored, logical = DataChunkQuery().read_stats()
+        return {'chunks': count, 'stored': stored, 'logical': logical}
+
+
+class ChunkWriter:
+    """
+    파일 데이터를 청크로 나눠서 저장하고 매니페스트를 만든다.
+
+    사용법
+        writer = ChunkWriter()
+        try:
+            writer.write(data)
+            manifest = writer.finish()  # 참조 수 반영
+            ... manifest를 임시파일에 쓰고 replace_data로 교체
+            writer.commit()
+        finally:
+            writer.close()              # commit 하지 않았으면 참조 수를 되돌린다
+
+    :param avg_size: 평균 청크 크기 (기본값: SERVER['chunk-avg-size'])
+    """
+    def __init__(self, avg_size: Optional[int] = None):
+        self._chunker = Chunker(avg_size or SERVER['chunk-avg-size'])
+        self._entries: List[ManifestEntry] = []
+        self._refs: Optional[Counter] = None
+        self._committed = False
+        self.length = 0
+
+    def write(self, data: bytes):
+        for chunk in self._chunker.feed(data):
+            self._put(chunk)
+        self.length += len(data)
+
+    def _put(self, chunk: bytes):
+        digest = hashlib.sha256(chunk).digest()
+        ChunkStore.put(digest.hex(), chunk)
+        self._entries.append((digest, len(chunk)))
+
+    def finish(self) -> bytes:
+        """
+        남은 데이터를 저장하고 참조 수를 올린 다음 매니페스트를 리턴한다.
+        """
+        for chunk in self._chunker.finish():
+            self._put(chunk)
+        counts = _counts(self._entries)
+        ChunkStore.ref(counts, {digest.hex(): size for digest, size in self._entries})
+        self._refs = counts
+        return encode_manifest(self._entries)
+
+    def commit(self):
+        self._committed = True
+
+    def close(self):
+        if self._refs is not None and not self._committed:
+            ChunkStore.release(self._refs)
+        self._refs = None
+        ChunkStore.unpin(digest.hex() for digest, _ in self._entries)
+        self._entries = []
+
+
+class ChunkedFile:
+    """
+    매니페스트로 청크들을 이어서 원래 파일처럼 읽는다.
+    매니페스트 파일은 열어둔 채로 fileno()로 제공하므로 fstat은 매니페스트 기준이고
+    실제 크기는 size로 확인한다.
+    열려있는 동안 청크들을 pin 해서 그 사이 파일이 삭제되어도 끝까지 읽을 수 있다.
+    """
+    def __init__(self, f: BinaryIO, entries: List[ManifestEntry]):
+        self._f = f
+        self._hashes = [digest.hex() for digest, _ in entries]
+        self._sizes = [size for _, size in entries]
+        self._offsets = []
+        offset = 0
+        for size in self._sizes:
+            self._offsets.append(offset)
+            offset += size
+        self.size = offset
+        self._pos = 0
+        # 마지막으로 읽은 청크 (index, fd)
+        self._current: Optional[Tuple[int, int]] = None
+        ChunkStore.pin(self._hashes)
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def pread(self, length: int, offset: int) -> bytes:
+        parts = []
+        while length > 0 and offset < self.size:
+            i = bisect.bisect_right(self._offsets, offset) - 1
+            start = offset - self._offsets[i]
+            n = min(length, self._sizes[i] - start)
+            data = os.pread(self._chunk_fd(i), n, start)
+            if not data:
+                raise RuntimeError(f'Chunk {self._hashes[i]} is truncated.')
+            parts.append(data)
+            offset += len(data)
+            length -= len(data)
+        return b''.join(parts)
+
+    def _chunk_fd(self, i: int) -> int:
+        if self._current is None or self._current[0] != i:
+            fd = os.open(ChunkStore.path(self._hashes[i]), os.O_RDONLY)
+            self._close_chunk()
+            self._current = (i, fd)
+        return self._current[1]
+
+    def _close_chunk(self):
+        if self._current is not None:
+            os.close(self._current[1])
+            self._current = None
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self._pos
+        data = self.pread(size, self._pos)
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._close_chunk()
+        self._f.close()
+        ChunkStore.unpin(self._hashes)
+
+    def __enter__(self) -> 'ChunkedFile':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_manifest(root: str) -> Optional[List[ManifestEntry]]:
+    """
+    root가 매니페스트면 청크 목록, 일반 파일이거나 없으면 None
+    """
+    if not ChunkStore.used():
+        return None
+    try:
+        with open(root, 'rb') as f:
+            return _read_manifest_file(f)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+
+
+def open_data(root: str) -> Union[BinaryIO, ChunkedFile]:
+    """
+    사용자 데이터 파일을 읽기용으로 연다.
+    매니페스트면 ChunkedFile, 아니면 일반 파일
+    """
+    if not ChunkStore.used():
+        return open(root, 'rb')
+    with ChunkStore.path_lock(root):
+        # 매니페스트가 교체/삭제되기 전에 청크를 pin 한다
+        f = open(root, 'rb')
+        try:
+            entries = _read_manifest_file(f)
+        except Exception as e:
+            f.close()
+            raise e
+        if entries is None:
+            f.seek(0)
+            return f
+        return ChunkedFile(f, entries)
+
+
+def ref_manifest(root: str) -> Optional[Tuple[bytes, Counter]]:
+    """
+    root가 매니페스트면 청크들의 참조 수를 하나씩 올린다.
+    새 경로에 같은 내용의 매니페스트를 만들 때 사용한다. (매니페스트는 링크하지 않는다)
+
+    :return: (새로 저장할 매니페스트, 올린 참조 수), 매니페스트가 아니면 None
+    """
+    if not ChunkStore.used():
+        return None
+    with ChunkStore.path_lock(root):
+        # 참조 수를 올리기 전에 매니페스트가 삭제되지 않도록 한다
+        entries = read_manifest(root)
+        if entries is None:
+            return None
+        counts = _counts(entries)
+        ChunkStore.ref(counts, {digest.hex(): size for digest, size in entries})
+    return encode_manifest(entries), counts
+
+
+def data_size(root: str) -> int:
+    """
+    사용자 데이터 파일의 실제(논리) 크기
+    """
+    entries = read_manifest(root)
+    if entries is None:
+        return os.path.getsize(root)
+    return sum(size for _, size in entries)
+
+
+def replace_data(src: str, dst: str):
+    """
+    src를 dst로 교체한다. (durability.replace)
+    dst가 매니페스트였으면 교체한 뒤 기존 청크들의 참조 수를 내린다.
+    """
+    if not ChunkStore.used():
+        replace(src, dst)
+        return
+    with ChunkStore.path_lock(dst):
+        old = read_manifest(dst)
+        replace(src, dst)
+    if old:
+        ChunkStore.release(_counts(old))
+
+
+async def replace_data_async(src: str, dst: str):
+    """
+    replace_data의 비동기 버전
+    """
+    if not ChunkStore.used():
+        await replace_async(src, dst)
+    else:
+        await run_in_threadpool(replace_data, src, dst)
+
+
+def remove_data(root: str):
+    """
+    파일을 삭제한다. 매니페스트였으면 청크들의 참조 수를 내린다.
+    """
+    if not ChunkStore.used():
+        os.remove(root)
+        return
+    with ChunkStore.path_lock(root):
+        old = read_manifest(root)
+        os.remove(root)
+    if old:
+        ChunkStore.release(_counts(old))
+
+
+def remove_tree(root: str):
+    """
+    디렉토리를 삭제한다. 하위 매니페스트들의 참조 수도 내린다.
+    """
+    if ChunkStore.used():
+        for dir_root, _, filenames in os.walk(root):
+            for name in filenames:
+                try:
+                    remove_data(os.path.join(dir_root, name))
+                except FileNotFoundError:
+                    pass
+    shutil.rmtree(root)
@@ -0,0 +1,107 @@
+import errno
+import os
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:     # Linux/Unix 외
+    fcntl = None
+
+"""
+저장된 파일 복제
+
+파일은 항상 임시파일에 다 쓴 다음 교체(rename)로 저장되고 그 자리에서 수정되지 않으므로
+같은 내용의 파일은 데이터를 복사하지 않고 공유할 수 있다.
+    reflink     파일시스템이 지원하면 (btrfs, xfs 등) 블록을 공유하는 새 파일을 만든다.
+    hardlink    지원하지 않으면 같은 inode를 가리키는 링크를 만든다.
+
+복사(copy_file)는 독립된 새 파일을 만든다.
+    reflink             블록 공유
+    copy_file_range     커널 안에서 복사 (NFS 등은 서버에서 복사)
+    copy                둘 다 안되면 일반 복사
+"""
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = getattr(fcntl, 'FICLONE', 0x40049409)
+
+# reflink를 지원하지 않는 경우의 에러
+_UNSUPPORTED = {
+    errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL,
+    errno.ENOSYS, errno.EBADF, errno.EPERM,
+}
+
+
+def reflink(src: str, dst: str) -> bool:
+    """
+    src를 reflink로 복제한 dst를 만든다.
+
+    :return: 지원하지 않으면 False (dst는 만들지 않는다)
+    """
+    if fcntl is None:
+        return False
+    with open(src, 'rb') as f_src:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, FICLONE, f_src.fileno())
+        except OSError as e:
+            os.close(fd)
+            os.remove(dst)
+            if e.errno in _UNSUPPORTED:
+                return False
+            raise e
+        os.close(fd)
+    return True
+
+
+def copy_file(
+    src: str,
+    dst: str,
+    progress: Optional[Callable[[int], None]] = None,
+    chunk_size: int = 64 * 1024 * 1024,
+) -> str:
+    """
+    src를 복사한 새 파일 dst를 만든다.
+
+    :param progress: 복사한 바이트 수를 받는 함수 (진행 상황)
+    :param chunk_size: copy_file_range 한번에 복사하는 크기
+
+    :return: 사용한 방법 (reflink, copy_file_range, copy)
+    """
+    if reflink(src, dst):
+        if progress:
+            progress(os.path.getsize(dst))
+        return 'reflink'
+    with open(src, 'rb') as f_src, open(dst, 'xb') as f_dst:
+        method = 'copy_file_range'
+        copied = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while n := os.copy_file_range(
+                        f_src.fileno(), f_dst.fileno(), chunk_size):
+                    copied += n
+                    if progress:
+                        progress(n)
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED or copied:
+                    raise e
+                method = 'copy'
+        else:
+            method = 'copy'
+        if method == 'copy':
+            while data := f_src.read(1024 * 1024):
+                f_dst.write(data)
+                if progress:
+                    progress(len(data))
+    return method
+
+
+def link_file(src: str, dst: str) -> str:
+    """
+    데이터를 복사하지 않고 src와 같은 내용의 dst를 만든다.
+
+    :return: 사용한 방법 (reflink, hardlink)
+    """
+    if reflink(src, dst):
+        return 'reflink'
+    os.link(src, dst)
+    return 'hardlink'
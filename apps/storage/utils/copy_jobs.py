@@ -0,0 +1,107 @@
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+"""
+백그라운드 복사 작업
+
+큰 디렉토리 복사는 요청 안에서 끝내지 않고 별도 스레드에서 진행한다.
+요청은 작업 아이디를 바로 받고(202), 진행 상황은 작업 아이디로 조회한다.
+작업 목록은 서버 프로세스의 메모리에만 있으므로 재시작하면 사라진다.
+"""
+
+
+class CopyJob:
+    """
+    복사 작업 하나의 진행 상황
+
+    :param user_id: 작업을 요청한 데이터의 사용자 아이디
+    :param total_files: 복사할 파일 수
+    :param total_bytes: 복사할 파일 크기의 합
+    """
+    def __init__(self, user_id: int, total_files: int, total_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.status = 'running'     # running, done, failed
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.data_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.finished: Optional[float] = None
+
+    def progress(self, files: int = 0, size: int = 0):
+        # 복사하는 스레드 하나만 갱신한다.
+        self.copied_files += files
+        self.copied_bytes += size
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total_files': self.total_files,
+            'total_bytes': self.total_bytes,
+            'copied_files': self.copied_files,
+            'copied_bytes': self.copied_bytes,
+            'data_id': self.data_id,
+            'error': self.error,
+        }
+
+
+class CopyJobs:
+    """
+    진행 중이거나 끝난 복사 작업 목록
+    끝난 작업은 keep초 동안 조회할 수 있다.
+
+    사용법
+        job = CopyJobs.start(CopyJob(user_id, files, size), lambda job: copy(..., job.progress))
+        CopyJobs.read(job.id).to_dict()
+    """
+    keep = 60 * 60
+
+    _lock = threading.Lock()
+    _jobs: Dict[str, CopyJob] = dict()
+
+    @classmethod
+    def start(cls, job: CopyJob, target: Callable[[CopyJob], Any]) -> CopyJob:
+        """
+        별도 스레드에서 target(job)을 실행한다.
+        target은 만들어진 데이터(DataInfo)를 리턴해야 한다.
+        """
+        with cls._lock:
+            cls._prune()
+            cls._jobs[job.id] = job
+        threading.Thread(
+            target=cls._run, args=(job, target),
+            name=f'copy-job-{job.id}', daemon=True).start()
+        return job
+
+    @classmethod
+    def read(cls, job_id: str) -> Optional[CopyJob]:
+        with cls._lock:
+            cls._prune()
+            return cls._jobs.get(job_id)
+
+    @staticmethod
+    def _run(job: CopyJob, target: Callable[[CopyJob], Any]):
+        try:
+            job.data_id = target(job).id
+        except Exception as e:
+            job.error = e.__class__.__name__
+            job.status = 'failed'
+        else:
+            job.status = 'done'
+        finally:
+            job.finished = time.monotonic()
+
+    @classmethod
+    def _prune(cls):
+        # 오래된 작업 정리, _lock 안에서 호출
+        now = time.monotonic()
+        for job_id in [
+            job_id for job_id, job in cls._jobs.items()
+            if job.finished is not None and now - job.finished > cls.keep
+        ]:
+            del cls._jobs[job_id]
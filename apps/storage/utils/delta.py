@@ -0,0 +1,241 @@
+import hashlib
+import math
+import os
+import struct
+import zlib
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+"""
+rsync 방식의 차분 업로드
+
+큰 파일의 일부만 바뀐 경우 바뀐 부분만 전송한다.
+    1. 클라이언트는 기존 파일의 블록 서명을 받는다.
+       블록마다 (adler32, blake2b-128)이며 adler32는 한 바이트씩 밀면서 다시 계산할 수 있다.
+    2. 클라이언트는 새 파일에서 서명이 같은 블록을 찾아서
+       기존 파일에서 가져올 구간(copy)과 새 데이터(data)만 보낸다. (make_delta 참고)
+    3. 서버는 기존 파일 옆 임시파일에 새 버전을 만들고 sha256을 확인한 다음 교체한다.
+
+delta 형식 (little endian)
+    b'CMDELTA1'
+    b'C' <offset: u64> <length: u64>    기존 파일의 구간 복사
+    b'D' <length: u32> <data>           새 데이터 (최대 MAX_LITERAL)
+    b'E' <sha256: 32 bytes>             끝, 새 파일 전체의 sha256
+"""
+
+MAGIC = b'CMDELTA1'
+MIN_BLOCK_SIZE = 1024
+MAX_BLOCK_SIZE = 1024 * 1024
+MAX_LITERAL = 4 * 1024 * 1024
+_ADLER_MOD = 65521
+_COPY = struct.Struct('<QQ')
+_DATA = struct.Struct('<I')
+
+
+def default_block_size(size: int) -> int:
+    # rsync와 같이 파일 크기의 제곱근 정도, 1KB 단위
+    block_size = math.ceil(math.sqrt(size) / 1024) * 1024
+    return min(max(block_size, 2 * MIN_BLOCK_SIZE), MAX_BLOCK_SIZE)
+
+
+def strong_checksum(block: bytes) -> str:
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+
+def _size(f: BinaryIO) -> int:
+    # 청크 저장소의 파일은 size 속성으로 논리 크기를 알려준다.
+    size = getattr(f, 'size', None)
+    return os.fstat(f.fileno()).st_size if size is None else size
+
+
+def _pread(f: BinaryIO, length: int, offset: int) -> bytes:
+    if hasattr(f, 'pread'):
+        return f.pread(length, offset)
+    return os.pread(f.fileno(), length, offset)
+
+
+def file_signature(f: BinaryIO, block_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    열린 파일의 블록 서명
+
+    :param f: 기존 파일 (open_data)
+    :param block_size: 블록 크기 (없으면 파일 크기로 정한다)
+
+    :return: {'size', 'block_size', 'blocks': [[adler32, blake2b-128], ...]}
+    :exception ValueError: 블록 크기가 범위를 벗어남
+    """
+    size = _size(f)
+    block_size = block_size or default_block_size(size)
+    if not MIN_BLOCK_SIZE <= block_size <= MAX_BLOCK_SIZE:
+        raise ValueError('invalid block size')
+    blocks = []
+    for offset in range(0, size, block_size):
+        block = _pread(f, block_size, offset)
+        blocks.append([zlib.adler32(block), strong_checksum(block)])
+    return {'size': size, 'block_size': block_size, 'blocks': blocks}
+
+
+class DeltaReader:
+    """
+    요청 본문에서 delta 명령을 하나씩 읽는다.
+
+    :param chunks: 요청 본문 스트림 (request.stream())
+    """
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.sha256: Optional[str] = None   # 끝까지 읽으면 새 파일의 sha256
+        self._chunks = chunks.__aiter__()
+        self._buf = bytearray()
+
+    async def _read(self, n: int) -> bytes:
+        while len(self._buf) < n:
+            try:
+                self._buf += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                raise ValueError('delta is truncated')
+        data = bytes(self._buf[:n])
+        del self._buf[:n]
+        return data
+
+    async def ops(self) -> AsyncIterator[Tuple]:
+        """
+        ('copy', offset, length) 또는 ('data', bytes)
+        끝 명령을 읽으면 sha256을 기록하고 멈춘다.
+
+        :exception ValueError: 형식이 잘못되었거나 중간에 끊김
+        """
+        if await self._read(len(MAGIC)) != MAGIC:
+            raise ValueError('invalid delta')
+        while True:
+            op = await self._read(1)
+            if op == b'C':
+                yield ('copy', *_COPY.unpack(await self._read(_COPY.size)))
+            elif op == b'D':
+                length, = _DATA.unpack(await self._read(_DATA.size))
+                if length > MAX_LITERAL:
+                    raise ValueError('literal is too large')
+                yield ('data', await self._read(length))
+            elif op == b'E':
+                self.sha256 = (await self._read(32)).hex()
+                break
+            else:
+                raise ValueError('invalid delta operation')
+        # 끝 명령 뒤에는 아무것도 없어야 한다.
+        if self._buf:
+            raise ValueError('data after end of delta')
+        async for rest in self._chunks:
+            if rest:
+                raise ValueError('data after end of delta')
+
+    def verify(self, sha256: str):
+        """
+        만들어진 파일의 sha256이 클라이언트가 보낸 값과 같은 지 확인한다.
+
+        :exception ValueError: 다름 (기존 파일을 잘못 알고 있거나 전송 오류)
+        """
+        if self.sha256 is None or self.sha256 != sha256:
+            raise ValueError('checksum mismatch')
+
+
+async def apply_delta(
+    base: BinaryIO, reader: DeltaReader, segment_size: int = 1024 * 1024
+) -> AsyncIterator[bytes]:
+    """
+    기존 파일과 delta로 새 파일의 내용을 순서대로 만든다.
+
+    :param base: 기존 파일 (open_data)
+    :param reader: delta 명령
+    :param segment_size: 기존 파일을 한번에 읽는 크기
+    """
+    base_size = _size(base)
+    async for op in reader.ops():
+        if op[0] == 'data':
+            yield op[1]
+            continue
+        _, offset, length = op
+        if offset + length > base_size:
+            raise ValueError('copy range is out of file')
+        end = offset + length
+        while offset < end:
+            data = await run_in_threadpool(
+                _pread, base, min(segment_size, end - offset), offset)
+            if not data:
+                raise ValueError('base file is truncated')
+            offset += len(data)
+            yield data
+
+
+def _encode(ops: List[Tuple]) -> Iterator[bytes]:
+    for op in ops:
+        if op[0] == 'copy':
+            yield b'C' + _COPY.pack(op[1], op[2])
+        else:
+            for i in range(0, len(op[1]), MAX_LITERAL):
+                literal = op[1][i:i + MAX_LITERAL]
+                yield b'D' + _DATA.pack(len(literal)) + literal
+
+
+def make_delta(signature: Dict[str, Any], data: bytes) -> bytes:
+    """
+    서명과 새 파일 내용으로 delta를 만든다. (클라이언트 참고 구현)
+    블록 단위로 일치하는 부분을 찾으며 adler32를 한 바이트씩 밀면서 계산한다.
+
+    :param signature: file_signature 결과
+    :param data: 새 파일 내용
+    """
+    block_size = signature['block_size']
+    last_size = signature['size'] - block_size * (len(signature['blocks']) - 1)
+    table: Dict[int, List[Tuple[int, str]]] = dict()
+    for i, (weak, strong) in enumerate(signature['blocks']):
+        table.setdefault(weak, []).append((i, strong))
+
+    def match(pos: int, length: int, weak: int) -> Optional[int]:
+        for i, strong in table.get(weak, ()):
+            block_len = last_size if i == len(signature['blocks']) - 1 else block_size
+            if block_len == length and strong_checksum(data[pos:pos + length]) == strong:
+                return i
+        return None
+
+    ops: List[Tuple] = []
+    literal = bytearray()
+
+    def copy(offset: int, length: int):
+        if literal:
+            ops.append(('data', bytes(literal)))
+            literal.clear()
+        if ops and ops[-1][0] == 'copy' and ops[-1][1] + ops[-1][2] == offset:
+            # 이어지는 구간은 합친다
+            ops[-1] = ('copy', ops[-1][1], ops[-1][2] + length)
+        else:
+            ops.append(('copy', offset, length))
+
+    pos, weak = 0, None
+    while pos + block_size <= len(data):
+        if weak is None:
+            weak = zlib.adler32(data[pos:pos + block_size])
+        i = match(pos, block_size, weak)
+        if i is not None:
+            copy(i * block_size, block_size)
+            pos, weak = pos + block_size, None
+            continue
+        # 한 바이트 밀기
+        out_byte = data[pos]
+        literal.append(out_byte)
+        if pos + block_size < len(data):
+            a, b = weak & 0xffff, weak >> 16
+            a = (a - out_byte + data[pos + block_size]) % _ADLER_MOD
+            b = (b - block_size * out_byte + a - 1) % _ADLER_MOD
+            weak = (b << 16) | a
+        pos += 1
+    # 남은 부분이 마지막 (짧은) 블록과 같으면 복사
+    rest = len(data) - pos
+    i = match(pos, rest, zlib.adler32(data[pos:])) if rest else None
+    if i is not None:
+        copy(i * block_size, rest)
+    else:
+        literal += data[pos:]
+    if literal:
+        ops.append(('data', bytes(literal)))
+
+    return b''.join([
+        MAGIC, *_encode(ops), b'E', hashlib.sha256(data).digest()])
@@ -0,0 +1,172 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from settings.base import DURABILITY_GROUP_COMMIT, DURABILITY_ON_CLOSE, SERVER
+
+"""
+파일 저장 시 fsync 정책 (STORAGE_DURABILITY)
+
+none            fsync를 하지 않는다. 가장 빠르지만 장애 시 최근 파일이 유실될 수 있다.
+on-close        파일을 다 쓸 때마다 파일과 디렉토리를 fsync 한다.
+group-commit    다 쓴 파일들을 모아두었다가 일정 주기로 한번에 디스크에 반영한다.
+                요청은 자기 파일이 반영될 때까지 기다리므로 응답 시점에는
+                on-close와 같이 디스크에 반영되어 있다.
+"""
+
+
+def _load_syncfs():
+    # 파일시스템 단위 sync, Linux에서만 지원
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        return libc.syncfs
+    except (OSError, AttributeError, TypeError):
+        return None
+
+
+_syncfs = _load_syncfs()
+
+
+def fsync_root(root: str):
+    # 파일/디렉토리를 경로로 열어서 fsync
+    fd = os.open(root, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_file(fileno: int):
+    """
+    다 쓴 파일을 정책에 따라 디스크에 반영한다.
+    group-commit은 교체할 때 한번에 반영하므로 여기서는 하지 않는다.
+    """
+    if SERVER['storage-durability'] == DURABILITY_ON_CLOSE:
+        os.fsync(fileno)
+
+
+class GroupCommitter:
+    """
+    group-commit 정책의 교체 작업을 모아서 처리한다.
+
+    교체 요청(src -> dst)이 들어오면 interval 동안 다른 요청을 더 모은 다음
+        1. 모인 파일들의 데이터를 디스크에 반영 (syncfs 한번, 없으면 파일마다 fsync)
+        2. 전부 os.replace
+        3. 관련된 디렉토리를 한번씩만 fsync
+    순서로 처리하고 기다리던 요청들을 깨운다.
+    데이터가 반영된 다음 교체하므로 장애가 나도 반쯤 쓴 파일이 보이지 않는다.
+    """
+    _lock = threading.Lock()
+    _cond = threading.Condition(_lock)
+    _pending: List[Tuple[str, str, Future]] = []
+    _thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def submit(cls, src: str, dst: str) -> Future:
+        future = Future()
+        with cls._cond:
+            cls._pending.append((src, dst, future))
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(
+                    target=cls._run, name='storage-group-commit', daemon=True)
+                cls._thread.start()
+            cls._cond.notify()
+        return future
+
+    @classmethod
+    def _run(cls):
+        while True:
+            with cls._cond:
+                while not cls._pending:
+                    cls._cond.wait()
+            # 다른 요청이 모일 때까지 대기
+            time.sleep(SERVER['storage-group-commit-interval'] / 1000)
+            with cls._cond:
+                batch, cls._pending = cls._pending, []
+            try:
+                cls._commit(batch)
+            except Exception as e:
+                # 기다리는 요청이 멈추지 않도록 전부 실패 처리
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    @staticmethod
+    def _commit(batch: List[Tuple[str, str, Future]]):
+        # 1. 데이터 반영
+        synced: List[Tuple[str, str, Future]] = []
+        if _syncfs is not None:
+            try:
+                fd = os.open(os.path.dirname(batch[0][0]), os.O_RDONLY)
+                try:
+                    if _syncfs(fd) != 0:
+                        raise OSError(ctypes.get_errno(), 'syncfs failed')
+                finally:
+                    os.close(fd)
+                synced = batch
+            except OSError:
+                synced = []
+        if not synced:
+            for src, dst, future in batch:
+                try:
+                    fsync_root(src)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    synced.append((src, dst, future))
+        # 2. 교체
+        replaced: List[Tuple[str, Future]] = []
+        for src, dst, future in synced:
+            try:
+                os.replace(src, dst)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                replaced.append((dst, future))
+        # 3. 디렉토리 반영
+        errors = dict()
+        for dir_root in {os.path.dirname(dst) for dst, _ in replaced}:
+            try:
+                fsync_root(dir_root)
+            except Exception as e:
+                errors[dir_root] = e
+        for dst, future in replaced:
+            e = errors.get(os.path.dirname(dst))
+            if e:
+                future.set_exception(e)
+            else:
+                future.set_result(dst)
+
+
+def replace(src: str, dst: str):
+    """
+    src를 dst로 교체한다.
+    교체 전까지 dst를 읽는 쪽은 기존 파일을 그대로 읽고,
+    교체 후에도 이미 열려있던 파일은 기존 inode를 계속 읽는다.
+    """
+    mode = SERVER['storage-durability']
+    if mode == DURABILITY_GROUP_COMMIT:
+        GroupCommitter.submit(src, dst).result()
+        return
+    os.replace(src, dst)
+    if mode == DURABILITY_ON_CLOSE:
+        # rename 자체도 디스크에 반영
+        fsync_root(os.path.dirname(dst))
+
+
+async def replace_async(src: str, dst: str):
+    """
+    replace의 비동기 버전
+    group-commit을 기다리는 동안 threadpool을 차지하지 않는다.
+    """
+    if SERVER['storage-durability'] == DURABILITY_GROUP_COMMIT:
+        await asyncio.wrap_future(GroupCommitter.submit(src, dst))
+    else:
+        await run_in_threadpool(replace, src, dst)
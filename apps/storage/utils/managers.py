@@ -1,22 +1,47 @@
-import shutil
-from typing import Any, Dict, List, Optional
+from typing import (
+    Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+)
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 import os
-import datetime
+import re
+import pydantic
 
 from apps.storage.models import DataInfo
 from apps.storage.schemas import DataInfoCreate, DataInfoUpdate
+from apps.storage.utils.archive_cache import ArchiveCache, archive_fingerprint
+from apps.storage.utils.archives import archive_stream
+from apps.storage.utils.checksums import ContentHasher, digest_header, hash_file
+from apps.storage.utils.chunk_store import open_data
+from apps.storage.utils.copy_jobs import CopyJob, CopyJobs
+from apps.storage.utils.delta import DeltaReader, apply_delta, file_signature
 from apps.storage.utils.queries.data_db_query import DataDBQuery
-from apps.storage.utils.queries.data_storage_query import DataStorageQuery
+from apps.storage.utils.queries.data_storage_query import (
+    DataStorageQuery,
+    is_upload_temp,
+)
+from apps.storage.utils.streams import MultipartFileStream
 from apps.user.models import User
 from apps.user.utils.queries.user_db_query import UserDBQuery
+from apps.user.utils.quota import UsageReservation
 from architecture.manager.backend_manager import CRUDManager
 from core.exc import (
+    CopyJobNotFound,
     DataAlreadyExists,
+    DataContentNotFound,
     DataNotFound,
+    DataNotModified,
+    DataTargetInSubtree,
+    DataVersionMismatch,
     UsageLimited,
     UserNotFound
 )
+from core.responses import (
+    file_etag,
+    is_not_modified,
+    make_etag,
+    validator_headers,
+)
 from core.token_generators import (
     LoginTokenGenerator,
     decode_token,
@@ -33,18 +58,12 @@ from settings.base import SERVER
 
 class DataFileCRUDManager(CRUDManager):
 
-    def create(
-        self, root_id: int, user_id: int, file: UploadFile
-    ) -> List[DataInfo]:
+    def _resolve_dir_root(self, root_id: int, user_id: int) -> str:
         """
-        파일 생성
-        동일한 이름의 파일이 존재하는 경우, 덮어쓴다.
+        사용자와 상위 디렉토리를 확인하고 상위 디렉토리의 루트를 구한다.
 
-        :param root_id: 파일이 올라갈 디렉토리 아이디
-        :param user_id: 사용자 아이디
-        :param files: 올라갈 파일 데이터들
-
-        :return: 생성된 데이터 리스트
+        :exception UserNotFound: 사용자 없음
+        :exception DataNotFound: 상위 디렉토리 없음
         """
         # user 존재 여부 확인
         user: User = UserDBQuery().read(user_id=user_id)
@@ -62,9 +81,26 @@ class DataFileCRUDManager(CRUDManager):
                 raise DataNotFound()
             # 상위 디렉토리 절대경로 생성
             dir_root = f'{directory_info.root}{directory_info.name}/'
+        return dir_root
+
+    def _prepare(
+        self, root_id: int, user_id: int, filename: str
+    ) -> Tuple[str, DataInfoCreate, int]:
+        """
+        파일 업로드 전 확인 작업
+        상위 디렉토리 및 같은 이름의 데이터를 확인하고
+        실제 저장될 루트를 구한다.
+
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param user_id: 사용자 아이디
+        :param filename: 업로드 파일 이름
+
+        :return: (실제 루트, 생성 포맷, 덮어쓸 데이터 아이디(없으면 0))
+        """
+        dir_root = self._resolve_dir_root(root_id, user_id)
         
         # 파일 이름 및 절대경로 생성
-        filename = file.filename.split('/')[-1]
+        filename = filename.split('/')[-1]
         file_root = \
             f'{SERVER["storage"]}/storage/{user_id}/root{dir_root}{filename}'
         # 같은 이름의 데이터가 DB에 남아있는지 조사
@@ -74,12 +110,6 @@ class DataFileCRUDManager(CRUDManager):
         if db_already_id and db_already_info.is_dir:
             # 데이터가 존재하는데 디렉토리면 업로드 불가능
             raise DataAlreadyExists()
-        else:
-            # 나머지는 업데이트 혹은 생성 가능
-            if DataStorageQuery().read(root=file_root, is_dir=True) or \
-                DataStorageQuery().read(root=file_root, is_dir=False):
-                # 같은 이름의 데이터가 스토리지에 존재하면 삭제
-                DataStorageQuery().destroy(root=file_root)
         # Validation 측정 틀리면 ValidationError 발생
         input_format: DataInfoCreate = DataInfoCreate(
             name=filename,
@@ -87,15 +117,29 @@ class DataFileCRUDManager(CRUDManager):
             root=dir_root,
             is_dir=False,
             size=0)
-        # 데이터 생성
-        data_size = \
-            DataStorageQuery() \
-                .create(
-                    root=file_root,
-                    is_dir=False, file=file,
-                    user_id=user_id)
-        # 파일 크기 추가
+        # 나머지는 업데이트 혹은 생성 가능
+        # 같은 이름의 파일은 새 파일을 다 쓴 다음 교체된다.
+        if DataStorageQuery().read(root=file_root, is_dir=True):
+            # DB에 없는 디렉토리가 스토리지에 남아있으면 삭제
+            DataStorageQuery().destroy(root=file_root)
+        return file_root, input_format, db_already_id
+
+    def _save(
+        self,
+        file_root: str,
+        input_format: DataInfoCreate,
+        db_already_id: int,
+        data_size: int,
+        hasher: Optional[ContentHasher],
+    ) -> DataInfo:
+        """
+        스토리지에 저장된 파일의 정보를 DB에 반영한다.
+        hasher가 없으면 input_format에 체크섬이 이미 들어있어야 한다.
+        """
+        # 파일 크기, 체크섬 추가
         input_format.size = data_size
+        if hasher is not None:
+            hasher.apply(input_format)
         try:
             if db_already_id:
                 data_info = \
@@ -113,6 +157,390 @@ class DataFileCRUDManager(CRUDManager):
         else:
             return data_info
 
+    def create(
+        self, root_id: int, user_id: int, file: UploadFile
+    ) -> List[DataInfo]:
+        """
+        파일 생성
+        동일한 이름의 파일이 존재하는 경우, 덮어쓴다.
+
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param user_id: 사용자 아이디
+        :param files: 올라갈 파일 데이터들
+
+        :return: 생성된 데이터 리스트
+        """
+        # 용량 예약은 DB에 크기가 반영된 다음 해제한다.
+        with UsageReservation(user_id) as reservation:
+            file_root, input_format, db_already_id = \
+                self._prepare(root_id, user_id, file.filename)
+            # 데이터 생성 (체크섬은 쓰면서 계산)
+            hasher = ContentHasher()
+            data_size = \
+                DataStorageQuery() \
+                    .create(
+                        root=file_root,
+                        is_dir=False, file=file,
+                        reservation=reservation,
+                        hasher=hasher)
+            return self._save(
+                file_root, input_format, db_already_id, data_size, hasher)
+
+    async def create_stream(
+        self,
+        root_id: int,
+        user_id: int,
+        filename: str,
+        chunks: AsyncIterator[bytes],
+        declared_size: int = 0,
+    ) -> DataInfo:
+        """
+        스트리밍 파일 생성
+        create와 동작은 같지만 DB 작업은 threadpool에서,
+        파일 쓰기는 비동기로 진행하여 이벤트 루프를 막지 않는다.
+
+        쓰기 전에 declared_size만큼 용량을 먼저 예약하므로
+        남은 용량이 부족하면 한 바이트도 쓰지 않고 UsageLimited가 발생한다.
+
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param user_id: 사용자 아이디
+        :param filename: 업로드 파일 이름
+        :param chunks: 파일 데이터 스트림
+        :param declared_size: 클라이언트가 알려준 크기 (Content-Length)
+
+        :return: 생성된 데이터
+        """
+        reservation: UsageReservation = \
+            await run_in_threadpool(UsageReservation, user_id, declared_size)
+        try:
+            file_root, input_format, db_already_id = \
+                await run_in_threadpool(self._prepare, root_id, user_id, filename)
+            # 데이터 생성 (체크섬은 쓰면서 계산)
+            hasher = ContentHasher()
+            data_size = await DataStorageQuery().create_stream(
+                root=file_root, chunks=chunks,
+                reservation=reservation, hasher=hasher)
+            return await run_in_threadpool(
+                self._save, file_root, input_format,
+                db_already_id, data_size, hasher)
+        finally:
+            reservation.release()
+
+    def create_from_file(
+        self,
+        root_id: int,
+        user_id: int,
+        filename: str,
+        src_root: str,
+        hasher: Optional[ContentHasher] = None,
+        reservation: Optional[UsageReservation] = None,
+    ) -> DataInfo:
+        """
+        사용자 스토리지에 이미 기록된 파일을 옮겨서 파일 생성
+        업로드 세션처럼 데이터를 따로 받아둔 경우 사용한다.
+        동일한 이름의 파일이 존재하는 경우, 덮어쓴다.
+
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param user_id: 사용자 아이디
+        :param filename: 파일 이름
+        :param src_root: 옮길 파일의 실제 루트 (같은 파일시스템)
+        :param hasher: 파일 전체에 대해 계산된 체크섬 (없으면 파일을 읽어서 계산)
+        :param reservation: 이미 가지고 있는 용량 예약 (업로드 세션), 해제는 호출한 쪽에서 한다.
+
+        :return: 생성된 데이터
+        """
+        data_size = os.path.getsize(src_root)
+        if hasher is None or hasher.length != data_size:
+            hasher = hash_file(src_root)
+        # 용량 예약은 DB에 크기가 반영된 다음 해제한다.
+        own = reservation is None
+        if own:
+            reservation = UsageReservation(user_id, data_size)
+        else:
+            reservation.ensure(data_size)
+        try:
+            file_root, input_format, db_already_id = \
+                self._prepare(root_id, user_id, filename)
+            DataStorageQuery().move(src_root, file_root)
+            return self._save(
+                file_root, input_format, db_already_id, data_size, hasher)
+        finally:
+            if own:
+                reservation.release()
+
+    def create_by_checksum(
+        self,
+        root_id: int,
+        user_id: int,
+        filename: str,
+        size: int,
+        sha256: str,
+    ) -> DataInfo:
+        """
+        업로드 없이 같은 내용의 파일로 파일 생성
+        사용자의 파일 중 크기와 체크섬이 같은 파일을 찾아서 데이터 복사 없이 링크한다.
+        동일한 이름의 파일이 존재하는 경우, 덮어쓴다.
+
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param user_id: 사용자 아이디
+        :param filename: 파일 이름
+        :param size: 파일 크기
+        :param sha256: 파일 체크섬 (16진수)
+
+        :return: 생성된 데이터
+
+        :exception DataContentNotFound: 같은 내용의 파일이 없음 (업로드 필요)
+        """
+        sha256 = sha256.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', sha256) or size < 0:
+            raise ValueError('invalid checksum')
+        candidates: List[DataInfo] = \
+            DataDBQuery().read_by_checksum(user_id, size, sha256)
+        if not candidates:
+            raise DataContentNotFound()
+        # 사용자 용량은 논리 크기 기준으로 계산한다.
+        with UsageReservation(user_id, size):
+            file_root, input_format, db_already_id = \
+                self._prepare(root_id, user_id, filename)
+            for candidate in candidates:
+                src_root = f'{SERVER["storage"]}/storage/{user_id}/root' \
+                    f'{candidate.root}{candidate.name}'
+                if src_root == file_root:
+                    # 같은 자리에 같은 내용이 이미 있음
+                    return candidate
+                storage_info = DataStorageQuery().read(root=src_root, is_dir=False)
+                if not storage_info or storage_info['size'] != size:
+                    # 스토리지에 없거나 밖에서 바뀐 파일
+                    continue
+                try:
+                    DataStorageQuery().link(src_root, file_root)
+                except FileNotFoundError:
+                    continue
+                input_format.sha256, input_format.adler32 = \
+                    candidate.sha256, candidate.adler32
+                return self._save(
+                    file_root, input_format, db_already_id, size, None)
+        raise DataContentNotFound()
+
+    async def create_batch(
+        self,
+        root_id: int,
+        user_id: int,
+        files: MultipartFileStream,
+        declared_size: int = 0,
+    ) -> Tuple[List[DataInfo], List[Tuple[str, Exception]]]:
+        """
+        한 디렉토리에 여러 파일 생성
+        사용자와 상위 디렉토리는 한번만 확인하고
+        파일은 받는 대로 저장한 다음, DB에는 한번에 반영한다.
+
+        파일 하나의 실패(이름 오류, 같은 이름의 디렉토리, 용량 초과)는
+        해당 파일만 건너뛰고 실패 목록에 남긴다.
+        요청 본문이 깨지거나 DB 반영에 실패하면 저장한 파일을 전부 삭제한다.
+
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param user_id: 사용자 아이디
+        :param files: 파일 파트 스트림
+        :param declared_size: 클라이언트가 알려준 크기 (Content-Length)
+
+        :return: (생성된 데이터 리스트, (파일 이름, 실패 원인) 리스트)
+        """
+        reservation: UsageReservation = \
+            await run_in_threadpool(UsageReservation, user_id, declared_size)
+        written: List[Tuple[str, DataInfoCreate, int]] = []
+        failed: List[Tuple[str, Exception]] = []
+        try:
+            dir_root = await run_in_threadpool(
+                self._resolve_dir_root, root_id, user_id)
+            # 같은 이름의 데이터 확인용
+            entries: Dict[str, DataInfo] = {
+                data.name: data for data in
+                await run_in_threadpool(
+                    DataDBQuery().read_entries, user_id, dir_root)
+            }
+            received = set()
+            while (filename := await files.next_file()) is not None:
+                filename = filename.split('/')[-1]
+                try:
+                    # Validation 측정 틀리면 ValidationError 발생
+                    input_format = DataInfoCreate(
+                        name=filename,
+                        user_id=user_id,
+                        root=dir_root,
+                        is_dir=False,
+                        size=0)
+                    already: Optional[DataInfo] = entries.get(filename)
+                    if filename in received or (already and already.is_dir):
+                        # 같은 요청에 같은 이름이 있거나 디렉토리와 이름이 같음
+                        raise DataAlreadyExists()
+                    received.add(filename)
+                    file_root = \
+                        f'{SERVER["storage"]}/storage/{user_id}/root{dir_root}{filename}'
+                    if os.path.isdir(file_root):
+                        # DB에 없는 디렉토리가 스토리지에 남아있으면 삭제
+                        await run_in_threadpool(
+                            DataStorageQuery().destroy, root=file_root)
+                    hasher = ContentHasher()
+                    input_format.size = await DataStorageQuery().create_stream(
+                        root=file_root, chunks=files,
+                        reservation=reservation, hasher=hasher)
+                    hasher.apply(input_format)
+                except (pydantic.ValidationError, DataAlreadyExists, UsageLimited) as e:
+                    failed.append((filename, e))
+                else:
+                    written.append(
+                        (file_root, input_format, already.id if already else 0))
+
+            # DB 반영
+            created = await run_in_threadpool(
+                DataDBQuery().bulk_create,
+                [f for _, f, already_id in written if not already_id],
+                {already_id: f for _, f, already_id in written if already_id},
+            )
+        except Exception as e:
+            # 저장한 파일 전부 삭제
+            for file_root, _, _ in written:
+                await run_in_threadpool(
+                    DataStorageQuery().destroy, root=file_root)
+            raise e
+        else:
+            return created, failed
+        finally:
+            reservation.release()
+
+    def read_signature(
+        self, user_id: int, data_id: int, block_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        차분 업로드를 위한 파일의 블록 서명
+
+        :param user_id: 사용자 아이디
+        :param data_id: 파일 아이디
+        :param block_size: 블록 크기 (없으면 파일 크기로 정한다)
+
+        :return: 서명과 서명을 만든 파일의 ETag (차분 업로드 시 If-Match로 보낸다)
+        """
+        data: Optional[DataInfo] = \
+            DataDBQuery().read(user_id=user_id, data_id=data_id, is_dir=False)
+        if not data:
+            raise DataNotFound()
+        raw_root = f'{SERVER["storage"]}/storage/{user_id}/root{data.root}{data.name}'
+        try:
+            f = open_data(raw_root)
+        except (FileNotFoundError, IsADirectoryError):
+            raise DataNotFound()
+        with f:
+            signature = file_signature(f, block_size)
+            signature['etag'] = file_etag(os.fstat(f.fileno()))
+        return signature
+
+    async def update_by_delta(
+        self,
+        user_id: int,
+        data_id: int,
+        base_etag: str,
+        chunks: AsyncIterator[bytes],
+    ) -> DataInfo:
+        """
+        차분 업로드로 파일 수정
+        기존 파일에서 가져올 구간과 새 데이터로 새 버전을 임시파일에 만들고
+        sha256을 확인한 다음 교체한다. 실패하면 기존 파일은 그대로 남는다.
+
+        :param user_id: 사용자 아이디
+        :param data_id: 파일 아이디
+        :param base_etag: 서명을 받은 파일의 ETag
+        :param chunks: delta 스트림
+
+        :return: 수정된 데이터
+
+        :exception DataVersionMismatch: 서명을 받은 뒤 파일이 바뀜
+        :exception ValueError: delta 형식 오류 또는 체크섬 불일치
+        """
+        data: Optional[DataInfo] = await run_in_threadpool(
+            DataDBQuery().read, user_id=user_id, data_id=data_id, is_dir=False)
+        if not data:
+            raise DataNotFound()
+        raw_root = f'{SERVER["storage"]}/storage/{user_id}/root{data.root}{data.name}'
+        try:
+            base = await run_in_threadpool(open_data, raw_root)
+        except (FileNotFoundError, IsADirectoryError):
+            raise DataNotFound()
+        try:
+            # 열린 파일 기준으로 확인하므로 그 뒤에 교체되어도 같은 버전을 읽는다.
+            if file_etag(os.fstat(base.fileno())) != base_etag:
+                raise DataVersionMismatch()
+            input_format = DataInfoCreate(
+                name=data.name,
+                user_id=user_id,
+                root=data.root,
+                is_dir=False,
+                size=0)
+            reader = DeltaReader(chunks)
+            hasher = ContentHasher()
+            reservation: UsageReservation = \
+                await run_in_threadpool(UsageReservation, user_id)
+            try:
+                data_size = await DataStorageQuery().create_stream(
+                    root=raw_root,
+                    chunks=apply_delta(
+                        base, reader, SERVER['upload-buffer-size']),
+                    reservation=reservation, hasher=hasher,
+                    verify=lambda: reader.verify(hasher.sha256))
+                return await run_in_threadpool(
+                    self._save, raw_root, input_format,
+                    data.id, data_size, hasher)
+            finally:
+                reservation.release()
+        finally:
+            await run_in_threadpool(base.close)
+
+    def copy(
+        self,
+        user_id: int,
+        source: DataInfo,
+        dir_root: str,
+        name: str,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> DataInfo:
+        """
+        파일 복사
+        용량은 호출하는 쪽에서 source.size만큼 미리 예약해야 한다.
+
+        :param user_id: 사용자 아이디
+        :param source: 복사할 파일
+        :param dir_root: 복사할 위치의 디렉토리 루트 (/mydir/)
+        :param name: 새 파일 이름
+        :param progress: (복사한 파일 수, 바이트 수)를 받는 함수
+
+        :return: 생성된 데이터
+        """
+        input_format: DataInfoCreate = DataInfoCreate(
+            name=name,
+            user_id=user_id,
+            root=dir_root,
+            is_dir=False,
+            size=source.size,
+            sha256=source.sha256,
+            adler32=source.adler32)
+        if DataDBQuery().read(user_id=user_id, full_root=(dir_root, name)):
+            # 덮어쓰지 않는다
+            raise DataAlreadyExists()
+        prefix = f'{SERVER["storage"]}/storage/{user_id}/root'
+        src_root = f'{prefix}{source.root}{source.name}'
+        file_root = f'{prefix}{dir_root}{name}'
+        if DataStorageQuery().read(root=file_root, is_dir=True):
+            # DB에 없는 디렉토리가 스토리지에 남아있으면 삭제
+            DataStorageQuery().destroy(root=file_root)
+        try:
+            DataStorageQuery().copy(
+                src_root, file_root,
+                progress and (lambda size: progress(0, size)))
+        except FileNotFoundError:
+            raise DataNotFound()
+        if progress:
+            progress(1, 0)
+        return self._save(file_root, input_format, 0, source.size, None)
+
     def read(self, raw_root: str) -> str:
         # 다운로드 할 때만 사용
         return raw_root
@@ -267,13 +695,207 @@ class DataDirectoryCRUDManager(CRUDManager):
             raise e
         return res
 
-    def read(self, raw_root: str) -> str:
-        # 다운로드 할 때만 사용
+    def read(
+        self,
+        raw_root: str,
+        user_id: Optional[int] = None,
+        dir_root: Optional[str] = None,
+        archive: str = 'zip',
+        key: Optional[str] = None,
+        total_size: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """
+        다운로드 할 때만 사용
+        디렉토리를 순회하면서 바로 만들어지는 압축 스트림을 리턴한다.
+        업로드 중인 임시파일은 포함하지 않는다.
+
+        :param raw_root: 디렉토리의 실제 루트
+        :param user_id: 사용자 아이디
+        :param dir_root: 디렉토리 루트 (/mydir/), 있으면 압축 캐시를 사용한다.
+        :param archive: 압축 형식 (zip, tar, tar.zst)
+        :param key: 미리 구한 fingerprint 값 (없으면 새로 구한다)
+        :param total_size: 하위 파일 크기의 합 (없으면 DB에서 읽는다)
+                           캐시 용량보다 크면 캐시를 쓰지 않고 바로 압축한다.
+        """
+        compress_level = SERVER['archive-compress-level']
+
+        def build():
+            return archive_stream(
+                raw_root, archive,
+                skip=is_upload_temp, compress_level=compress_level,
+                workers=SERVER['archive-workers'], opener=open_data)
+
+        if dir_root is None or not ArchiveCache.enabled():
+            return iter(build())
+        if total_size is None:
+            parent = dir_root[:dir_root.rstrip('/').rfind('/') + 1]
+            data_info = DataDBQuery().read(
+                user_id=user_id, full_root=(parent, dir_root[len(parent):-1]))
+            total_size = data_info.total_size if data_info else None
+        if (total_size or 0) > SERVER['archive-cache-size']:
+            # 저장할 수 없는 크기는 임시파일 없이 바로 보낸다
+            return iter(build())
+
+        if key is None:
+            key = self.fingerprint(user_id, dir_root, archive)
+        return ArchiveCache.open(
+            key, build, lambda: self.fingerprint(user_id, dir_root, archive) == key)
+
+    def copy(
+        self,
+        user_id: int,
+        source: DataInfo,
+        dir_root: str,
+        name: str,
+        entries: Optional[List[DataInfo]] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> DataInfo:
+        """
+        디렉토리 복사
+        하위 파일을 전부 복사한 다음 DB에는 하나의 트랜잭션으로 반영한다.
+        중간에 실패하면 복사한 디렉토리를 통째로 삭제한다.
+        용량은 호출하는 쪽에서 하위 파일 크기의 합만큼 미리 예약해야 한다.
+
+        :param user_id: 사용자 아이디
+        :param source: 복사할 디렉토리
+        :param dir_root: 복사할 위치의 디렉토리 루트 (/mydir/)
+        :param name: 새 디렉토리 이름
+        :param entries: 미리 읽은 하위 데이터 (없으면 새로 읽는다)
+        :param progress: (복사한 파일 수, 바이트 수)를 받는 함수
+
+        :return: 생성된 디렉토리
+
+        :exception DataTargetInSubtree: 자기 자신 또는 하위 디렉토리로 복사
+        """
+        src_dir = f'{source.root}{source.name}/'
+        if dir_root.startswith(src_dir):
+            raise DataTargetInSubtree()
+        formats: List[DataInfoCreate] = [DataInfoCreate(
+            name=name,
+            root=dir_root,
+            user_id=user_id,
+            is_dir=True,
+            size=0)]
+        if DataDBQuery().read(user_id=user_id, full_root=(dir_root, name)):
+            raise DataAlreadyExists()
+        if entries is None:
+            entries = DataDBQuery().read_subtree(user_id, src_dir)
 
-        # Zip File 생성
-        tmp_name = f'download-{datetime.datetime.now().strftime("%Y%m%d-%H%M%S%f")}'
-        tmp_zip = shutil.make_archive(tmp_name, 'zip', raw_root)
-        return tmp_zip
+        prefix = f'{SERVER["storage"]}/storage/{user_id}/root'
+        new_dir = f'{dir_root}{name}/'
+        root = f'{prefix}{dir_root}{name}'
+        if DataStorageQuery().read(root=root, is_dir=True) or \
+            DataStorageQuery().read(root=root, is_dir=False):
+            # DB에 없는 데이터가 스토리지에 남아있으면 삭제
+            DataStorageQuery().destroy(root=root)
+        DataStorageQuery().create(root=root, is_dir=True)
+        try:
+            # 상위 디렉토리부터 만든다
+            for entry in sorted(entries, key=lambda e: (e.root.count('/'), not e.is_dir)):
+                entry_root = f'{new_dir}{entry.root[len(src_dir):]}'
+                dst_root = f'{prefix}{entry_root}{entry.name}'
+                if entry.is_dir:
+                    DataStorageQuery().create(root=dst_root, is_dir=True)
+                else:
+                    try:
+                        DataStorageQuery().copy(
+                            f'{prefix}{entry.root}{entry.name}', dst_root,
+                            progress and (lambda size: progress(0, size)))
+                    except FileNotFoundError:
+                        # 스토리지에 없는 파일은 복사하지 않는다.
+                        continue
+                    if progress:
+                        progress(1, 0)
+                formats.append(DataInfoCreate(
+                    name=entry.name,
+                    root=entry_root,
+                    user_id=user_id,
+                    is_dir=entry.is_dir,
+                    size=entry.size,
+                    sha256=entry.sha256,
+                    adler32=entry.adler32))
+            # DB 반영
+            return DataDBQuery().bulk_create(formats)[0]
+        except Exception as e:
+            # 복사한 디렉토리 전부 삭제
+            DataStorageQuery().destroy(root=root)
+            raise e
+
+    def move(
+        self, user_id: int, target_id: int, data_ids: List[int]
+    ) -> List[DataInfo]:
+        """
+        여러 파일/디렉토리를 한 디렉토리로 이동
+        스토리지에서는 os.rename만 하고, DB는 하나의 트랜잭션으로 루트만 수정한다.
+        하나라도 이동할 수 없으면 아무것도 이동하지 않는다.
+        이미 대상 디렉토리에 있는 데이터는 그대로 둔다.
+
+        :param user_id: 사용자 아이디
+        :param target_id: 이동할 디렉토리 아이디 (0은 최상위)
+        :param data_ids: 이동할 데이터 아이디 리스트
+
+        :return: 이동된 데이터 (data_ids 순서)
+
+        :exception DataNotFound: 대상 디렉토리 또는 이동할 데이터 없음
+        :exception DataAlreadyExists: 대상 디렉토리에 같은 이름의 데이터가 있음
+        :exception DataTargetInSubtree: 디렉토리를 자기 자신 또는 하위 디렉토리로 이동
+        :exception ValueError: 이동할 데이터끼리 상위/하위 관계
+        """
+        dir_root = DataFileCRUDManager()._resolve_dir_root(target_id, user_id)
+        data_ids = list(dict.fromkeys(data_ids))
+        datas: List[DataInfo] = DataDBQuery().read_many(user_id, data_ids)
+        if len(datas) != len(data_ids):
+            raise DataNotFound()
+        datas = [data for data in datas if data.root != dir_root]
+        if not datas:
+            return DataDBQuery().read_many(user_id, data_ids)
+
+        dirs = {f'{data.root}{data.name}/' for data in datas if data.is_dir}
+        names = {data.name for data in DataDBQuery().read_entries(user_id, dir_root)}
+        for data in datas:
+            if data.is_dir and dir_root.startswith(f'{data.root}{data.name}/'):
+                raise DataTargetInSubtree()
+            # 상위 디렉토리도 같이 이동하는 지 확인
+            units = data.root.split('/')[1:-1]
+            if any(f'/{"/".join(units[:i])}/' in dirs for i in range(1, len(units) + 1)):
+                raise ValueError('parent is also moved')
+            if data.name in names:
+                raise DataAlreadyExists()
+            names.add(data.name)
+
+        prefix = f'{SERVER["storage"]}/storage/{user_id}/root'
+        pairs = [
+            (f'{prefix}{data.root}{data.name}', f'{prefix}{dir_root}{data.name}')
+            for data in datas
+        ]
+        for _, dst in pairs:
+            if os.path.lexists(dst):
+                # DB에 없는 데이터가 스토리지에 남아있으면 삭제
+                DataStorageQuery().destroy(root=dst)
+        try:
+            DataStorageQuery().rename_many(pairs)
+        except FileNotFoundError:
+            raise DataNotFound()
+        try:
+            DataDBQuery().move(user_id, datas, dir_root)
+        except Exception as e:
+            # 스토리지 원상태 복구
+            DataStorageQuery().rename_many([(dst, src) for src, dst in reversed(pairs)])
+            raise e
+        return DataDBQuery().read_many(user_id, data_ids)
+
+    def fingerprint(self, user_id: int, dir_root: str, archive: str = 'zip') -> str:
+        """
+        디렉토리 압축 결과물에 대한 지문
+        압축 캐시의 키와 다운로드 ETag로 사용한다.
+
+        :param user_id: 사용자 아이디
+        :param dir_root: 디렉토리 루트 (/mydir/)
+        :param archive: 압축 형식
+        """
+        entries = DataDBQuery().read_subtree(user_id, dir_root)
+        return archive_fingerprint(
+            entries, dir_root, archive, str(SERVER['archive-compress-level']))
     
     def destroy(self, user_id: int, data_id: int):
         root, name = DataDBQuery().destroy(data_id)
@@ -336,12 +958,408 @@ class DataManager(FrontendManager):
                 dirname=req_dirname
             )
 
+    async def upload(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        filename: str,
+        chunks: AsyncIterator[bytes],
+        declared_size: int = 0,
+    ) -> DataInfo:
+        """
+        파일 스트리밍 업로드
+        DB 작업은 threadpool, 파일 쓰기는 비동기로 진행한다.
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 데이터가 올라갈 상위 디렉토리 아이디
+        :param filename: 업로드 파일 이름
+        :param chunks: 파일 데이터 스트림
+        :param declared_size: 미리 예약할 용량 (Content-Length)
+
+        :return: 새로 생성된 데이터
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = \
+            await run_in_threadpool(UserDBQuery().read, user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) | 
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        return await DataFileCRUDManager().create_stream(
+            root_id=data_id,
+            user_id=user_id,
+            filename=filename,
+            chunks=chunks,
+            declared_size=declared_size,
+        )
+
+    async def upload_batch(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        files: MultipartFileStream,
+        declared_size: int = 0,
+    ) -> Tuple[List[DataInfo], List[Tuple[str, Exception]]]:
+        """
+        여러 파일 스트리밍 업로드
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 데이터가 올라갈 상위 디렉토리 아이디
+        :param files: 파일 파트 스트림
+        :param declared_size: 미리 예약할 용량 (Content-Length)
+
+        :return: (생성된 데이터 리스트, (파일 이름, 실패 원인) 리스트)
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = \
+            await run_in_threadpool(UserDBQuery().read, user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        return await DataFileCRUDManager().create_batch(
+            root_id=data_id,
+            user_id=user_id,
+            files=files,
+            declared_size=declared_size,
+        )
+
+    def upload_by_checksum(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        filename: str,
+        size: int,
+        sha256: str,
+    ) -> DataInfo:
+        """
+        업로드 전 체크섬 확인
+        같은 내용의 파일이 이미 있으면 본문 전송 없이 파일을 생성한다.
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 데이터가 올라갈 상위 디렉토리 아이디
+        :param filename: 파일 이름
+        :param size: 파일 크기
+        :param sha256: 파일 체크섬 (16진수)
+
+        :return: 새로 생성된 데이터
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = UserDBQuery().read(user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        return DataFileCRUDManager().create_by_checksum(
+            root_id=data_id,
+            user_id=user_id,
+            filename=filename,
+            size=size,
+            sha256=sha256,
+        )
+
+    def copy(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        target_id: int,
+        name: Optional[str] = None,
+    ) -> Union[DataInfo, CopyJob]:
+        """
+        파일/디렉토리 복사
+        복사할 파일 크기의 합이 SERVER['copy-background-size']를 넘거나
+        파일이 많으면 백그라운드 작업으로 복사하고 작업을 리턴한다.
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 복사할 데이터 아이디
+        :param target_id: 복사할 위치의 디렉토리 아이디 (0은 최상위)
+        :param name: 새 이름 (없으면 원래 이름)
+
+        :return: 생성된 데이터 또는 복사 작업
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = UserDBQuery().read(user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        dir_root = DataFileCRUDManager()._resolve_dir_root(target_id, user_id)
+        source: Optional[DataInfo] = \
+            DataDBQuery().read(user_id=user_id, data_id=data_id)
+        if not source:
+            raise DataNotFound()
+        name = name or source.name
+        if source.is_dir:
+            src_dir = f'{source.root}{source.name}/'
+            if dir_root.startswith(src_dir):
+                raise DataTargetInSubtree()
+            entries = DataDBQuery().read_subtree(user_id, src_dir)
+            files = [entry for entry in entries if not entry.is_dir]
+            total_files = len(files)
+            total_bytes = sum(entry.size or 0 for entry in files)
+        else:
+            entries = None
+            total_files, total_bytes = 1, source.size or 0
+
+        # 용량 예약은 DB에 반영된 다음 해제한다.
+        reservation = UsageReservation(user_id, total_bytes)
+
+        def run(progress: Optional[Callable[[int, int], None]] = None) -> DataInfo:
+            try:
+                if source.is_dir:
+                    return DataDirectoryCRUDManager().copy(
+                        user_id, source, dir_root, name, entries, progress)
+                return DataFileCRUDManager().copy(
+                    user_id, source, dir_root, name, progress)
+            finally:
+                reservation.release()
+
+        if total_bytes <= SERVER['copy-background-size'] \
+                and len(entries or ()) <= SERVER['copy-background-entries']:
+            return run()
+        try:
+            # 이름 충돌같은 오류는 바로 알린다.
+            DataInfoCreate(
+                name=name, root=dir_root, user_id=user_id,
+                is_dir=source.is_dir, size=0)
+            if DataDBQuery().read(user_id=user_id, full_root=(dir_root, name)):
+                raise DataAlreadyExists()
+            return CopyJobs.start(
+                CopyJob(user_id, total_files, total_bytes),
+                lambda job: run(job.progress))
+        except Exception as e:
+            reservation.release()
+            raise e
+
+    def read_signature(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        block_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        차분 업로드를 위한 파일의 블록 서명
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 파일 아이디
+        :param block_size: 블록 크기 (없으면 파일 크기로 정한다)
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = UserDBQuery().read(user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        return DataFileCRUDManager().read_signature(
+            user_id=user_id,
+            data_id=data_id,
+            block_size=block_size,
+        )
+
+    async def upload_delta(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        base_etag: str,
+        chunks: AsyncIterator[bytes],
+    ) -> DataInfo:
+        """
+        차분 업로드
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 파일 아이디
+        :param base_etag: 서명을 받은 파일의 ETag (If-Match)
+        :param chunks: delta 스트림
+
+        :return: 수정된 데이터
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = \
+            await run_in_threadpool(UserDBQuery().read, user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        return await DataFileCRUDManager().update_by_delta(
+            user_id=user_id,
+            data_id=data_id,
+            base_etag=base_etag,
+            chunks=chunks,
+        )
+
+    def move(
+        self,
+        token: str,
+        user_id: int,
+        data_id: int,
+        data_ids: List[int],
+    ) -> List[DataInfo]:
+        """
+        여러 파일/디렉토리를 한 디렉토리로 이동
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 이동할 디렉토리 아이디 (0은 최상위)
+        :param data_ids: 이동할 데이터 아이디 리스트
+
+        :return: 이동된 데이터 리스트
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = UserDBQuery().read(user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        return DataDirectoryCRUDManager().move(
+            user_id=user_id,
+            target_id=data_id,
+            data_ids=data_ids,
+        )
+
+    def read_ancestors(self, token: str, user_id: int, data_id: int) -> List[DataInfo]:
+        """
+        데이터의 상위 디렉토리 전체 (경로 표시용)
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 데이터 아이디 (0은 최상위)
+
+        :return: 최상위 디렉토리부터 자기 자신까지의 데이터 리스트
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = UserDBQuery().read(user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        if data_id == 0:
+            return []
+        if not (datas := DataDBQuery().read_ancestors(user_id, data_id)):
+            raise DataNotFound()
+        return datas
+
+    def read_copy_job(self, token: str, user_id: int, job_id: str) -> CopyJob:
+        """
+        복사 작업 진행 상황
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param job_id: 작업 아이디
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: User = UserDBQuery().read(user_email=op_email)
+        # 해덩 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+        job: Optional[CopyJob] = CopyJobs.read(job_id)
+        if not job or job.user_id != user_id:
+            raise CopyJobNotFound()
+        return job
+
     def read(
         self, token: str, 
         user_id: int, 
         data_id: int, 
-        mode: str = 'info'
+        mode: str = 'info',
+        archive: str = 'zip',
+        conditions: Optional[Mapping[str, str]] = None,
     ) -> Dict[str, Any]:
+        """
+        파일/디렉토리 정보 또는 다운로드 대상 읽기
+
+        :param token: 로그인 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 데이터 아이디
+        :param mode: info 또는 download
+        :param archive: 디렉토리 다운로드 시 압축 형식
+        :param conditions: 조건부 요청 헤더 (If-None-Match, If-Modified-Since)
+                           바뀌지 않았으면 DataNotModified를 발생시킨다.
+        """
         
         op_email, issue = decode_token(token, LoginTokenGenerator)
         operator: User = UserDBQuery().read(user_email=op_email)
@@ -371,9 +1389,12 @@ class DataManager(FrontendManager):
         raw_root = \
             f'{SERVER["storage"]}/storage/{user_id}/root{data_info.root}{data_info.name}'
         # 스토리지 데이터 확인
-        storage_info = \
-            DataStorageQuery().read(
-                root=raw_root, is_dir=data_info.is_dir)
+        # 디렉토리는 하위 데이터를 읽지 않고 있는지만 확인한다. (크기는 DB의 집계를 사용)
+        if data_info.is_dir:
+            storage_info = os.path.isdir(raw_root)
+        else:
+            storage_info = \
+                DataStorageQuery().read(root=raw_root, is_dir=False)
         if not storage_info:
             # 실제 스토리지에 존재하지 않음
             DataDBQuery().destroy(data_info.id)
@@ -385,25 +1406,68 @@ class DataManager(FrontendManager):
             data_info = DataDBQuery().sync_file_size(
                 data_id=data_id, full_root=raw_root)
 
+        # ETag, Last-Modified
+        # stat과 DB 정보만으로 구하고, 바뀌지 않았으면 더 이상 디스크를 읽지 않는다.
+        dir_root = f'{data_info.root}{data_info.name}/'
+        key = None
+        if mode == 'download' and data_info.is_dir:
+            # 압축 결과물은 하위 데이터로 결정된다 (바이트 단위 동일은 보장 X)
+            key = DataDirectoryCRUDManager().fingerprint(user_id, dir_root, archive)
+            etag, last_modified = make_etag(key, weak=True), None
+        elif mode == 'download':
+            # RangeFileResponse와 같은 값
+            stat_result = os.stat(raw_root)
+            etag, last_modified = file_etag(stat_result), stat_result.st_mtime
+        elif data_info.is_dir:
+            # 하위 데이터가 바뀌면 집계와 수정 시각이 같이 바뀐다.
+            etag = make_etag(
+                data_info.id, data_info.root, data_info.name, data_info.is_dir,
+                data_info.created, data_info.child_count, data_info.file_count,
+                data_info.total_size, data_info.updated)
+            last_modified = \
+                data_info.updated.timestamp() if data_info.updated else None
+        else:
+            stat_result = os.stat(raw_root)
+            etag = make_etag(
+                data_info.id, data_info.root, data_info.name, data_info.is_dir,
+                data_info.created, data_info.size, data_info.updated,
+                file_etag(stat_result))
+            last_modified = max(
+                stat_result.st_mtime,
+                data_info.updated.timestamp() if data_info.updated else 0)
+        headers = validator_headers(etag, last_modified)
+        if conditions is not None and is_not_modified(conditions, etag, last_modified):
+            raise DataNotModified(headers)
+        if mode == 'download' and not data_info.is_dir and data_info.sha256:
+            # 업로드할 때 계산한 체크섬
+            headers['digest'] = digest_header(data_info.sha256, data_info.adler32)
+
         # 리턴 데이터
+        # 디렉토리의 size는 바로 아래 데이터 수, 하위 전체의 파일 수와 크기를 같이 보낸다.
         res = {
+            'headers': headers,
             'info': {
                 'created': data_info.created,
                 'root': data_info.root,
                 'is_dir': data_info.is_dir,
                 'name': data_info.name,
-                'size': len(os.listdir(raw_root)) if data_info.is_dir \
+                'size': (data_info.child_count or 0) if data_info.is_dir \
                     else data_info.size
             }
         }
+        if data_info.is_dir:
+            res['info']['file_count'] = data_info.file_count or 0
+            res['info']['total_size'] = data_info.total_size or 0
 
         if mode == 'download':
             # 다운로드 모드
-            # 다운로드 대상의 파일 주소만 리턴
+            # 파일은 파일 주소, 디렉토리는 Zip 스트림을 리턴
             if not data_info.is_dir:
                 res['file'] = DataFileCRUDManager().read(raw_root)
             else:
-                res['file'] = DataDirectoryCRUDManager().read(raw_root)
+                res['file'] = DataDirectoryCRUDManager().read(
+                    raw_root, user_id=user_id, dir_root=dir_root,
+                    archive=archive, key=key, total_size=data_info.total_size or 0)
         return res
     
     def update(
@@ -480,3 +1544,22 @@ class DataManager(FrontendManager):
                 DataFileCRUDManager().destroy(user_id, data_id)
         except Exception as e:
             raise e
+
+
+class ArchiveCacheManager(FrontendManager):
+
+    def read_stats(self, token: str) -> Dict[str, float]:
+        """
+        디렉토리 압축 캐시 현황 (Admin 전용)
+
+        :param token: 인증용 토큰
+        :return: 적중 횟수, 적중률, 절약한 바이트 수, 캐시 크기 등
+        """
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: Optional[User] = UserDBQuery().read(user_email=op_email)
+        if not operator:
+            raise PermissionError()
+        # Admin만 볼 수 있다
+        if not bool(AdminOnly(operator.is_admin) & LoginedOnly(issue)):
+            raise PermissionError()
+        return ArchiveCache.read_stats()
@@ -0,0 +1,94 @@
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func
+
+from apps.storage.models import DataChunk
+from system.connection.generators import DatabaseGenerator
+
+
+class DataChunkQuery:
+    """
+    청크 참조 수 관리
+    같은 청크를 동시에 갱신하지 않도록 ChunkStore의 lock 안에서만 호출한다.
+    """
+    # IN 절 변수 개수 제한 때문에 나눠서 조회한다.
+    batch_size = 500
+
+    def _read(self, session, hashes: List[str]) -> Dict[str, DataChunk]:
+        rows = dict()
+        for i in range(0, len(hashes), self.batch_size):
+            rows.update({
+                row.hash: row for row in
+                session.query(DataChunk)
+                    .filter(DataChunk.hash.in_(hashes[i:i + self.batch_size])).all()
+            })
+        return rows
+
+    def add_refs(self, counts: Dict[str, Tuple[int, int]]):
+        """
+        참조 수를 늘린다. 없는 청크는 새로 추가한다.
+
+        :param counts: {청크 해시: (청크 크기, 늘릴 참조 수)}
+        """
+        if not counts:
+            return
+        session = DatabaseGenerator.get_session()
+        try:
+            rows = self._read(session, list(counts.keys()))
+            for chunk_hash, (size, count) in counts.items():
+                if chunk_hash in rows:
+                    rows[chunk_hash].refs += count
+                else:
+                    session.add(DataChunk(hash=chunk_hash, size=size, refs=count))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+    def remove_refs(self, counts: Dict[str, int]) -> List[str]:
+        """
+        참조 수를 줄이고 더 이상 참조되지 않는 청크를 삭제한다.
+
+        :param counts: {청크 해시: 줄일 참조 수}
+
+        :return: 삭제된 청크 해시 (청크 파일도 삭제해야 한다.)
+        """
+        if not counts:
+            return []
+        session = DatabaseGenerator.get_session()
+        try:
+            rows = self._read(session, list(counts.keys()))
+            removed = []
+            for chunk_hash, count in counts.items():
+                row = rows.get(chunk_hash)
+                if row is None:
+                    continue
+                row.refs -= count
+                if row.refs <= 0:
+                    session.delete(row)
+                    removed.append(chunk_hash)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return removed
+        finally:
+            session.close()
+
+    def read_stats(self) -> Tuple[int, int, int]:
+        """
+        :return: (청크 수, 실제 저장된 크기, 참조 기준 크기)
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            count, stored, logical = session.query(
+                func.count(DataChunk.hash),
+                func.sum(DataChunk.size),
+                func.sum(DataChunk.size * DataChunk.refs),
+            ).one()
+            return count or 0, stored or 0, logical or 0
+        finally:
+            session.close()
@@ -1,11 +1,16 @@
-from sqlalchemy import and_, Sequence, func
-from typing import Optional
-import os
+from datetime import datetime
+from sqlalchemy import and_, or_, insert, select, Sequence, String, func, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from typing import Dict, List, Optional, Tuple
 
-from apps.storage.models import DataInfo
+from apps.storage.models import DataClosure, DataInfo
 from apps.data_tag.models import DataTag
+from apps.share.models import DataShared
 from apps.tag.models import Tag
+from apps.user.models import User
 from apps.storage.schemas import DataInfoCreate
+from apps.storage.utils.chunk_store import data_size
 from architecture.query.crud import (
     QueryCRUD,
     QueryCreator,
@@ -16,31 +21,221 @@ from architecture.query.crud import (
 from core.exc import DataAlreadyExists, DataNotFound
 from system.connection.generators import DatabaseGenerator
 
+# DataInfo.root_prefix 길이
+ROOT_PREFIX_LENGTH = 255
+
+
+def root_prefix(root: str) -> str:
+    return root[:ROOT_PREFIX_LENGTH]
+
+
+def root_is(root: str):
+    """
+    DataInfo.root == root 조건
+    root는 인덱스가 없으므로 root_prefix 인덱스로 찾은 다음 전체를 비교한다.
+    """
+    return and_(
+        DataInfo.root_prefix == root_prefix(root),
+        DataInfo.root == root,
+    )
+
+
+def root_under(dir_root: str):
+    """
+    dir_root 하위 데이터 전부에 대한 조건 (dir_root는 /로 끝나야 한다.)
+    LIKE 대신 root_prefix의 범위로 찾기 때문에 인덱스를 사용하고 와일드카드 문제도 없다.
+    '/' 다음 문자는 '0'이므로 [dir_root, dir_root[:-1] + '0') 범위가
+    dir_root로 시작하는 문자열 전부다.
+    """
+    prefix = root_prefix(dir_root)
+    if len(dir_root) <= ROOT_PREFIX_LENGTH:
+        return and_(
+            DataInfo.root_prefix >= prefix,
+            DataInfo.root_prefix < f'{prefix[:-1]}0',
+        )
+    # 긴 루트는 앞부분이 같은 데이터 중에서 다시 확인한다.
+    return and_(
+        DataInfo.root_prefix == prefix,
+        func.substr(DataInfo.root, 1, len(dir_root)) == dir_root,
+    )
+
+
+def _rewrite_root(src_prefix: str, dst_prefix: str) -> List[Tuple]:
+    # 하위 데이터 루트의 앞부분만 바꾸는 UPDATE 값
+    # MySQL은 SET을 왼쪽부터 반영하므로 root_prefix를 먼저 계산한다.
+    new_root = literal(dst_prefix, String) \
+        + func.substr(DataInfo.root, len(src_prefix) + 1)
+    return [
+        (DataInfo.root_prefix, func.substr(new_root, 1, ROOT_PREFIX_LENGTH)),
+        (DataInfo.root, new_root),
+    ]
+
+
+def _dir_id(session, user_id: int, dir_root: str) -> Optional[int]:
+    # 디렉토리 루트(/a/b/)의 디렉토리 아이디, 최상위(/)는 0, 없으면 None
+    if dir_root == '/':
+        return 0
+    parent_root, _, name = dir_root[:-1].rpartition('/')
+    return session.query(DataInfo.id).filter(and_(
+        DataInfo.user_id == user_id,
+        root_is(f'{parent_root}/'),
+        DataInfo.name == name,
+        DataInfo.is_dir == True,
+    )).limit(1).scalar()
+
+
+def _add_used(session, user_id: int, size: int):
+    # 사용자 사용량(User.used_bytes) 증감, 파일 정보 수정과 같은 트랜잭션에서 호출한다.
+    if size:
+        session.query(User).filter(User.id == user_id).update({
+            User.used_bytes: func.coalesce(User.used_bytes, 0) + size,
+        }, synchronize_session=False)
+
+
+def _amount(data) -> Tuple[int, int]:
+    # 데이터가 상위 디렉토리 집계에 더하는 (파일 수, 크기)
+    if data.is_dir:
+        return data.file_count or 0, data.total_size or 0
+    return 1, data.size
+
+
+def _roll_up(
+    session, data_id: int, parent_id: Optional[int],
+    children: int, files: int, size: int,
+):
+    """
+    data_id가 추가/삭제될 때 상위 디렉토리 집계 증감
+    바로 아래 데이터 수는 parent_id만, 파일 수와 크기는 closure로 찾은 모든 상위 디렉토리를 바꾼다.
+    data_id의 closure 행이 있어야 한다. (추가는 closure 연결 후, 삭제는 closure 삭제 전)
+    """
+    q = session.query(DataInfo)
+    if parent_id and children:
+        q.filter(DataInfo.id == parent_id).update({
+            DataInfo.child_count: func.coalesce(DataInfo.child_count, 0) + children,
+        }, synchronize_session=False)
+    if files or size:
+        ancestors = select(DataClosure.ancestor_id).where(and_(
+            DataClosure.descendant_id == data_id,
+            DataClosure.depth > 0,
+        ))
+        q.filter(DataInfo.id.in_(ancestors)).update({
+            DataInfo.file_count: func.coalesce(DataInfo.file_count, 0) + files,
+            DataInfo.total_size: func.coalesce(DataInfo.total_size, 0) + size,
+        }, synchronize_session=False)
+
+
+def _apply_rollups(session, rollups: Dict[int, List[int]]):
+    """
+    여러 디렉토리의 집계 증감을 한번에 반영한다.
+    증감이 같은 디렉토리끼리 UPDATE 하나로 묶는다. (같은 경로의 상위 디렉토리들은 대부분 같다.)
+
+    :param rollups: {디렉토리 아이디: [바로 아래 데이터 수, 파일 수, 크기]}
+    """
+    groups: Dict[Tuple[int, int, int], List[int]] = dict()
+    for data_id, delta in rollups.items():
+        if any(delta):
+            groups.setdefault(tuple(delta), []).append(data_id)
+    for (children, files, size), ids in groups.items():
+        for i in range(0, len(ids), 500):
+            session.query(DataInfo).filter(DataInfo.id.in_(ids[i:i + 500])).update({
+                DataInfo.child_count: func.coalesce(DataInfo.child_count, 0) + children,
+                DataInfo.file_count: func.coalesce(DataInfo.file_count, 0) + files,
+                DataInfo.total_size: func.coalesce(DataInfo.total_size, 0) + size,
+            }, synchronize_session=False)
+
+
+def _link_closure(session, datas: List[DataInfo]):
+    """
+    새로 만든 데이터의 closure 행 추가 (id, parent_id가 채워져 있어야 한다.)
+    상위 디렉토리의 행을 복사하므로 얕은 데이터부터 추가한다.
+    """
+    session.bulk_insert_mappings(DataClosure, [
+        {'ancestor_id': data.id, 'descendant_id': data.id, 'depth': 0}
+        for data in datas
+    ])
+    levels: Dict[int, List[int]] = dict()
+    for data in datas:
+        if data.parent_id:
+            levels.setdefault(data.root.count('/'), []).append(data.id)
+    for level in sorted(levels):
+        ids = levels[level]
+        for i in range(0, len(ids), 500):
+            session.execute(insert(DataClosure).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(DataClosure.ancestor_id, DataInfo.id, DataClosure.depth + 1)
+                    .select_from(DataInfo)
+                    .join(DataClosure, DataClosure.descendant_id == DataInfo.parent_id)
+                    .where(DataInfo.id.in_(ids[i:i + 500]))))
+
+
+def _relink_closure(session, data_ids: List[int], parent_id: Optional[int]):
+    """
+    data_ids를 parent_id 디렉토리(0은 최상위)로 옮길 때 closure 수정
+    하위 데이터 전체에서 이전 상위 디렉토리들의 행을 지우고 새 상위 디렉토리들과 연결한다.
+    data_ids는 서로의 하위 데이터가 아니어야 한다.
+    """
+    subtree, ancestors = [], set()
+    for i in range(0, len(data_ids), 500):
+        batch = data_ids[i:i + 500]
+        subtree += [
+            row[0] for row in session.query(DataClosure.descendant_id)
+                .filter(DataClosure.ancestor_id.in_(batch))
+        ]
+        ancestors.update(
+            row[0] for row in session.query(DataClosure.ancestor_id).filter(and_(
+                DataClosure.descendant_id.in_(batch),
+                DataClosure.depth > 0,
+            ))
+        )
+    # 이전 상위 디렉토리는 옮기는 데이터의 하위가 아니므로 하위 전체에서 지우면 된다.
+    ancestors = list(ancestors)
+    for j in range(0, len(ancestors), 500):
+        for i in range(0, len(subtree), 500):
+            session.query(DataClosure).filter(and_(
+                DataClosure.ancestor_id.in_(ancestors[j:j + 500]),
+                DataClosure.descendant_id.in_(subtree[i:i + 500]),
+            )).delete(synchronize_session=False)
+    if parent_id:
+        above, below = aliased(DataClosure), aliased(DataClosure)
+        for i in range(0, len(data_ids), 500):
+            session.execute(insert(DataClosure).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(
+                    above.ancestor_id, below.descendant_id,
+                    above.depth + below.depth + 1,
+                ).select_from(above)
+                    .join(below, below.ancestor_id.in_(data_ids[i:i + 500]))
+                    .where(above.descendant_id == parent_id)))
+
+
 class DataDBQueryCreator(QueryCreator):
     def __call__(self, data_format: DataInfoCreate) -> DataInfo:
+        """
+        같은 디렉토리에 같은 이름이 있으면 생성하지 않는다.
+        중복 확인은 유니크 제약조건(user_id, parent_id, name)과 INSERT 한번으로 하므로
+        동시에 같은 이름으로 생성해도 하나만 생성된다.
 
+        :exception DataAlreadyExists: 같은 이름의 데이터가 이미 있음
+        """
         session = DatabaseGenerator.get_session()
-        q = session.query(DataInfo)
-
-        data: DataInfo = DataInfo(
-            name=data_format.name,
-            root=data_format.root,
-            user_id=data_format.user_id,
-            is_dir=data_format.is_dir,
-            size=data_format.size,
-        )
-        # user_id & name & root & is_dir일 경우 생성 불가능
-        if q.filter(and_(
-            DataInfo.name == data.name,
-            DataInfo.root == data.root,
-            DataInfo.user_id == data.user_id,
-            DataInfo.is_dir == data.is_dir
-        )).scalar():
-            raise DataAlreadyExists()
-        
         try:
-            # DB 업로드
-            session.add(data)
+            result = session.execute(DatabaseGenerator.insert_ignore(DataInfo).values(
+                name=data_format.name,
+                root=data_format.root,
+                root_prefix=root_prefix(data_format.root),
+                parent_id=_dir_id(session, data_format.user_id, data_format.root),
+                user_id=data_format.user_id,
+                is_dir=data_format.is_dir,
+                size=data_format.size,
+                sha256=data_format.sha256,
+                adler32=data_format.adler32,
+            ))
+            if not result.rowcount or not result.inserted_primary_key[0]:
+                raise DataAlreadyExists()
+            data: DataInfo = session.get(DataInfo, result.inserted_primary_key[0])
+            _link_closure(session, [data])
+            _roll_up(session, data.id, data.parent_id, 1, *_amount(data))
+            _add_used(session, data.user_id, data.size)
             session.commit()
             session.refresh(data)
         except Exception as e:
@@ -59,36 +254,37 @@ class DataDBQueryDestroyer(QueryDestroyer):
         data: DataInfo = q.filter(DataInfo.id == data_id).scalar()
         root, name = data.root, data.name
         try:
-            if data.is_dir:
-                # 디렉토리
-                # 하위 디렉토리 태그 전부 삭제
-                infos = session.query(DataInfo, DataTag, Tag) \
-                    .filter(and_(
-                        DataInfo.user_id == data.user_id,
-                        DataInfo.root.startswith(f'{data.root}{data.name}/')
-                    )) \
-                    .filter(and_(
-                        DataTag.datainfo_id == DataInfo.id,
-                        Tag.id == DataTag.id,
-                    )).all()
-                for _, _, tag in infos:
+            # 자기 자신과 하위 데이터 전부 (closure 조인 한번)
+            ids = [
+                row[0] for row in session.query(DataClosure.descendant_id)
+                    .filter(DataClosure.ancestor_id == data_id)
+            ] or [data_id]
+            # 지우는 파일 수와 크기를 상위 디렉토리 집계와 사용량에서 뺀다.
+            files, freed = 0, 0
+            for i in range(0, len(ids), 500):
+                count, size = session.query(
+                    func.count(DataInfo.id), func.coalesce(func.sum(DataInfo.size), 0),
+                ).filter(and_(
+                    DataInfo.id.in_(ids[i:i + 500]),
+                    DataInfo.is_dir == False,
+                )).one()
+                files, freed = files + count, freed + size
+            _roll_up(session, data_id, data.parent_id, -1, -files, -freed)
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                # 태그 삭제
+                tags = session.query(Tag) \
+                    .join(DataTag, DataTag.tag_id == Tag.id) \
+                    .filter(DataTag.datainfo_id.in_(batch)).all()
+                for tag in tags:
                     session.delete(tag)
-
-                # 하위 데이터 전부 삭제
-                q.filter(and_(
-                    DataInfo.user_id == data.user_id,
-                    DataInfo.root.startswith(f'{data.root}{data.name}/')
-                )).delete(synchronize_session='fetch')
-            
-            # 디렉토리/파일 전부 해당되는 내용 -> 자기 자신과 태그 삭제
-            infos = session.query(DataTag, Tag).filter(and_(
-                    DataTag.datainfo_id == data_id,
-                    Tag.id == DataTag.tag_id,
-            )).all()
-            for _, tag in infos:
-                session.delete(tag)
-            # 파일
-            q.filter(DataInfo.id == data_id).delete()
+                session.flush()
+                # 데이터 삭제
+                session.query(DataClosure) \
+                    .filter(DataClosure.descendant_id.in_(batch)) \
+                    .delete(synchronize_session=False)
+                q.filter(DataInfo.id.in_(batch)).delete(synchronize_session=False)
+            _add_used(session, data.user_id, -freed)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -118,17 +314,17 @@ class DataDBQueryReader(QueryReader):
                 # search by data_id
                 query = q.filter(DataInfo.id == data_id)
                 if user_id:
-                    query.filter(DataInfo.user_id == user_id)
+                    query = query.filter(DataInfo.user_id == user_id)
                 data: DataInfo = query.scalar()
 
             elif full_root:
                 # search by full_root
                 query = q.filter(and_(
-                    DataInfo.root == full_root[0],
+                    root_is(full_root[0]),
                     DataInfo.name == full_root[1],
                 ))
                 if user_id:
-                    query.filter(DataInfo.user_id == user_id)
+                    query = query.filter(DataInfo.user_id == user_id)
                 data = query.scalar()
         except Exception as e:
             session.rollback()
@@ -166,18 +362,21 @@ class DataDBQueryUpdator(QueryUpdator):
             prev_name = data_info.name
             data_info.name = new_name
             if data_info.is_dir:
-                # 디렉토리인 경우 하위 디렉토리의 루트 수정
-                dst_root = data_info.root + prev_name + '/'
-                src_root = data_info.root + new_name + '/'
+                # 디렉토리인 경우 하위 데이터 루트의 앞부분만 수정
+                src_root = data_info.root + prev_name + '/'
+                dst_root = data_info.root + new_name + '/'
                 q.filter(and_(
                     DataInfo.user_id == user_id,
-                    DataInfo.root.startswith(dst_root),
-                )).update({
-                    DataInfo.root: func.replace(
-                        DataInfo.root, dst_root, src_root)
-                }, synchronize_session=False)
+                    root_under(src_root),
+                )).update(
+                    _rewrite_root(src_root, dst_root),
+                    synchronize_session=False,
+                    update_args={'preserve_parameter_order': True})
             session.commit()
             session.refresh(data_info)
+        except IntegrityError:
+            session.rollback()
+            raise DataAlreadyExists()
         except Exception as e:
             session.rollback()
             raise e
@@ -207,7 +406,14 @@ class DataDBQuery(QueryCRUD):
         try:
             # 데이터 수정
             # 싸이즈만 변경하면 된다.
+            # 크기가 같아도 내용은 바뀌었으므로 수정 시각은 항상 갱신한다.
+            delta = data_format.size - data_info.size
+            _roll_up(session, data_info.id, None, 0, 0, delta)
+            _add_used(session, data_info.user_id, delta)
             data_info.size = data_format.size
+            data_info.sha256 = data_format.sha256
+            data_info.adler32 = data_format.adler32
+            data_info.updated = datetime.now()
             session.commit()
             session.refresh(data_info)
         except Exception as e:
@@ -227,9 +433,13 @@ class DataDBQuery(QueryCRUD):
             raise DataNotFound()
         try:
             # 비교 후 수정
-            real_size, db_size = os.path.getsize(full_root), data_info.size
+            real_size, db_size = data_size(full_root), data_info.size
             if real_size != db_size:
+                _roll_up(session, data_info.id, None, 0, 0, real_size - db_size)
+                _add_used(session, data_info.user_id, real_size - db_size)
                 data_info.size = real_size
+                # 밖에서 내용이 바뀌었으므로 체크섬은 더 이상 맞지 않는다.
+                data_info.sha256, data_info.adler32 = None, None
                 session.commit()
                 session.refresh(data_info)
         except Exception as e:
@@ -240,3 +450,547 @@ class DataDBQuery(QueryCRUD):
         finally:
             session.close()
 
+    def read_entries(self, user_id: int, root: str) -> List[DataInfo]:
+        # 디렉토리 바로 아래의 데이터 전부 (한번에 여러 파일을 올릴 때 중복 확인용)
+        session = DatabaseGenerator.get_session()
+        try:
+            return session.query(DataInfo).filter(and_(
+                DataInfo.user_id == user_id,
+                root_is(root),
+            )).all()
+        finally:
+            session.close()
+
+    def read_subtree(self, user_id: int, dir_root: str) -> List[DataInfo]:
+        """
+        디렉토리 하위의 데이터 전부
+
+        :param dir_root: 디렉토리 루트 (/mydir/ 같이 /로 끝나야 한다.)
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            return session.query(DataInfo).filter(and_(
+                DataInfo.user_id == user_id,
+                root_under(dir_root),
+            )).all()
+        finally:
+            session.close()
+
+    def bulk_create(
+        self,
+        data_formats: List[DataInfoCreate],
+        overwrites: Optional[Dict[int, DataInfoCreate]] = None,
+    ) -> List[DataInfo]:
+        """
+        여러 파일 정보를 하나의 트랜잭션으로 생성한다.
+        중간에 실패하면 전부 반영되지 않는다.
+
+        :param data_formats: 새로 생성할 데이터
+        :param overwrites: 덮어쓴 데이터의 {아이디: 새 데이터 (크기, 체크섬)}
+
+        :return: 생성 및 갱신된 데이터 (data_formats, overwrites 순서)
+
+        :exception DataAlreadyExists: 같은 디렉토리에 같은 이름의 데이터가 있음
+        """
+        overwrites = overwrites or dict()
+        session = DatabaseGenerator.get_session()
+        try:
+            datas = [
+                DataInfo(
+                    name=data_format.name,
+                    root=data_format.root,
+                    root_prefix=root_prefix(data_format.root),
+                    user_id=data_format.user_id,
+                    is_dir=data_format.is_dir,
+                    size=data_format.size,
+                    sha256=data_format.sha256,
+                    adler32=data_format.adler32,
+                ) for data_format in data_formats
+            ]
+            session.add_all(datas)
+            session.flush()
+            # 상위 디렉토리 아이디 (같이 생성한 디렉토리 먼저)
+            dir_ids = {
+                (data.user_id, f'{data.root}{data.name}/'): data.id
+                for data in datas if data.is_dir
+            }
+            for data in datas:
+                key = (data.user_id, data.root)
+                if key not in dir_ids:
+                    dir_ids[key] = _dir_id(session, *key)
+                data.parent_id = dir_ids[key]
+            session.flush()
+            _link_closure(session, datas)
+            used: Dict[int, int] = dict()
+            for data in datas:
+                used[data.user_id] = used.get(data.user_id, 0) + data.size
+            # 상위 디렉토리 집계, 같이 생성한 디렉토리도 closure로 같이 계산한다.
+            rollups: Dict[int, List[int]] = dict()
+            new_ids = [data.id for data in datas]
+            for i in range(0, len(new_ids), 500):
+                for ancestor_id, depth, is_dir, size in session.query(
+                    DataClosure.ancestor_id, DataClosure.depth, DataInfo.is_dir, DataInfo.size,
+                ).join(DataInfo, DataInfo.id == DataClosure.descendant_id).filter(and_(
+                    DataClosure.descendant_id.in_(new_ids[i:i + 500]),
+                    DataClosure.depth > 0,
+                )):
+                    delta = rollups.setdefault(ancestor_id, [0, 0, 0])
+                    if depth == 1:
+                        delta[0] += 1
+                    if not is_dir:
+                        delta[1], delta[2] = delta[1] + 1, delta[2] + size
+            if overwrites:
+                # 덮어쓴 파일은 크기 차이만큼
+                overwrite_ids = list(overwrites.keys())
+                changed: Dict[int, int] = dict()
+                for i in range(0, len(overwrite_ids), 500):
+                    for data_id, user_id, size in session.query(
+                        DataInfo.id, DataInfo.user_id, DataInfo.size,
+                    ).filter(DataInfo.id.in_(overwrite_ids[i:i + 500])):
+                        changed[data_id] = overwrites[data_id].size - size
+                        used[user_id] = used.get(user_id, 0) + changed[data_id]
+                for i in range(0, len(overwrite_ids), 500):
+                    for ancestor_id, data_id in session.query(
+                        DataClosure.ancestor_id, DataClosure.descendant_id,
+                    ).filter(and_(
+                        DataClosure.descendant_id.in_(overwrite_ids[i:i + 500]),
+                        DataClosure.depth > 0,
+                    )):
+                        rollups.setdefault(ancestor_id, [0, 0, 0])[2] += changed[data_id]
+                updated = datetime.now()
+                session.bulk_update_mappings(DataInfo, [
+                    {
+                        'id': data_id,
+                        'size': data_format.size,
+                        'sha256': data_format.sha256,
+                        'adler32': data_format.adler32,
+                        'updated': updated,
+                    } for data_id, data_format in overwrites.items()
+                ])
+            _apply_rollups(session, rollups)
+            for user_id, size in used.items():
+                _add_used(session, user_id, size)
+            session.flush()
+            ids = [data.id for data in datas] + list(overwrites.keys())
+            session.commit()
+            # 갱신된 정보를 다시 읽는다. (IN 절 변수 개수 제한 때문에 나눠서)
+            rows = dict()
+            for i in range(0, len(ids), 500):
+                rows.update({
+                    data.id: data for data in
+                    session.query(DataInfo)
+                        .filter(DataInfo.id.in_(ids[i:i + 500])).all()
+                })
+        except IntegrityError:
+            session.rollback()
+            raise DataAlreadyExists()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return [rows[data_id] for data_id in ids]
+        finally:
+            session.close()
+
+    def read_ancestors(self, user_id: int, data_id: int) -> List[DataInfo]:
+        """
+        데이터와 모든 상위 디렉토리를 한번에 읽는다. (closure 조인 한번)
+
+        :return: 최상위 디렉토리부터 자기 자신까지, 없는 데이터는 빈 리스트
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            return session.query(DataInfo) \
+                .join(DataClosure, DataClosure.ancestor_id == DataInfo.id) \
+                .filter(and_(
+                    DataClosure.descendant_id == data_id,
+                    DataInfo.user_id == user_id,
+                )).order_by(DataClosure.depth.desc()).all()
+        finally:
+            session.close()
+
+    def read_many(self, user_id: int, data_ids: List[int]) -> List[DataInfo]:
+        """
+        여러 데이터를 한번에 읽는다. (IN 절 변수 개수 제한 때문에 나눠서)
+        없는 아이디는 건너뛴다.
+
+        :return: data_ids 순서의 데이터 리스트
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            rows = dict()
+            for i in range(0, len(data_ids), 500):
+                for data in session.query(DataInfo).filter(and_(
+                    DataInfo.user_id == user_id,
+                    DataInfo.id.in_(data_ids[i:i + 500]),
+                )).all():
+                    rows[data.id] = data
+            return [rows[data_id] for data_id in data_ids if data_id in rows]
+        finally:
+            session.close()
+
+    def move(
+        self, user_id: int, datas: List[DataInfo], dst_root: str
+    ) -> List[DataInfo]:
+        """
+        여러 데이터를 dst_root 디렉토리로 옮긴다.
+        옮기는 데이터의 루트는 한번에, 디렉토리 하위 데이터의 루트는
+        디렉토리마다 앞부분만 바꾸는 UPDATE 하나로 수정하며 전부 하나의 트랜잭션이다.
+        하위 데이터의 상위 디렉토리는 그대로이므로 parent_id는 옮기는 데이터만 바뀐다.
+        closure는 옮기는 데이터의 하위 전체를 이전/새 상위 디렉토리와 다시 연결한다.
+        상위 디렉토리 집계 증감은 디렉토리별로 모아서 한번에 반영한다.
+        datas는 서로의 하위 데이터가 아니어야 한다.
+
+        :param user_id: 사용자 아이디
+        :param datas: 옮길 데이터
+        :param dst_root: 옮길 디렉토리 루트 (/mydir/)
+
+        :return: 수정된 데이터 수 (하위 데이터 포함)
+        """
+        session = DatabaseGenerator.get_session()
+        q = session.query(DataInfo)
+        ids = [data.id for data in datas]
+        updated = 0
+        try:
+            parent_id = _dir_id(session, user_id, dst_root)
+            # 옮기기 전의 상위 디렉토리와 집계할 값 (트랜잭션 안에서 다시 읽는다.)
+            current = dict()
+            for i in range(0, len(ids), 500):
+                for row in session.query(
+                    DataInfo.id, DataInfo.parent_id, DataInfo.is_dir, DataInfo.size,
+                    DataInfo.file_count, DataInfo.total_size,
+                ).filter(DataInfo.id.in_(ids[i:i + 500])):
+                    current[row.id] = row
+            # 이전 상위 디렉토리들의 집계에서 빼고 새 상위 디렉토리들에 더한다
+            rollups: Dict[int, List[int]] = dict()
+            moved = list(current.keys())
+            for i in range(0, len(moved), 500):
+                for ancestor_id, data_id, depth in session.query(
+                    DataClosure.ancestor_id, DataClosure.descendant_id, DataClosure.depth,
+                ).filter(and_(
+                    DataClosure.descendant_id.in_(moved[i:i + 500]),
+                    DataClosure.depth > 0,
+                )):
+                    files, size = _amount(current[data_id])
+                    delta = rollups.setdefault(ancestor_id, [0, 0, 0])
+                    if depth == 1:
+                        delta[0] -= 1
+                    delta[1], delta[2] = delta[1] - files, delta[2] - size
+            if parent_id and current:
+                files = sum(_amount(row)[0] for row in current.values())
+                size = sum(_amount(row)[1] for row in current.values())
+                for (ancestor_id,) in session.query(DataClosure.ancestor_id) \
+                        .filter(DataClosure.descendant_id == parent_id):
+                    delta = rollups.setdefault(ancestor_id, [0, 0, 0])
+                    delta[1], delta[2] = delta[1] + files, delta[2] + size
+                rollups[parent_id][0] += len(current)
+            for i in range(0, len(ids), 500):
+                updated += q.filter(and_(
+                    DataInfo.user_id == user_id,
+                    DataInfo.id.in_(ids[i:i + 500]),
+                )).update({
+                    DataInfo.root: dst_root,
+                    DataInfo.root_prefix: root_prefix(dst_root),
+                    DataInfo.parent_id: parent_id,
+                }, synchronize_session=False)
+            _relink_closure(session, moved, parent_id)
+            _apply_rollups(session, rollups)
+            for data in datas:
+                if not data.is_dir:
+                    continue
+                # 하위 데이터 루트의 앞부분만 바꾼다
+                src_prefix = f'{data.root}{data.name}/'
+                dst_prefix = f'{dst_root}{data.name}/'
+                updated += q.filter(and_(
+                    DataInfo.user_id == user_id,
+                    root_under(src_prefix),
+                )).update(
+                    _rewrite_root(src_prefix, dst_prefix),
+                    synchronize_session=False,
+                    update_args={'preserve_parameter_order': True})
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            raise DataAlreadyExists()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return updated
+        finally:
+            session.close()
+
+    def read_by_checksum(
+        self, user_id: int, size: int, sha256: str, limit: int = 8
+    ) -> List[DataInfo]:
+        """
+        크기와 체크섬이 같은 사용자의 파일들을 읽는다. (같은 내용 찾기용)
+        (user_id, sha256) 인덱스를 사용한다.
+
+        :param user_id: 사용자 아이디
+        :param size: 파일 크기
+        :param sha256: 파일 체크섬 (16진수)
+        :param limit: 최대 개수
+
+        :return: 최근에 수정된 순서의 파일 리스트
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            return session.query(DataInfo).filter(and_(
+                DataInfo.user_id == user_id,
+                DataInfo.sha256 == sha256,
+                DataInfo.size == size,
+                DataInfo.is_dir == False,
+            )).order_by(DataInfo.updated.desc()).limit(limit).all()
+        finally:
+            session.close()
+
+    def read_unhashed(
+        self, after_id: int = 0, limit: int = 500
+    ) -> List[Tuple[int, int, str, str, int]]:
+        """
+        체크섬이 없는 파일들을 아이디 순서로 읽는다. (체크섬 채우기용)
+
+        :param after_id: 이 아이디 다음부터 읽는다.
+        :param limit: 최대 개수
+
+        :return: (아이디, 유저 아이디, 루트, 이름, 크기) 리스트
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            return [
+                tuple(row) for row in session.query(
+                    DataInfo.id, DataInfo.user_id,
+                    DataInfo.root, DataInfo.name, DataInfo.size,
+                ).filter(and_(
+                    DataInfo.id > after_id,
+                    DataInfo.is_dir == False,
+                    DataInfo.sha256 == None,
+                )).order_by(DataInfo.id).limit(limit).all()
+            ]
+        finally:
+            session.close()
+
+    def update_checksums(
+        self, checksums: List[Tuple[int, str, Optional[str]]]
+    ) -> int:
+        """
+        체크섬을 한번에 반영한다.
+        그 사이 업로드로 체크섬이 채워진 데이터는 건드리지 않는다.
+
+        :param checksums: (아이디, sha256, adler32) 리스트
+
+        :return: 반영된 데이터 수
+        """
+        if not checksums:
+            return 0
+        session = DatabaseGenerator.get_session()
+        try:
+            updated = 0
+            for data_id, sha256, adler32 in checksums:
+                # 수정 시각(updated)은 바꾸지 않는다.
+                updated += session.query(DataInfo).filter(and_(
+                    DataInfo.id == data_id,
+                    DataInfo.sha256 == None,
+                )).update({
+                    DataInfo.sha256: sha256,
+                    DataInfo.adler32: adler32,
+                    DataInfo.updated: DataInfo.updated,
+                }, synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return updated
+        finally:
+            session.close()
+
+    def backfill_paths(self) -> int:
+        """
+        root_prefix, parent_id가 없는 기존 데이터를 채운다. (마이그레이션)
+        채울 데이터가 없으면 조회 두번으로 끝난다.
+
+        :return: 채운 데이터 수
+        """
+        session = DatabaseGenerator.get_session()
+        q = session.query(DataInfo)
+        try:
+            # 수정 시각(updated)은 바꾸지 않는다.
+            updated = q.filter(DataInfo.root_prefix == None).update({
+                DataInfo.root_prefix: func.substr(DataInfo.root, 1, ROOT_PREFIX_LENGTH),
+                DataInfo.updated: DataInfo.updated,
+            }, synchronize_session=False)
+            # parent_id가 없는 데이터는 루트마다 상위 디렉토리를 찾는다.
+            roots = session.query(DataInfo.user_id, DataInfo.root) \
+                .filter(DataInfo.parent_id == None).distinct().all()
+            for user_id, root in roots:
+                parent_id = _dir_id(session, user_id, root)
+                if parent_id is None:
+                    continue
+                updated += q.filter(and_(
+                    DataInfo.user_id == user_id,
+                    root_is(root),
+                    DataInfo.parent_id == None,
+                )).update({
+                    DataInfo.parent_id: parent_id,
+                    DataInfo.updated: DataInfo.updated,
+                }, synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return updated
+        finally:
+            session.close()
+
+    def backfill_closure(self, batch_size: int = 10000) -> int:
+        """
+        closure table이 비어 있으면 parent_id로 다시 만든다. (마이그레이션)
+        backfill_paths 다음에 호출해야 한다.
+
+        :return: 추가한 행 수
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            if session.query(DataClosure.ancestor_id).first() \
+                    or not session.query(DataInfo.id).first():
+                return 0
+            parents = dict(session.query(DataInfo.id, DataInfo.parent_id).all())
+            added, rows = 0, []
+            for data_id in parents:
+                # 상위로 올라가면서 추가
+                ancestor, depth = data_id, 0
+                while ancestor:
+                    rows.append({
+                        'ancestor_id': ancestor,
+                        'descendant_id': data_id,
+                        'depth': depth,
+                    })
+                    ancestor, depth = parents.get(ancestor), depth + 1
+                if len(rows) >= batch_size:
+                    session.bulk_insert_mappings(DataClosure, rows)
+                    added, rows = added + len(rows), []
+            session.bulk_insert_mappings(DataClosure, rows)
+            added += len(rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return added
+        finally:
+            session.close()
+
+    def dedupe_names(self) -> int:
+        """
+        같은 디렉토리에 이름이 같은 데이터가 여러개면 가장 먼저 만든 것만 남긴다. (마이그레이션)
+        스토리지에는 하나만 있으므로 DB의 나머지 행만 지운다.
+        지우는 디렉토리의 하위 데이터는 남기는 디렉토리로 옮긴 다음 다시 확인하고,
+        하나라도 지웠으면 closure table과 디렉토리 집계를 다시 만든다.
+
+        :return: 삭제한 데이터 수
+        """
+        session = DatabaseGenerator.get_session()
+        q = session.query(DataInfo)
+        removed = 0
+        try:
+            while groups := session.query(
+                DataInfo.user_id, DataInfo.parent_id, DataInfo.name, func.min(DataInfo.id),
+            ).filter(DataInfo.parent_id != None) \
+                .group_by(DataInfo.user_id, DataInfo.parent_id, DataInfo.name) \
+                .having(func.count(DataInfo.id) > 1).all():
+                for user_id, parent_id, name, keep_id in groups:
+                    ids = [row[0] for row in session.query(DataInfo.id).filter(and_(
+                        DataInfo.user_id == user_id,
+                        DataInfo.parent_id == parent_id,
+                        DataInfo.name == name,
+                        DataInfo.id != keep_id,
+                    ))]
+                    q.filter(DataInfo.parent_id.in_(ids)) \
+                        .update({DataInfo.parent_id: keep_id}, synchronize_session=False)
+                    for tag in session.query(Tag) \
+                            .join(DataTag, DataTag.tag_id == Tag.id) \
+                            .filter(DataTag.datainfo_id.in_(ids)).all():
+                        session.delete(tag)
+                    session.flush()
+                    session.query(DataShared).filter(DataShared.datainfo_id.in_(ids)) \
+                        .delete(synchronize_session=False)
+                    removed += q.filter(DataInfo.id.in_(ids)) \
+                        .delete(synchronize_session=False)
+            if removed:
+                session.query(DataClosure).delete(synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+        if removed:
+            self.backfill_closure()
+            self.rebuild_aggregates()
+        return removed
+
+    def rebuild_aggregates(self) -> int:
+        """
+        디렉토리 집계를 parent_id와 closure table로 다시 계산하고 다른 값만 고친다.
+        (마이그레이션, DB를 직접 수정한 경우) backfill_closure 다음에 호출해야 한다.
+        파일은 비어있는 값만 0으로 채운다.
+
+        :return: 고친 데이터 수
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            fixed = session.query(DataInfo).filter(and_(
+                DataInfo.is_dir == False,
+                or_(
+                    DataInfo.child_count == None,
+                    DataInfo.file_count == None,
+                    DataInfo.total_size == None,
+                ),
+            )).update({
+                DataInfo.child_count: 0,
+                DataInfo.file_count: 0,
+                DataInfo.total_size: 0,
+                DataInfo.updated: DataInfo.updated,
+            }, synchronize_session=False)
+            expected: Dict[int, List[int]] = dict()
+            for parent_id, count in session.query(DataInfo.parent_id, func.count(DataInfo.id)) \
+                    .filter(DataInfo.parent_id != None) \
+                    .group_by(DataInfo.parent_id):
+                expected.setdefault(parent_id, [0, 0, 0])[0] = count
+            for ancestor_id, count, size in session.query(
+                DataClosure.ancestor_id,
+                func.count(DataInfo.id), func.coalesce(func.sum(DataInfo.size), 0),
+            ).join(DataInfo, DataInfo.id == DataClosure.descendant_id).filter(and_(
+                DataClosure.depth > 0,
+                DataInfo.is_dir == False,
+            )).group_by(DataClosure.ancestor_id):
+                expected.setdefault(ancestor_id, [0, 0, 0])[1:] = [count, size]
+            wrong = []
+            for data in session.query(
+                DataInfo.id, DataInfo.child_count, DataInfo.file_count,
+                DataInfo.total_size, DataInfo.updated,
+            ).filter(DataInfo.is_dir == True):
+                values = expected.get(data.id, [0, 0, 0])
+                if [data.child_count, data.file_count, data.total_size] == values:
+                    continue
+                # 수정 시각(updated)은 바꾸지 않는다.
+                wrong.append({
+                    'id': data.id,
+                    'child_count': values[0],
+                    'file_count': values[1],
+                    'total_size': values[2],
+                    'updated': data.updated,
+                })
+            for i in range(0, len(wrong), 500):
+                session.bulk_update_mappings(DataInfo, wrong[i:i + 500])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        else:
+            return fixed + len(wrong)
+        finally:
+            session.close()
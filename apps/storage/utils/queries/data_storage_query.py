@@ -1,8 +1,23 @@
 import os
-import shutil
-from typing import Dict, List, Optional
+import uuid
+from typing import AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 from fastapi import UploadFile
-from apps.user.utils.queries.user_db_query import UserDBQuery
+from starlette.concurrency import run_in_threadpool
+from apps.storage.utils.checksums import ContentHasher
+from apps.storage.utils.chunk_store import (
+    ChunkStore,
+    ChunkWriter,
+    data_size,
+    ref_manifest,
+    remove_data,
+    remove_tree,
+    replace_data,
+    replace_data_async,
+)
+from apps.storage.utils.clone import copy_file, link_file
+from apps.storage.utils.durability import fsync_root, sync_file
+from apps.storage.utils.streams import buffered
+from apps.user.utils.quota import UsageReservation
 
 from architecture.query.crud import (
     QueryCRUD, 
@@ -11,7 +26,41 @@ from architecture.query.crud import (
     QueryReader,
     QueryUpdator
 )
-from core.exc import UsageLimited
+from settings.base import DURABILITY_NONE, SERVER
+
+# 업로드 중인 임시파일 이름의 접두사
+# 덮어쓰는 도중에도 기존 파일을 그대로 읽을 수 있도록
+# 같은 디렉토리의 임시파일에 먼저 쓰고 다 쓰면 os.replace로 교체한다.
+UPLOAD_TEMP_PREFIX = '.cm-upload-'
+
+
+def is_upload_temp(name: str) -> bool:
+    return name.startswith(UPLOAD_TEMP_PREFIX)
+
+
+def _temp_root(root: str) -> str:
+    return f'{os.path.dirname(root)}/{UPLOAD_TEMP_PREFIX}{uuid.uuid4().hex}'
+
+
+def _write(
+    f: Union[BinaryIO, ChunkWriter], data: bytes, hasher: Optional[ContentHasher]
+):
+    # 쓰기와 체크섬 계산을 같은 스레드에서 한번에 처리한다.
+    if hasher is not None:
+        hasher.update(data)
+    f.write(data)
+
+
+def _chunk_writer() -> Optional[ChunkWriter]:
+    # 청크 저장소를 쓰면 파일 대신 청크로 저장하고 임시파일에는 매니페스트를 쓴다.
+    return ChunkWriter() if ChunkStore.enabled() else None
+
+
+def _finish(f: BinaryIO, writer: Optional[ChunkWriter]):
+    if writer is not None:
+        f.write(writer.finish())
+    f.flush()
+    sync_file(f.fileno())
 
 
 class DataStorageQueryCreator(QueryCreator):
@@ -22,11 +71,20 @@ class DataStorageQueryCreator(QueryCreator):
         rewrite: bool = False,
         file: Optional[UploadFile] = None,
         user_id: Optional[int] = None,
+        reservation: Optional[UsageReservation] = None,
+        hasher: Optional[ContentHasher] = None,
     ) -> int:
         """
         파일 또는 디렉토리 생성
         이미 존재하는 경우 AsertionError 호출
 
+        파일은 reservation으로 예약한 용량 안에서만 기록하며
+        예약을 늘릴 수 없으면 쓰다 만 파일을 삭제하고 UsageLimited를 호출한다.
+        reservation이 없으면 user_id로 새로 예약하고 끝난 뒤 해제한다.
+        같은 이름의 파일이 있으면 임시파일에 다 쓴 다음 교체한다.
+        hasher가 있으면 쓰면서 체크섬도 같이 계산한다.
+        청크 저장소를 쓰면 청크로 나눠서 저장하고 root에는 매니페스트를 저장한다.
+
         :return: 데이터 길이 (디렉토리는 파일 0개이므로 0, 파일은 파일 크기)
         """
         if is_dir:
@@ -41,24 +99,37 @@ class DataStorageQueryCreator(QueryCreator):
                 # rewrite를 하지 않는 경우
                 assert os.path.isfile(root) is False
             
-            segment_size = 1000 # 1000바이트씩 끊어서
+            own_reservation = reservation is None
+            if own_reservation:
+                reservation = UsageReservation(user_id)
+            segment_size = SERVER['upload-buffer-size']
             data_len = 0 # 데이터 길이
-            with open(root, 'wb') as f:
-                while s := file.file.read(segment_size):
-                    f.write(s)
-                    data_len += len(s)
-            # 데이터 크기 비교
+            tmp_root = _temp_root(root)
+            writer = _chunk_writer()
             try:
-                usage_data = UserDBQuery().read_usage(user_id)
-                entire, used = usage_data['entire'], usage_data['used']
-                if used + data_len > entire:
-                    # 메모리 초과, 데이터 삭제 후 Exception
-                    os.remove(root)
-                    raise UsageLimited()
+                with open(tmp_root, 'wb') as f:
+                    out = f if writer is None else writer
+                    while s := file.file.read(segment_size):
+                        # 예약 용량을 넘기 전에 확인
+                        reservation.ensure(data_len + len(s))
+                        _write(out, s, hasher)
+                        data_len += len(s)
+                    _finish(f, writer)
+                replace_data(tmp_root, root)
+                if writer is not None:
+                    writer.commit()
             except Exception as e:
+                # 용량 초과 또는 업로드 중단 시 쓰다 만 파일 삭제
+                # 기존 파일은 그대로 남는다.
+                if os.path.isfile(tmp_root):
+                    os.remove(tmp_root)
                 raise e
-            else:
-                return data_len
+            finally:
+                if writer is not None:
+                    writer.close()
+                if own_reservation:
+                    reservation.release()
+            return data_len
 
 class DataStorageQueryReader(QueryReader):
     def __call__(self, root: str, is_dir: bool) -> Optional[Dict]:
@@ -90,15 +161,15 @@ class DataStorageQueryReader(QueryReader):
                 return None
             else:
                 return {
-                    'size': os.path.getsize(root),
+                    'size': data_size(root),
                 }
 
 class DataStorageQueryDestroyer(QueryDestroyer):
     def __call__(self, root: str):
         if os.path.isfile(root):
-            os.remove(root)
+            remove_data(root)
         elif os.path.isdir(root):
-            shutil.rmtree(root)
+            remove_tree(root)
 
 class DataStorageQueryUpdator(QueryUpdator):
     def __call__(self, root: str, new_name: str) -> Optional[str]:
@@ -116,3 +187,184 @@ class DataStorageQuery(QueryCRUD):
     destroyer = DataStorageQueryDestroyer
     reader =  DataStorageQueryReader
     updator = DataStorageQueryUpdator
+
+    def move(self, src: str, dst: str):
+        """
+        스토리지 안에서 파일을 옮긴다.
+        같은 파일시스템 안에서는 os.replace로 한번에 옮겨진다.
+        청크 저장소를 쓰면 src를 청크로 나눠서 저장하고 src는 삭제한다.
+
+        :param src: 원본 실제 루트
+        :param dst: 옮길 실제 루트
+        """
+        writer = _chunk_writer()
+        if writer is None:
+            with open(src, 'rb') as f:
+                sync_file(f.fileno())
+            replace_data(src, dst)
+            return
+
+        tmp_root = _temp_root(dst)
+        try:
+            with open(src, 'rb') as f:
+                while s := f.read(SERVER['upload-buffer-size']):
+                    writer.write(s)
+            with open(tmp_root, 'wb') as f:
+                _finish(f, writer)
+            replace_data(tmp_root, dst)
+            writer.commit()
+        except Exception as e:
+            if os.path.isfile(tmp_root):
+                os.remove(tmp_root)
+            raise e
+        finally:
+            writer.close()
+        os.remove(src)
+
+    def rename_many(self, pairs: List[Tuple[str, str]]):
+        """
+        여러 파일/디렉토리를 os.rename으로 옮긴다. 데이터는 복사하지 않는다.
+        하나라도 실패하면 이미 옮긴 것을 되돌리고 예외를 다시 발생시킨다.
+
+        :param pairs: (원본 실제 루트, 옮길 실제 루트) 리스트
+
+        :exception FileExistsError: 옮길 자리에 이미 데이터가 있음
+        :exception FileNotFoundError: 원본이 없음
+        """
+        moved: List[Tuple[str, str]] = []
+        try:
+            for src, dst in pairs:
+                if os.path.lexists(dst):
+                    # os.rename은 파일을 덮어쓰므로 먼저 확인한다.
+                    raise FileExistsError(dst)
+                os.rename(src, dst)
+                moved.append((src, dst))
+        except Exception as e:
+            for src, dst in reversed(moved):
+                os.rename(dst, src)
+            raise e
+        if SERVER['storage-durability'] != DURABILITY_NONE:
+            # rename 자체도 디스크에 반영
+            for root in {os.path.dirname(root) for pair in pairs for root in pair}:
+                fsync_root(root)
+
+    def link(self, src: str, dst: str) -> str:
+        """
+        데이터를 복사하지 않고 src와 같은 내용의 파일을 dst에 만든다.
+        dst에 파일이 있으면 교체한다.
+        매니페스트는 링크하지 않고 새 매니페스트를 만들어서 청크 참조 수를 올린다.
+
+        :param src: 원본 실제 루트
+        :param dst: 만들 실제 루트
+
+        :return: 사용한 방법 (reflink, hardlink, manifest)
+        """
+        return self._clone(src, dst, link_file)
+
+    def copy(
+        self,
+        src: str,
+        dst: str,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> str:
+        """
+        src를 복사한 새 파일을 dst에 만든다.
+        reflink를 지원하면 블록을 공유하고, 아니면 copy_file_range로 복사한다.
+        매니페스트는 새 매니페스트를 만들어서 청크 참조 수만 올린다.
+
+        :param src: 원본 실제 루트
+        :param dst: 만들 실제 루트
+        :param progress: 복사한 바이트 수를 받는 함수
+
+        :return: 사용한 방법 (reflink, copy_file_range, copy, manifest)
+        """
+        def clone(src_root: str, tmp_root: str) -> str:
+            method = copy_file(src_root, tmp_root, progress)
+            with open(tmp_root, 'rb') as f:
+                sync_file(f.fileno())
+            return method
+
+        method = self._clone(src, dst, clone)
+        if method == 'manifest' and progress:
+            progress(data_size(dst))
+        return method
+
+    def _clone(
+        self, src: str, dst: str, clone: Callable[[str, str], str]
+    ) -> str:
+        # 임시파일에 복제한 다음 dst로 교체한다. (매니페스트는 새로 만든다)
+        tmp_root = _temp_root(dst)
+        manifest = ref_manifest(src)
+        try:
+            if manifest is None:
+                method = clone(src, tmp_root)
+            else:
+                method = 'manifest'
+                with open(tmp_root, 'wb') as f:
+                    f.write(manifest[0])
+                    f.flush()
+                    sync_file(f.fileno())
+            replace_data(tmp_root, dst)
+        except Exception as e:
+            if os.path.isfile(tmp_root):
+                os.remove(tmp_root)
+            if manifest is not None:
+                ChunkStore.release(manifest[1])
+            raise e
+        return method
+
+    async def create_stream(
+        self,
+        root: str,
+        chunks: AsyncIterator[bytes],
+        reservation: UsageReservation,
+        hasher: Optional[ContentHasher] = None,
+        verify: Optional[Callable[[], None]] = None,
+    ) -> int:
+        """
+        비동기 스트림으로 파일 생성
+        쓰기는 threadpool에서 진행되므로 이벤트 루프를 막지 않는다.
+        같은 디렉토리의 임시파일에 다 쓴 다음 root로 교체한다.
+        청크 저장소를 쓰면 청크로 나눠서 저장하고 root에는 매니페스트를 저장한다.
+        chunk는 upload-buffer-size 단위로 모아서 기록하며
+        예약한 용량을 넘기 전에 예약을 늘리고, 실패하면 즉시 중단한다.
+
+        :param root: 저장할 파일의 실제 루트
+        :param chunks: 파일 데이터 스트림
+        :param reservation: 업로드 용량 예약
+        :param hasher: 있으면 쓰면서 체크섬도 같이 계산한다.
+        :param verify: 다 쓴 다음 교체하기 전에 호출한다. 예외가 발생하면 교체하지 않는다.
+
+        :return: 데이터 길이
+        """
+        data_len = 0
+        tmp_root = _temp_root(root)
+        writer = _chunk_writer()
+        try:
+            f = await run_in_threadpool(open, tmp_root, 'wb')
+            try:
+                out = f if writer is None else writer
+                async for s in buffered(chunks, SERVER['upload-buffer-size']):
+                    if data_len + len(s) > reservation.size:
+                        await run_in_threadpool(
+                            reservation.ensure, data_len + len(s))
+                    await run_in_threadpool(_write, out, s, hasher)
+                    data_len += len(s)
+                await run_in_threadpool(_finish, f, writer)
+            finally:
+                await run_in_threadpool(f.close)
+            if verify is not None:
+                verify()
+            await replace_data_async(tmp_root, root)
+            if writer is not None:
+                writer.commit()
+        except Exception as e:
+            # 용량 초과 또는 업로드 중단 시 쓰다 만 파일 삭제
+            # 기존 파일은 그대로 남는다.
+            if os.path.isfile(tmp_root):
+                os.remove(tmp_root)
+            raise e
+        finally:
+            if writer is not None:
+                await run_in_threadpool(writer.close)
+        return data_len
@@ -0,0 +1,175 @@
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartFileStream:
+    """
+    multipart/form-data 요청 본문에서 파일 파트를 바로 스트리밍한다.
+
+    UploadFile은 본문 전체를 임시파일에 먼저 저장하기 때문에
+    같은 데이터를 디스크에 두번 쓰게 된다.
+    여기서는 request.stream()을 직접 파싱하여
+    파일 파트의 데이터만 저장 위치로 흘려보낸다.
+
+    사용법
+        stream = MultipartFileStream(request.stream(), content_type)
+        filename = await stream.open()      # 파일 파트의 헤더까지만 읽음
+        async for chunk in stream:          # 파일 데이터
+            ...
+
+        # 파일 여러개
+        while (filename := await stream.next_file()) is not None:
+            async for chunk in stream:
+                ...
+    """
+
+    def __init__(
+        self,
+        stream: AsyncIterator[bytes],
+        content_type: str,
+        field_name: str = 'file',
+    ):
+        """
+        :param stream: 요청 본문 스트림 (request.stream())
+        :param content_type: Content-Type 헤더
+        :param field_name: 파일 파트의 form 이름
+
+        :exception ValueError: multipart 요청이 아니거나 boundary가 없음
+        """
+        ctype, params = parse_options_header(content_type)
+        if ctype != b'multipart/form-data' or b'boundary' not in params:
+            raise ValueError('invalid multipart content-type')
+        self.filename: Optional[str] = None     # 현재 읽고 있는 파일 이름
+        self._stream = stream.__aiter__()
+        self._field_name = field_name.encode()
+        self._headers: Dict[bytes, bytes] = dict()
+        self._header_field = b''
+        self._header_value = b''
+        self._in_file = False       # 파싱 중인 파트가 파일 파트인지
+        # 파서가 만든 이벤트: ('file', 파일이름), ('data', 데이터), ('end', None)
+        self._events: Deque[Tuple[str, object]] = deque()
+        self._parser = MultipartParser(params[b'boundary'], callbacks={
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = dict()
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b'', b''
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(
+            self._headers.get(b'content-disposition', b''))
+        if options.get(b'name') == self._field_name \
+            and b'filename' in options:
+            self._in_file = True
+            self._events.append(('file', options[b'filename'].decode()))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            # 요청 chunk를 복사하지 않고 필요한 구간만 참조한다.
+            self._events.append(('data', memoryview(data)[start:end]))
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._events.append(('end', None))
+
+    async def _feed(self) -> bool:
+        """
+        요청 본문을 한 chunk 읽어서 파싱한다.
+
+        :return: 본문이 끝났으면 False
+        """
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            return False
+        if chunk:
+            self._parser.write(chunk)
+        return True
+
+    async def next_file(self) -> Optional[str]:
+        """
+        다음 파일 파트의 헤더까지 읽고 파일 이름을 반환한다.
+        현재 파일에서 읽지 않은 데이터는 버린다.
+
+        :return: 파일 이름, 더이상 파일이 없으면 None
+        """
+        while True:
+            while self._events:
+                kind, value = self._events.popleft()
+                if kind == 'file':
+                    self.filename = value
+                    return value
+            if not await self._feed():
+                self.filename = None
+                return None
+
+    async def open(self) -> str:
+        """
+        첫번째 파일 파트의 헤더까지 읽고 파일 이름을 반환한다.
+
+        :exception ValueError: 파일 파트가 없음
+        """
+        filename = await self.next_file()
+        if filename is None:
+            raise ValueError('no file part')
+        return filename
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """
+        현재 파일 파트의 데이터를 읽는 대로 내보낸다.
+        파일 파트가 끝나기 전에 본문이 끝나면 ValueError
+        """
+        if self.filename is None:
+            await self.open()
+        while True:
+            while self._events:
+                kind, value = self._events.popleft()
+                if kind == 'data':
+                    yield value
+                elif kind == 'end':
+                    return
+            if not await self._feed():
+                raise ValueError('incomplete multipart body')
+
+
+async def buffered(
+    chunks: AsyncIterator[bytes], buffer_size: int
+) -> AsyncIterator[bytes]:
+    """
+    작은 chunk들을 buffer_size 이상으로 모아서 내보낸다.
+    파일 쓰기 한번마다 threadpool을 거치기 때문에
+    쓰기 횟수를 줄이는 용도로 사용한다.
+
+    :param chunks: 원본 chunk 스트림
+    :param buffer_size: 모아서 내보낼 크기 (byte)
+    """
+    buf = bytearray()
+    async for chunk in chunks:
+        if not buf and len(chunk) >= buffer_size:
+            # 이미 충분히 큰 chunk는 복사하지 않고 그대로 내보낸다.
+            yield chunk
+            continue
+        buf += chunk
+        if len(buf) >= buffer_size:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
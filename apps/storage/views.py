@@ -1,21 +1,35 @@
 import json
-from typing import Optional
+from typing import List, Optional
 from fastapi import (
     APIRouter, 
-    BackgroundTasks, 
     HTTPException, 
     Request, 
     Response, 
-    UploadFile, 
     status
 )
 import pydantic
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from apps.storage.schemas import DataInfoRead
-from apps.storage.utils.managers import DataManager
-from core.exc import DataAlreadyExists, DataNotFound, UsageLimited, UserNotFound
-from core.background_tasks import background_remove_file
+from apps.storage.schemas import DataBatchRead, DataInfoRead
+from apps.storage.utils.archives import ARCHIVE_MEDIA_TYPES, archive_formats
+from apps.storage.utils.chunk_store import open_data
+from apps.storage.utils.copy_jobs import CopyJob
+from apps.storage.utils.managers import ArchiveCacheManager, DataManager
+from apps.storage.utils.streams import MultipartFileStream
+from core.exc import (
+    CopyJobNotFound,
+    DataAlreadyExists,
+    DataContentNotFound,
+    DataNotFound,
+    DataNotModified,
+    DataTargetInSubtree,
+    DataVersionMismatch,
+    UsageLimited,
+    UserNotFound,
+)
+from core.responses import RangeFileResponse
 
 storage_router = APIRouter(
     prefix='/api/users/{user_id}/datas/{data_id}',
@@ -23,9 +37,29 @@ storage_router = APIRouter(
     responses={404: {'error': 'Not Found'}}
 )
 
+copy_job_router = APIRouter(
+    prefix='/api/users/{user_id}/copy-jobs',
+    tags=['storage'],
+    responses={404: {'error': 'Not Found'}}
+)
+
+archive_cache_router = APIRouter(
+    prefix='/api/storage/archive-cache',
+    tags=['storage'],
+    responses={404: {'error': 'Not Found'}}
+)
+
 class StorageView:
     """
     (POST)      /api/users/{user_id}/datas/{data_id}    파일/디렉토리 생성
+    (PUT)       /api/users/{user_id}/datas/{data_id}/content?name=  파일 업로드 (요청 본문 그대로)
+    (POST)      /api/users/{user_id}/datas/{data_id}/content/by-hash 같은 내용의 파일이 있으면 업로드 없이 생성
+    (POST)      /api/users/{user_id}/datas/{data_id}/batch  여러 파일 업로드
+    (GET)       /api/users/{user_id}/datas/{data_id}/signature  차분 업로드를 위한 블록 서명
+    (PUT)       /api/users/{user_id}/datas/{data_id}/delta  차분 업로드 (바뀐 부분만 전송)
+    (POST)      /api/users/{user_id}/datas/{data_id}/copy   파일/디렉토리 복사
+    (POST)      /api/users/{user_id}/datas/{data_id}/move   여러 파일/디렉토리를 이 디렉토리로 이동
+    (GET)       /api/users/{user_id}/datas/{data_id}/ancestors  최상위부터 자기 자신까지의 디렉토리 목록
     (GET)       /api/users/{user_id}/datas/{data_id}    파일/디렉토리 기본 정보
     (PATCH)     /api/users/{user_id}/datas/{data_id}    파일/디렉토리 이름 수정
     (DELETE)    /api/users/{user_id}/datas/{data_id}    파일/디렉토리 삭제
@@ -40,12 +74,13 @@ class StorageView:
         request: Request, 
         user_id: int, 
         data_id: int,
-        file: Optional[UploadFile] = None,
     ):
         """
         파일/디렉토리 생성 API
+        Content-Type으로 요청을 구분하며, 파일 업로드의 경우
+        본문을 메모리나 임시파일에 올리지 않고 저장 위치에 바로 기록한다.
         
-        :params files(form): 업로드할 파일 리스트, 없을 경우 디렉토리 생성으로 간주한다.
+        :params file(form): 업로드할 파일, 없을 경우 디렉토리 생성으로 간주한다.
         :params dirname(json): 생성할 디렉토리의 이름.
         """
         try:
@@ -60,41 +95,62 @@ class StorageView:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail='server error')
         
-        dirname = None
-        try:
+        content_type = request.headers.get('content-type', '')
+        dirname, file_stream, filename = None, None, None
+        if content_type.startswith('multipart/form-data'):
+            try:
+                # 파일 파트의 헤더까지만 읽고 파일 이름을 구한다.
+                file_stream = \
+                    MultipartFileStream(request.stream(), content_type)
+                filename = await file_stream.open()
+            except ValueError:
+                # 파일 파트가 없음
+                file_stream = None
+        else:
             try:
-                # 요청된 디렉토리 이름 추출하기
-                _req = await request.json()
-            except RuntimeError:
-                # json데이터가 없는경우, 파일 요청으로 간주
+                try:
+                    # 요청된 디렉토리 이름 추출하기
+                    _req = await request.json()
+                except RuntimeError:
+                    # json데이터가 없는경우
+                    pass
+                except Exception as e:
+                    # 알 수 없는 에러
+                    raise e
+                else:
+                    if _req and 'dirname' in _req:
+                        # 새 디랙토리의 이름을 받음
+                        dirname = _req['dirname']
+            except json.decoder.JSONDecodeError:
+                # 없는경우 그냥 패스한다.
                 pass
             except Exception as e:
-                # 알 수 없는 에러
-                raise e
-            else:
-                if _req and 'dirname' in _req:
-                    # 새 디랙토리의 이름을 받음
-                    dirname = _req['dirname']
-        except json.decoder.JSONDecodeError:
-            # 없는경우 그냥 패스한다. -> 파일 생성으로 간주
-            pass
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail='server error')
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail='server error')
 
-        if (not dirname) and (not file):
+        if (not dirname) and (not file_stream):
             # 디렉토리, 파일 요청 둘다 아무것도 없음
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail='파일 업로드 또는 디렉토리 생성을 해야 합니다.')
 
         try:
-            # 파일 업로드 또는 디렉토리 생성
-            created_datas = DataManager().create(
-                token, user_id,
-                data_id, file, dirname
-            )
+            if file_stream:
+                # 파일 업로드
+                # 요청 크기만큼 용량을 먼저 예약한 다음
+                # 요청 본문을 읽는 대로 저장한다.
+                created_datas = await DataManager().upload(
+                    token, user_id, data_id, filename, file_stream,
+                    declared_size=int(request.headers.get('content-length', 0)),
+                )
+            else:
+                # 디렉토리 생성
+                created_datas = await run_in_threadpool(
+                    DataManager().create,
+                    token, user_id,
+                    data_id, None, dirname
+                )
         except UsageLimited:
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
@@ -108,6 +164,11 @@ class StorageView:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=msg)
+        except ValueError:
+            # multipart 본문이 중간에 끊김
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='잘못된 업로드 요청 입니다.')
         except UserNotFound:
             """
             Admin이 Client에 데이터를 추가할 때
@@ -133,6 +194,537 @@ class StorageView:
         else:
             return created_datas
 
+    @staticmethod
+    @storage_router.put(
+        path='/content',
+        status_code=status.HTTP_201_CREATED,
+        response_model=DataInfoRead)
+    async def upload_content(
+        request: Request,
+        user_id: int,
+        data_id: int,
+        name: str,
+    ):
+        """
+        파일 업로드 API (raw body)
+        multipart 인코딩 없이 요청 본문 전체를 파일 내용으로 저장한다.
+        같은 이름의 파일이 있으면 덮어쓴다.
+
+        :params name(query): 업로드할 파일 이름
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            created_data = await DataManager().upload(
+                token, user_id, data_id, name, request.stream(),
+                declared_size=int(request.headers.get('content-length', 0)),
+            )
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except pydantic.ValidationError as e:
+            msg = str(e.args[0][0].exc)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=msg)
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 생성하기 위한 상위 디렉토리가 없습니다.')
+        except DataAlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='같은 이름의 디렉토리가 이미 존재합니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return created_data
+
+    @staticmethod
+    @storage_router.post(
+        path='/content/by-hash',
+        status_code=status.HTTP_201_CREATED,
+        response_model=DataInfoRead)
+    async def upload_by_hash(request: Request, user_id: int, data_id: int):
+        """
+        업로드 전 체크섬 확인 API
+        사용자의 파일 중 크기와 sha256이 같은 파일이 있으면
+        본문 전송 없이 그 파일을 링크해서 생성한다. (201)
+        없으면 404를 보내며, 이 때는 PUT /content 등으로 업로드 해야 한다.
+
+        :params name(json): 생성할 파일 이름
+        :params size(json): 파일 크기 (byte)
+        :params sha256(json): 파일 체크섬 (16진수)
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            req = await request.json()
+            name, size, sha256 = req['name'], int(req['size']), str(req['sha256'])
+        except (RuntimeError, KeyError, TypeError, ValueError, json.decoder.JSONDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='요청값이 없습니다.')
+
+        try:
+            created_data = await run_in_threadpool(
+                DataManager().upload_by_checksum,
+                token, user_id, data_id, name, size, sha256)
+        except DataContentNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='같은 내용의 파일이 없습니다. 파일을 업로드해야 합니다.')
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except pydantic.ValidationError as e:
+            msg = str(e.args[0][0].exc)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=msg)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='파일 크기 또는 체크섬이 유효하지 않습니다.')
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 생성하기 위한 상위 디렉토리가 없습니다.')
+        except DataAlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='같은 이름의 디렉토리가 이미 존재합니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return created_data
+
+    @staticmethod
+    @storage_router.post(
+        path='/batch',
+        status_code=status.HTTP_201_CREATED,
+        response_model=DataBatchRead)
+    async def upload_batch(request: Request, user_id: int, data_id: int):
+        """
+        여러 파일 업로드 API
+        한 디렉토리에 여러 파일을 한번에 올린다.
+        실패한 파일은 건너뛰고 실패 목록(failed)에 이유와 함께 반환한다.
+
+        :params files(form): 업로드할 파일들
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            files = MultipartFileStream(
+                request.stream(),
+                request.headers.get('content-type', ''),
+                field_name='files')
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='파일 업로드를 해야 합니다.')
+
+        try:
+            created_datas, failed = await DataManager().upload_batch(
+                token, user_id, data_id, files,
+                declared_size=int(request.headers.get('content-length', 0)),
+            )
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except ValueError:
+            # multipart 본문이 중간에 끊김
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='잘못된 업로드 요청 입니다.')
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 생성하기 위한 상위 디렉토리가 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        failed_datas = []
+        for name, e in failed:
+            if isinstance(e, pydantic.ValidationError):
+                detail = str(e.args[0][0].exc)
+            elif isinstance(e, UsageLimited):
+                detail = '제한 용량을 초과했습니다.'
+            else:
+                detail = '같은 이름의 데이터가 이미 존재합니다.'
+            failed_datas.append({'name': name, 'detail': detail})
+        return {'created': created_datas, 'failed': failed_datas}
+
+    @staticmethod
+    @storage_router.get(
+        path='/signature',
+        status_code=status.HTTP_200_OK)
+    async def get_signature(
+        request: Request,
+        user_id: int,
+        data_id: int,
+        block_size: Optional[int] = None,
+    ):
+        """
+        블록 서명 API (rsync 방식 차분 업로드 1단계)
+        파일을 block_size 단위로 나눈 블록마다 [adler32, blake2b-128]를 반환한다.
+        응답의 etag는 PUT /delta 요청에 If-Match 헤더로 보낸다.
+
+        :params block_size(query): 블록 크기 (1KB ~ 1MB, 없으면 파일 크기로 정한다)
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            signature = await run_in_threadpool(
+                DataManager().read_signature, token, user_id, data_id, block_size)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='블록 크기가 유효하지 않습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 찾을 수 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return JSONResponse(
+                content=signature, headers={'etag': signature['etag']})
+
+    @staticmethod
+    @storage_router.put(
+        path='/delta',
+        status_code=status.HTTP_201_CREATED,
+        response_model=DataInfoRead)
+    async def upload_delta(request: Request, user_id: int, data_id: int):
+        """
+        차분 업로드 API (rsync 방식 차분 업로드 2단계)
+        요청 본문은 기존 파일의 구간 복사와 새 데이터로 이루어진 delta 이다.
+        (형식은 apps/storage/utils/delta.py 참고)
+        새 버전은 기존 파일 옆에 만들어지고 sha256이 맞으면 한번에 교체된다.
+
+        :params If-Match(header): 서명을 받을 때의 etag
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        base_etag = request.headers.get('if-match')
+        if not base_etag:
+            raise HTTPException(
+                status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+                detail='If-Match 헤더가 없습니다.')
+
+        try:
+            updated_data = await DataManager().upload_delta(
+                token, user_id, data_id, base_etag.strip(), request.stream())
+        except DataVersionMismatch:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail='서명을 받은 뒤 파일이 바뀌었습니다. 서명을 다시 받아야 합니다.')
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='잘못된 차분 업로드 요청 입니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 찾을 수 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return updated_data
+
+    @staticmethod
+    @storage_router.post(
+        path='/copy',
+        status_code=status.HTTP_201_CREATED,
+        response_model=DataInfoRead)
+    async def copy_data(request: Request, user_id: int, data_id: int):
+        """
+        파일/디렉토리 복사 API
+        파일시스템이 지원하면 reflink로 데이터 블록을 공유하고,
+        아니면 copy_file_range로 커널 안에서 복사한다.
+        복사할 크기가 크면 백그라운드 작업으로 복사하고 202와 작업 정보를 반환한다.
+        진행 상황은 GET /api/users/{user_id}/copy-jobs/{job_id}로 확인한다.
+
+        :params target(json): 복사할 위치의 디렉토리 아이디 (0은 최상위)
+        :params name(json): 새 이름 (없으면 원래 이름)
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            req = await request.json()
+            target_id, name = int(req['target']), req.get('name')
+            if name is not None and not isinstance(name, str):
+                raise TypeError()
+        except (RuntimeError, KeyError, TypeError, ValueError,
+                AttributeError, json.decoder.JSONDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='요청값이 없습니다.')
+
+        try:
+            res = await run_in_threadpool(
+                DataManager().copy, token, user_id, data_id, target_id, name)
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except pydantic.ValidationError as e:
+            msg = str(e.args[0][0].exc)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=msg)
+        except DataTargetInSubtree:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='디렉토리를 자기 자신의 하위로 복사할 수 없습니다.')
+        except DataAlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='같은 이름의 데이터가 이미 존재합니다.')
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='복사할 데이터 또는 대상 디렉토리를 찾을 수 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        if isinstance(res, CopyJob):
+            # 백그라운드 작업
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED, content=res.to_dict())
+        return res
+
+    @staticmethod
+    @storage_router.post(
+        path='/move',
+        status_code=status.HTTP_200_OK,
+        response_model=List[DataInfoRead])
+    async def move_datas(request: Request, user_id: int, data_id: int):
+        """
+        이동 API
+        여러 파일/디렉토리를 data_id 디렉토리(0은 최상위)로 이동한다.
+        데이터는 복사하지 않고 이름(경로)만 바꾸며, DB는 하나의 트랜잭션으로 수정된다.
+        하나라도 이동할 수 없으면 아무것도 이동하지 않는다.
+
+        :params ids(json): 이동할 데이터 아이디 리스트
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            req = await request.json()
+            data_ids = [int(i) for i in req['ids']]
+            if not data_ids:
+                raise ValueError()
+        except (RuntimeError, KeyError, TypeError, ValueError,
+                json.decoder.JSONDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='요청값이 없습니다.')
+
+        try:
+            res = await run_in_threadpool(
+                DataManager().move, token, user_id, data_id, data_ids)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except DataTargetInSubtree:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='디렉토리를 자기 자신의 하위로 이동할 수 없습니다.')
+        except DataAlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='같은 이름의 데이터가 이미 존재합니다.')
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='상위 디렉토리와 하위 데이터를 같이 이동할 수 없습니다.')
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='이동할 데이터 또는 대상 디렉토리를 찾을 수 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return res
+
+    @staticmethod
+    @storage_router.get(
+        path='/ancestors',
+        status_code=status.HTTP_200_OK,
+        response_model=List[DataInfoRead])
+    async def get_ancestors(request: Request, user_id: int, data_id: int):
+        """
+        상위 디렉토리 API
+        최상위 디렉토리부터 data_id 자기 자신까지 순서대로 반환한다. (경로 표시용)
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            res = await run_in_threadpool(
+                DataManager().read_ancestors, token, user_id, data_id)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='해당 데이터를 찾을 수 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return res
+
     @staticmethod
     @storage_router.get(
         path='',
@@ -142,7 +734,7 @@ class StorageView:
         user_id: int, 
         data_id: int, 
         method: str,
-        background_tasks: BackgroundTasks,
+        archive: str = 'zip',
     ):
 
         if method not in ('info', 'download'):
@@ -150,6 +742,11 @@ class StorageView:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail='잘못된 접근 입니다.')
+        if archive not in archive_formats():
+            # 지원하지 않는 압축 형식
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='지원하지 않는 압축 형식 입니다.')
 
         try:
             # 토큰 가져오기
@@ -165,7 +762,12 @@ class StorageView:
 
         try:
             # 정보 검색
-            data = DataManager().read(token, user_id, data_id, method)
+            data = DataManager().read(
+                token, user_id, data_id, method, archive, request.headers)
+        except DataNotModified as e:
+            # 바뀌지 않음 (If-None-Match, If-Modified-Since)
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=e.headers)
         except PermissionError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -188,16 +790,19 @@ class StorageView:
                 detail='server error')
 
         if method == 'info':
-            return data['info']
+            return JSONResponse(
+                jsonable_encoder(data['info']), headers=data['headers'])
         else:
             # 파일 다운로드
-            download_root = data['file']
-            data['file'] = FileResponse(download_root)
-            
-            # 디렉토리일 경우에는 임시파일을 후에 지운다
             if data['info']['is_dir']:
-                background_tasks.add_task(background_remove_file, download_root)
-            return data['file']
+                # 디렉토리는 압축하면서 바로 보낸다
+                return StreamingResponse(
+                    data['file'], media_type=ARCHIVE_MEDIA_TYPES[archive],
+                    headers=data['headers'])
+            # 파일은 Range 요청을 지원한다
+            return RangeFileResponse(
+                data['file'], request.headers, opener=open_data,
+                headers=data['headers'])
 
     @staticmethod
     @storage_router.patch(
@@ -297,4 +902,85 @@ class StorageView:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail='server error')
         else:
-            return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+class CopyJobView:
+    """
+    (GET)       /api/users/{user_id}/copy-jobs/{job_id}     복사 작업 진행 상황
+    """
+
+    @staticmethod
+    @copy_job_router.get(
+        path='/{job_id}',
+        status_code=status.HTTP_200_OK)
+    def get_copy_job(request: Request, user_id: int, job_id: str):
+        """
+        복사 작업 진행 상황 API
+        status는 running, done, failed 중 하나이며
+        done이면 data_id가 복사된 데이터의 아이디다.
+        """
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            job = DataManager().read_copy_job(token, user_id, job_id)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except CopyJobNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='복사 작업을 찾을 수 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return job.to_dict()
+
+
+class ArchiveCacheView:
+    """
+    (GET)       /api/storage/archive-cache  디렉토리 압축 캐시 현황 (Admin 전용)
+    """
+
+    @staticmethod
+    @archive_cache_router.get(
+        path='',
+        status_code=status.HTTP_200_OK)
+    def get_archive_cache_stats(request: Request):
+        try:
+            # 토큰 가져오기
+            token = request.headers['token']
+        except KeyError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='요청 토큰이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+
+        try:
+            stats = ArchiveCacheManager().read_stats(token)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return stats
@@ -0,0 +1,254 @@
+import os
+import time
+import hashlib
+import json
+import pytest
+from fastapi.testclient import TestClient
+from fastapi import status
+
+from main import app
+from apps.auth.utils.managers import AppAuthManager
+from apps.user.utils.managers import UserCRUDManager
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.upload.utils.queries import UploadSessionQuery
+from settings.base import SERVER
+from system.bootloader import Bootloader
+
+
+client_info, other_info = None, None
+mydir_id = None
+
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info, other_info, mydir_id
+    # Load Application
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    # Add Client
+    client_info = {
+        'email': 'seokbong60@gmail.com',
+        'name': 'jeonhyun',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    user = UserCRUDManager().create(**client_info)
+    client_info['id'] = user.id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+    # Add Other
+    other_info = {
+        'email': 'seokbong61@gmail.com',
+        'name': 'jeonhyun2',
+        'passwd': 'password0123',
+        'storage_size': 1,
+    }
+    user = UserCRUDManager().create(**other_info)
+    other_info['id'] = user.id
+    other_info['token'] = AppAuthManager().login(
+        other_info['email'], other_info['passwd'])
+    # add directory mydir on root
+    mydir_id = DataDirectoryCRUDManager().create(
+        root_id=0, user_id=client_info['id'], dirname='mydir').id
+    # Return test api
+    yield TestClient(app)
+    # Remove all data
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+
+def create_session(api: TestClient, name: str, size: int, data_id: int = None):
+    if data_id is None:
+        data_id = mydir_id
+    return api.post(
+        f'/api/users/{client_info["id"]}/datas/{data_id}/uploads',
+        headers={'token': client_info['token']},
+        json={'name': name, 'size': size},
+    )
+
+
+def put_chunk(api: TestClient, session_id: str, offset: int, data: bytes):
+    return api.put(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}?offset={offset}',
+        headers={'token': client_info['token']},
+        data=data,
+    )
+
+
+def test_no_token(api: TestClient):
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/{mydir_id}/uploads',
+        json={'name': 'a.txt', 'size': 10},
+    )
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_other_access_failed(api: TestClient):
+    res = api.post(
+        f'/api/users/{client_info["id"]}/datas/{mydir_id}/uploads',
+        headers={'token': other_info['token']},
+        json={'name': 'a.txt', 'size': 10},
+    )
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # 다른 사용자의 세션에 접근 불가
+    session_id = create_session(api, 'a.txt', 10).json()['session_id']
+    res = api.get(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}',
+        headers={'token': other_info['token']},
+    )
+    assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_create_failed(api: TestClient):
+    # 상위 디렉토리 없음
+    res = create_session(api, 'a.txt', 10, data_id=9999999)
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    # 잘못된 이름
+    res = create_session(api, 'a/b.txt', 10)
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    # 잘못된 크기
+    res = create_session(api, 'a.txt', -1)
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    # 용량 초과
+    res = create_session(api, 'a.txt', 2 * (10 ** 9))
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+def test_upload_and_commit(api: TestClient):
+    content = b'0123456789' * 10
+    res = create_session(api, 'resumed.txt', len(content))
+    assert res.status_code == status.HTTP_201_CREATED
+    session_id = res.json()['session_id']
+
+    # 순서 상관없이 업로드
+    res = put_chunk(api, session_id, 50, content[50:])
+    assert res.status_code == status.HTTP_200_OK
+    assert res.json()['received'] == [[50, 100]]
+
+    # 아직 다 받지 못함
+    res = api.post(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}/commit',
+        headers={'token': client_info['token']},
+    )
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    # 끊긴 뒤 다시 이어서 업로드
+    put_chunk(api, session_id, 0, content[:20])
+    res = api.get(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}',
+        headers={'token': client_info['token']},
+    )
+    assert res.json()['received'] == [[0, 20], [50, 100]]
+    res = put_chunk(api, session_id, 20, content[20:50])
+    assert res.json()['received'] == [[0, 100]]
+
+    res = api.post(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}/commit',
+        headers={'token': client_info['token']},
+    )
+    assert res.status_code == status.HTTP_201_CREATED
+    data = res.json()
+    assert data['name'] == 'resumed.txt'
+    assert data['root'] == '/mydir/'
+    assert data['size'] == len(content)
+    # 순서대로 받은 앞부분은 받으면서, 나머지는 commit할 때 계산
+    assert data['sha256'] == hashlib.sha256(content).hexdigest()
+    assert DataDBQuery().read(user_id=client_info['id'], data_id=data['id'])
+
+    root = f'{SERVER["storage"]}/storage/{client_info["id"]}/root/mydir/resumed.txt'
+    with open(root, 'rb') as f:
+        assert f.read() == content
+
+    # commit 후 세션은 삭제된다.
+    res = api.get(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}',
+        headers={'token': client_info['token']},
+    )
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_out_of_range(api: TestClient):
+    session_id = create_session(api, 'range.txt', 10).json()['session_id']
+    res = put_chunk(api, session_id, 11, b'a')
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+    res = put_chunk(api, session_id, 5, b'a' * 6)
+    assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_abort(api: TestClient):
+    session_id = create_session(api, 'abort.txt', 10).json()['session_id']
+    res = api.delete(
+        f'/api/users/{client_info["id"]}/uploads/{session_id}',
+        headers={'token': client_info['token']},
+    )
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    assert not os.path.exists(
+        UploadSessionQuery().data_root(client_info['id'], session_id))
+    res = put_chunk(api, session_id, 0, b'a')
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+
+
+def expire_session(session_id: str) -> str:
+    # 만료 시각을 과거로 변경
+    root = os.path.dirname(
+        UploadSessionQuery().data_root(client_info['id'], session_id))
+    with open(f'{root}/info.json', 'r') as f:
+        info = json.load(f)
+    info['expires'] = time.time() - 1
+    with open(f'{root}/info.json', 'w') as f:
+        json.dump(info, f)
+    return root
+
+
+def test_expired(api: TestClient):
+    session_id = create_session(api, 'expired.txt', 10).json()['session_id']
+    root = expire_session(session_id)
+
+    res = put_chunk(api, session_id, 0, b'a' * 10)
+    assert res.status_code == status.HTTP_404_NOT_FOUND
+    assert not os.path.exists(root)
+
+
+def test_session_holds_quota(api: TestClient):
+    size = 10 ** 9 // 2 + 1
+    url = f'/api/users/{client_info["id"]}/uploads'
+    headers = {'token': client_info['token']}
+    # 열려 있는 세션의 크기만큼 용량이 예약된다
+    res = create_session(api, 'big1.bin', size)
+    assert res.status_code == status.HTTP_201_CREATED
+    first = res.json()['session_id']
+    res = create_session(api, 'big2.bin', size)
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    # 세션을 취소하면 해제된다
+    api.delete(f'{url}/{first}', headers=headers)
+    res = create_session(api, 'big2.bin', size)
+    assert res.status_code == status.HTTP_201_CREATED
+    second = res.json()['session_id']
+
+    # 서버 재시작으로 예약이 없어진 세션은 chunk를 받기 전에 다시 예약한다
+    UploadSessionQuery().release_all()
+    res = create_session(api, 'big3.bin', size)
+    assert res.status_code == status.HTTP_201_CREATED
+    third = res.json()['session_id']
+    res = put_chunk(api, second, 0, b'a')
+    assert res.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    res = put_chunk(api, third, 0, b'a')
+    assert res.status_code == status.HTTP_200_OK
+    for session_id in (second, third):
+        api.delete(f'{url}/{session_id}', headers=headers)
+
+
+def test_sweep_all(api: TestClient):
+    expired = create_session(api, 'sweep1.txt', 10).json()['session_id']
+    alive = create_session(api, 'sweep2.txt', 10).json()['session_id']
+    root = expire_session(expired)
+    # 새 세션을 만들지 않아도 만료된 세션은 지워진다
+    assert UploadSessionQuery().sweep_all() == 1
+    assert not os.path.exists(root)
+    assert UploadSessionQuery().read(client_info['id'], alive) is not None
+    assert UploadSessionQuery().sweep_all() == 0
+    api.delete(
+        f'/api/users/{client_info["id"]}/uploads/{alive}',
+        headers={'token': client_info['token']})
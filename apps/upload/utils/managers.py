@@ -0,0 +1,151 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from apps.storage.models import DataInfo
+from apps.storage.schemas import DataInfoCreate
+from apps.storage.utils.managers import DataFileCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.upload.utils.queries import UploadSessionQuery
+from apps.user.models import User
+from apps.user.utils.queries.user_db_query import UserDBQuery
+from architecture.manager.base_manager import FrontendManager
+from core.exc import (
+    DataNotFound,
+    UploadSessionIncomplete,
+    UploadSessionNotFound,
+    UserNotFound,
+)
+from core.token_generators import LoginTokenGenerator, decode_token
+from core.permissions import (
+    PermissionAdminChecker as AdminOnly,
+    PermissionIssueLoginChecker as LoginedOnly,
+)
+from architecture.query.permission import (
+    PermissionSameUserChecker as OnlyMine,
+)
+
+
+class UploadSessionManager(FrontendManager):
+    """
+    재개 가능한 업로드 세션
+
+    1. 세션 생성 (파일 이름, 전체 크기)
+    2. chunk를 offset과 함께 순서 상관없이 업로드
+    3. 전부 받으면 commit -> 일반 파일 업로드와 같은 DataInfo 생성
+    """
+
+    def _check_permission(self, token: str, user_id: int):
+        op_email, issue = decode_token(token, LoginTokenGenerator)
+        operator: Optional[User] = UserDBQuery().read(user_email=op_email)
+        # 해당 User가 없으면 Permission Failed
+        if not operator:
+            raise PermissionError()
+        # Admin이거나, client and 자기 자신이어야 한다.
+        if not bool(
+            LoginedOnly(issue) & (
+                AdminOnly(operator.is_admin) |
+                ((~AdminOnly(operator.is_admin)) & OnlyMine(operator.id, user_id))
+            )
+        ):
+            raise PermissionError()
+
+    @staticmethod
+    def _to_response(info: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'session_id': info['session_id'],
+            'name': info['name'],
+            'size': info['size'],
+            'received': info['received'],
+            'expires': datetime.fromtimestamp(info['expires']),
+        }
+
+    def create_session(
+        self, token: str, user_id: int, data_id: int, name: str, size: int
+    ) -> Dict[str, Any]:
+        """
+        업로드 세션 생성
+
+        :param token: 인증용 토큰
+        :param user_id: 사용자 아이디
+        :param data_id: 파일이 올라갈 상위 디렉토리 아이디
+        :param name: 파일 이름
+        :param size: 파일 전체 크기
+        """
+        self._check_permission(token, user_id)
+        if not UserDBQuery().read(user_id=user_id):
+            raise UserNotFound()
+        if not isinstance(size, int) or size < 0:
+            raise ValueError('invalid size')
+        # 이름 Validation, 실패 시 ValidationError
+        DataInfoCreate(
+            name=name, root='/', user_id=user_id, is_dir=False, size=size)
+        if data_id != 0:
+            directory: DataInfo = DataDBQuery().read(
+                user_id=user_id, data_id=data_id, is_dir=True)
+            if not directory:
+                raise DataNotFound()
+        # 버려진 세션 정리 (용량 예약도 해제된다.)
+        UploadSessionQuery().sweep(user_id)
+        # 세션 크기만큼 용량을 예약하고 세션이 끝날 때까지 유지한다.
+        info = UploadSessionQuery().create(user_id, data_id, name, size)
+        return self._to_response(info)
+
+    def read_session(
+        self, token: str, user_id: int, session_id: str
+    ) -> Dict[str, Any]:
+        self._check_permission(token, user_id)
+        info = UploadSessionQuery().read(user_id, session_id)
+        if not info:
+            raise UploadSessionNotFound()
+        return self._to_response(info)
+
+    async def upload_chunk(
+        self,
+        token: str,
+        user_id: int,
+        session_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+    ) -> Dict[str, Any]:
+        """
+        chunk 업로드
+
+        :param offset: chunk가 기록될 위치
+        :param chunks: chunk 데이터 스트림
+        """
+        await run_in_threadpool(self._check_permission, token, user_id)
+        info = await UploadSessionQuery() \
+            .write_chunk(user_id, session_id, offset, chunks)
+        return self._to_response(info)
+
+    def commit(self, token: str, user_id: int, session_id: str) -> DataInfo:
+        """
+        업로드 완료
+        모든 구간을 받은 경우에만 파일을 생성한다.
+        """
+        self._check_permission(token, user_id)
+        info = UploadSessionQuery().read(user_id, session_id)
+        if not info:
+            raise UploadSessionNotFound()
+        if info['size'] and info['received'] != [[0, info['size']]]:
+            raise UploadSessionIncomplete()
+        # 세션의 용량 예약은 파일을 생성한 다음 세션과 같이 해제한다.
+        reservation = UploadSessionQuery().reserve(user_id, session_id)
+        data_info = DataFileCRUDManager().create_from_file(
+            root_id=info['root_id'],
+            user_id=user_id,
+            filename=info['name'],
+            src_root=UploadSessionQuery().data_root(user_id, session_id),
+            hasher=UploadSessionQuery().checksum(user_id, session_id),
+            reservation=reservation,
+        )
+        UploadSessionQuery().destroy(user_id, session_id)
+        return data_info
+
+    def abort(self, token: str, user_id: int, session_id: str):
+        self._check_permission(token, user_id)
+        if not UploadSessionQuery().read(user_id, session_id):
+            raise UploadSessionNotFound()
+        UploadSessionQuery().destroy(user_id, session_id)
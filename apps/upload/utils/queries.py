@@ -0,0 +1,357 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from apps.storage.utils.checksums import ContentHasher, hash_file
+from apps.storage.utils.streams import buffered
+from architecture.query.crud import (
+    QueryCRUD,
+    QueryCreator,
+    QueryDestroyer,
+    QueryReader,
+    QueryUpdator,
+)
+from apps.user.utils.quota import UsageReservation
+from core.exc import UploadSessionNotFound
+from settings.base import SERVER
+
+"""
+업로드 세션은 DB가 아닌 사용자 스토리지 안에 저장된다.
+
+cloudmodular/storage/{user_id}
+    root
+    uploads
+        {session_id}
+            info.json   세션 정보 (이름, 크기, 받은 구간, 만료 시각)
+            data        받고 있는 파일 데이터 (전체 크기로 미리 할당)
+
+chunk가 앞에서부터 순서대로 들어오면 받으면서 체크섬을 계산한다.
+순서가 어긋난 부분은 commit할 때 파일에서 읽어서 이어서 계산한다.
+
+세션은 생성할 때 전체 크기만큼 용량을 예약하고 commit, 취소, 만료될 때까지 유지한다.
+서버가 재시작되어 예약이 없어진 세션은 다음 chunk나 commit에서 다시 예약한다.
+"""
+
+# 같은 세션에 대한 chunk들이 동시에 들어올 때 info.json 갱신을 보호한다.
+_session_locks: Dict[str, threading.Lock] = dict()
+_session_locks_guard = threading.Lock()
+# 세션별 [체크섬, 계산된 위치], 서버가 재시작되면 없어지고 commit할 때 다시 계산한다.
+_session_hashers: Dict[str, List] = dict()
+# 세션별 용량 예약
+_session_reservations: Dict[str, UsageReservation] = dict()
+
+
+def _session_lock(session_id: str) -> threading.Lock:
+    with _session_locks_guard:
+        if session_id not in _session_locks:
+            _session_locks[session_id] = threading.Lock()
+        return _session_locks[session_id]
+
+
+def _uploads_root(user_id: int) -> str:
+    return f'{SERVER["storage"]}/storage/{user_id}/uploads'
+
+
+def _session_root(user_id: int, session_id: str) -> str:
+    if not session_id.isalnum():
+        # 경로 조작 방지
+        raise UploadSessionNotFound()
+    return f'{_uploads_root(user_id)}/{session_id}'
+
+
+def _write_info(root: str, info: Dict[str, Any]):
+    # 중간에 끊겨도 info.json이 깨지지 않도록 교체 방식으로 저장
+    tmp = f'{root}/info.json.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(info, f)
+    os.replace(tmp, f'{root}/info.json')
+
+
+def _read_info(root: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(f'{root}/info.json', 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _merge_ranges(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """
+    받은 구간 [start, end)를 추가하고 겹치거나 맞닿은 구간을 합친다.
+    """
+    merged = []
+    for s, e in sorted(ranges + [[start, end]]):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+def _reserve(user_id: int, session_id: str, size: int) -> UsageReservation:
+    """
+    세션 크기만큼 용량을 예약한다. 이미 예약되어 있으면 그 예약을 쓴다.
+
+    :exception UsageLimited: 남은 용량 부족
+    """
+    with _session_lock(session_id):
+        reservation = _session_reservations.get(session_id)
+        if reservation is None:
+            reservation = UsageReservation(user_id, size)
+            _session_reservations[session_id] = reservation
+        return reservation
+
+
+def _release(session_id: str):
+    with _session_lock(session_id):
+        reservation = _session_reservations.pop(session_id, None)
+    if reservation:
+        reservation.release()
+
+
+def _expires() -> float:
+    return time.time() + SERVER['upload-session-length'] * 60
+
+
+def _write_chunk(f: BinaryIO, data: bytes, session_id: str, position: int):
+    # chunk를 기록하고 계산된 위치에 바로 이어지면 체크섬도 계산한다.
+    f.write(data)
+    with _session_lock(session_id):
+        state = _session_hashers.get(session_id)
+        if state is None:
+            return
+        if state[1] == position:
+            state[0].update(data)
+            state[1] += len(data)
+        elif position < state[1]:
+            # 이미 계산한 구간을 다시 받음, commit할 때 전부 다시 계산한다.
+            del _session_hashers[session_id]
+
+
+class UploadSessionQueryCreator(QueryCreator):
+    def __call__(
+        self, user_id: int, root_id: int, name: str, size: int
+    ) -> Dict[str, Any]:
+        """
+        업로드 세션 생성
+        데이터 파일은 전체 크기만큼 미리 잡아두고 chunk를 offset 위치에 기록한다.
+
+        :param user_id: 사용자 아이디
+        :param root_id: 파일이 올라갈 디렉토리 아이디
+        :param name: 파일 이름
+        :param size: 파일 전체 크기
+
+        :return: 세션 정보
+        :exception UsageLimited: 남은 용량 부족
+        """
+        session_id = uuid.uuid4().hex
+        root = _session_root(user_id, session_id)
+        _reserve(user_id, session_id, size)
+        try:
+            os.makedirs(root)
+            with open(f'{root}/data', 'wb') as f:
+                f.truncate(size)
+            info = {
+                'session_id': session_id,
+                'root_id': root_id,
+                'name': name,
+                'size': size,
+                'received': [],
+                'expires': _expires(),
+            }
+            _write_info(root, info)
+        except Exception as e:
+            shutil.rmtree(root, ignore_errors=True)
+            _release(session_id)
+            raise e
+        _session_hashers[session_id] = [ContentHasher(), 0]
+        return info
+
+
+class UploadSessionQueryReader(QueryReader):
+    def __call__(self, user_id: int, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        세션 정보 읽기
+        세션이 없거나 만료된 경우 None, 만료된 세션은 삭제한다.
+        """
+        root = _session_root(user_id, session_id)
+        info = _read_info(root)
+        if info and info['expires'] <= time.time():
+            shutil.rmtree(root, ignore_errors=True)
+            _release(session_id)
+            return None
+        return info
+
+
+class UploadSessionQueryUpdator(QueryUpdator):
+    def __call__(
+        self, user_id: int, session_id: str, start: int, end: int
+    ) -> Dict[str, Any]:
+        """
+        받은 구간 [start, end)를 기록하고 만료 시각을 연장한다.
+        """
+        root = _session_root(user_id, session_id)
+        with _session_lock(session_id):
+            info = _read_info(root)
+            if not info:
+                raise UploadSessionNotFound()
+            if end > start:
+                info['received'] = _merge_ranges(info['received'], start, end)
+            info['expires'] = _expires()
+            _write_info(root, info)
+        return info
+
+
+class UploadSessionQueryDestroyer(QueryDestroyer):
+    def __call__(self, user_id: int, session_id: str):
+        root = _session_root(user_id, session_id)
+        shutil.rmtree(root, ignore_errors=True)
+        _session_hashers.pop(session_id, None)
+        _release(session_id)
+        with _session_locks_guard:
+            _session_locks.pop(session_id, None)
+
+
+class UploadSessionQuery(QueryCRUD):
+    creator = UploadSessionQueryCreator
+    reader = UploadSessionQueryReader
+    updator = UploadSessionQueryUpdator
+    destroyer = UploadSessionQueryDestroyer
+
+    def data_root(self, user_id: int, session_id: str) -> str:
+        # 받고 있는 파일 데이터의 실제 루트
+        return f'{_session_root(user_id, session_id)}/data'
+
+    def reserve(self, user_id: int, session_id: str) -> UsageReservation:
+        """
+        세션의 용량 예약, 없으면 (서버 재시작) 다시 예약한다.
+        해제는 세션을 삭제할 때 한다.
+
+        :exception UploadSessionNotFound: 세션이 없거나 만료됨
+        :exception UsageLimited: 남은 용량 부족
+        """
+        info = self.read(user_id, session_id)
+        if not info:
+            raise UploadSessionNotFound()
+        return _reserve(user_id, session_id, info['size'])
+
+    def release_all(self):
+        # 모든 세션의 용량 예약 해제 (스토리지를 지울 때)
+        for session_id in list(_session_reservations.keys()):
+            _release(session_id)
+
+    def checksum(self, user_id: int, session_id: str) -> ContentHasher:
+        """
+        다 받은 파일의 체크섬
+        받으면서 계산하지 못한 뒷부분만 파일에서 읽는다.
+        """
+        with _session_lock(session_id):
+            state = _session_hashers.pop(session_id, None)
+        hasher, position = state if state else (ContentHasher(), 0)
+        return hash_file(
+            self.data_root(user_id, session_id), hasher=hasher, offset=position)
+
+    async def write_chunk(
+        self,
+        user_id: int,
+        session_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+    ) -> Dict[str, Any]:
+        """
+        chunk를 offset 위치부터 기록한다.
+        세션 크기를 넘는 데이터가 들어오면 넘기 전에 중단한다.
+        세션의 용량 예약이 없으면 (서버 재시작) 받기 전에 다시 예약한다.
+
+        :return: 갱신된 세션 정보
+        :exception UsageLimited: 남은 용량 부족
+        """
+        info = await run_in_threadpool(self.read, user_id, session_id)
+        if not info:
+            raise UploadSessionNotFound()
+        await run_in_threadpool(_reserve, user_id, session_id, info['size'])
+        if offset < 0 or offset > info['size']:
+            raise ValueError('invalid offset')
+
+        written = 0
+        f = await run_in_threadpool(open, self.data_root(user_id, session_id), 'r+b')
+        try:
+            await run_in_threadpool(f.seek, offset)
+            async for s in buffered(chunks, SERVER['upload-buffer-size']):
+                if offset + written + len(s) > info['size']:
+                    raise ValueError('chunk is out of session size')
+                await run_in_threadpool(
+                    _write_chunk, f, s, session_id, offset + written)
+                written += len(s)
+        finally:
+            await run_in_threadpool(f.close)
+        return await run_in_threadpool(
+            self.update, user_id, session_id, offset, offset + written)
+
+    def sweep(self, user_id: int) -> int:
+        """
+        만료된 세션 삭제
+
+        :return: 삭제한 세션 수
+        """
+        uploads = _uploads_root(user_id)
+        if not os.path.isdir(uploads):
+            return 0
+        removed = 0
+        for session_id in os.listdir(uploads):
+            # 읽을 때 만료된 세션은 삭제된다.
+            info = self.read(user_id, session_id)
+            root = _session_root(user_id, session_id)
+            if info is None and os.path.isdir(root) and \
+                os.path.getmtime(root) + SERVER['upload-session-length'] * 60 <= time.time():
+                # info.json 조차 없이 오래된 경우 (생성 도중 중단)
+                self.destroy(user_id, session_id)
+            if info is None and not os.path.isdir(root):
+                removed += 1
+        return removed
+
+    def sweep_all(self) -> int:
+        """
+        모든 사용자의 만료된 세션 삭제
+        새 세션을 만들지 않는 사용자의 버려진 세션도 지운다.
+
+        :return: 삭제한 세션 수
+        """
+        storage = f'{SERVER["storage"]}/storage'
+        if not os.path.isdir(storage):
+            return 0
+        return sum(
+            self.sweep(int(name)) for name in os.listdir(storage) if name.isdigit())
+
+
+class UploadSessionSweeper:
+    """
+    서버가 실행되는 동안 만료된 업로드 세션을 주기적으로 삭제한다.
+    시작하자마자 한번 지우고 UPLOAD_SWEEP_INTERVAL마다 다시 지운다.
+    """
+    _lock = threading.Lock()
+    _thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def start(cls):
+        with cls._lock:
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(
+                    target=cls._run, name='upload-session-sweeper', daemon=True)
+                cls._thread.start()
+
+    @staticmethod
+    def _run():
+        while True:
+            try:
+                UploadSessionQuery().sweep_all()
+            except Exception:
+                # 다음 주기에 다시 시도한다.
+                pass
+            time.sleep(SERVER['upload-sweep-interval'] * 60)
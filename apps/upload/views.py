@@ -0,0 +1,239 @@
+import json
+from fastapi import APIRouter, HTTPException, Request, Response, status
+import pydantic
+from starlette.concurrency import run_in_threadpool
+
+from apps.storage.schemas import DataInfoRead
+from apps.upload.utils.managers import UploadSessionManager
+from core.exc import (
+    DataAlreadyExists,
+    DataNotFound,
+    UploadSessionIncomplete,
+    UploadSessionNotFound,
+    UsageLimited,
+    UserNotFound,
+)
+
+upload_session_router = APIRouter(
+    prefix='/api/users/{user_id}/datas/{data_id}/uploads',
+    tags=['upload'],
+    responses={404: {'error': 'Not Found'}}
+)
+
+upload_chunk_router = APIRouter(
+    prefix='/api/users/{user_id}/uploads/{session_id}',
+    tags=['upload'],
+    responses={404: {'error': 'Not Found'}}
+)
+
+
+def _get_token(request: Request) -> str:
+    try:
+        # 토큰 가져오기
+        return request.headers['token']
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='요청 토큰이 없습니다.')
+
+
+class UploadSessionView:
+    """
+    (POST)      /api/users/{user_id}/datas/{data_id}/uploads            업로드 세션 생성
+    (GET)       /api/users/{user_id}/uploads/{session_id}               업로드 세션 상태
+    (PUT)       /api/users/{user_id}/uploads/{session_id}?offset=       chunk 업로드
+    (POST)      /api/users/{user_id}/uploads/{session_id}/commit        업로드 완료
+    (DELETE)    /api/users/{user_id}/uploads/{session_id}               업로드 취소
+    """
+
+    @staticmethod
+    @upload_session_router.post(
+        path='',
+        status_code=status.HTTP_201_CREATED)
+    async def create_session(request: Request, user_id: int, data_id: int):
+        """
+        업로드 세션 생성 API
+
+        :params name(json): 업로드할 파일 이름
+        :params size(json): 업로드할 파일 전체 크기 (byte)
+        """
+        token = _get_token(request)
+        try:
+            req = await request.json()
+            name, size = req['name'], req['size']
+        except (RuntimeError, KeyError, TypeError, json.decoder.JSONDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='요청값이 없습니다.')
+
+        try:
+            session = await run_in_threadpool(
+                UploadSessionManager().create_session,
+                token, user_id, data_id, name, size)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except pydantic.ValidationError as e:
+            msg = str(e.args[0][0].exc)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=msg)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='파일 크기가 유효하지 않습니다.')
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 생성하기 위한 상위 디렉토리가 없습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return session
+
+    @staticmethod
+    @upload_chunk_router.get(
+        path='',
+        status_code=status.HTTP_200_OK)
+    async def read_session(request: Request, user_id: int, session_id: str):
+        token = _get_token(request)
+        try:
+            session = await run_in_threadpool(
+                UploadSessionManager().read_session,
+                token, user_id, session_id)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except UploadSessionNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='업로드 세션이 없거나 만료되었습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return session
+
+    @staticmethod
+    @upload_chunk_router.put(
+        path='',
+        status_code=status.HTTP_200_OK)
+    async def upload_chunk(
+        request: Request, user_id: int, session_id: str, offset: int
+    ):
+        """
+        chunk 업로드 API
+        요청 본문 전체를 offset 위치부터 기록한다.
+
+        :params offset(query): chunk가 기록될 위치
+        """
+        token = _get_token(request)
+        try:
+            session = await UploadSessionManager().upload_chunk(
+                token, user_id, session_id, offset, request.stream())
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except UploadSessionNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='업로드 세션이 없거나 만료되었습니다.')
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='업로드 범위가 파일 크기를 벗어났습니다.')
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return session
+
+    @staticmethod
+    @upload_chunk_router.post(
+        path='/commit',
+        status_code=status.HTTP_201_CREATED,
+        response_model=DataInfoRead)
+    async def commit(request: Request, user_id: int, session_id: str):
+        token = _get_token(request)
+        try:
+            created_data = await run_in_threadpool(
+                UploadSessionManager().commit,
+                token, user_id, session_id)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except UploadSessionNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='업로드 세션이 없거나 만료되었습니다.')
+        except UploadSessionIncomplete:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='아직 받지 못한 구간이 있습니다.')
+        except UsageLimited:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail='제한 용량을 초과했습니다.')
+        except UserNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='대상 유저를 찾을 수 없습니다.')
+        except DataNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='파일을 생성하기 위한 상위 디렉토리가 없습니다.')
+        except DataAlreadyExists:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='같은 이름의 디렉토리가 이미 존재합니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return created_data
+
+    @staticmethod
+    @upload_chunk_router.delete(
+        path='',
+        status_code=status.HTTP_204_NO_CONTENT)
+    async def abort(request: Request, user_id: int, session_id: str):
+        token = _get_token(request)
+        try:
+            await run_in_threadpool(
+                UploadSessionManager().abort,
+                token, user_id, session_id)
+        except PermissionError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='접근 권한이 없습니다.')
+        except UploadSessionNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail='업로드 세션이 없거나 만료되었습니다.')
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='server error')
+        else:
+            return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Boolean
 from sqlalchemy.sql import func
 
 from system.connection.generators import DatabaseGenerator
@@ -12,6 +12,9 @@ class User(Base):
     email = Column(String(128), unique=True, nullable=False)
     name = Column(String(32), unique=True, nullable=False)
     storage_size = Column(Integer, nullable=False)
+    # 사용 중인 용량 (파일 크기의 합, byte), 파일 정보와 같은 트랜잭션에서 갱신한다.
+    # 이전 버전 DB에 추가된 경우 마이그레이션(reconcile_usage) 전까지는 NULL
+    used_bytes = Column(BigInteger, default=0)
     passwd = Column(String(255), nullable=False)
     is_admin = Column(Boolean, nullable=False, default=False)
     created = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,66 @@
+import pytest
+
+from system.bootloader import Bootloader
+from apps.user.utils.managers import UserCRUDManager
+from apps.user.utils.queries.user_db_query import UserDBQuery
+from apps.user.utils.quota import UsageReservation
+from core.exc import UsageLimited, UserNotFound
+
+client_info = None
+
+@pytest.fixture(scope='module')
+def entire():
+    global client_info
+    # Load Application
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    # Add Client
+    client_info = {
+        'email': 'seokbong61@gmail.com',
+        'name': 'jeonghyun2',
+        'passwd': 'passwd0123',
+        'storage_size': 1,
+    }
+    client = UserCRUDManager().create(**client_info)
+    client_info['id'] = client.id
+    yield UserDBQuery().read_usage(client.id)['entire']
+    # Remove All Of Data
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+def test_no_user(entire: int):
+    with pytest.raises(UserNotFound):
+        UsageReservation(99999999, 10)
+
+def test_over_entire(entire: int):
+    # 전체 용량보다 큰 예약은 불가능
+    with pytest.raises(UsageLimited):
+        UsageReservation(client_info['id'], entire + 1)
+
+def test_concurrent_reservations(entire: int):
+    # 동시에 진행중인 예약의 합은 전체 용량을 넘을 수 없다.
+    first = UsageReservation(client_info['id'], entire - 10)
+    with pytest.raises(UsageLimited):
+        UsageReservation(client_info['id'], 11)
+    # 남은 만큼은 가능
+    with UsageReservation(client_info['id'], 10):
+        pass
+    # 해제 후 다시 예약 가능
+    first.release()
+    with UsageReservation(client_info['id'], entire):
+        pass
+
+def test_ensure(entire: int):
+    with UsageReservation(client_info['id'], 100) as reservation:
+        # 두배씩 늘린다.
+        reservation.ensure(150)
+        assert reservation.size == 200
+        # 두배가 안되면 필요한 만큼만 늘린다.
+        other = UsageReservation(client_info['id'], entire - 300)
+        try:
+            reservation.ensure(300)
+            assert reservation.size == 300
+            with pytest.raises(UsageLimited):
+                reservation.ensure(301)
+        finally:
+            other.release()
@@ -0,0 +1,117 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from main import app
+from system.bootloader import Bootloader
+from system.connection.generators import DatabaseGenerator
+from apps.auth.utils.managers import AppAuthManager
+from apps.storage.models import DataInfo
+from apps.storage.schemas import DataInfoCreate
+from apps.storage.utils.managers import DataDirectoryCRUDManager
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.user.models import User
+from apps.user.utils.managers import UserCRUDManager
+from apps.user.utils.queries.user_db_query import UserDBQuery
+
+client_info = None
+
+@pytest.fixture(scope='module')
+def api():
+    global client_info
+    # Load Application
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    # Add Client
+    client_info = {
+        'email': 'seokbong62@gmail.com',
+        'name': 'usage',
+        'passwd': 'passwd0123',
+        'storage_size': 1,
+    }
+    client_info['id'] = UserCRUDManager().create(**client_info).id
+    client_info['token'] = AppAuthManager().login(
+        client_info['email'], client_info['passwd'])
+    yield TestClient(app)
+    # Remove All Of Data
+    Bootloader.remove_storage()
+    Bootloader.remove_database()
+
+def used(api: TestClient) -> int:
+    res = api.get(
+        f'/api/users/{client_info["id"]}/usage',
+        headers={'token': client_info['token']})
+    assert res.status_code == status.HTTP_200_OK
+    return res.json()['used']
+
+def upload(api: TestClient, data_id: int, name: str, content: bytes) -> int:
+    res = api.put(
+        f'/api/users/{client_info["id"]}/datas/{data_id}/content',
+        params={'name': name}, headers={'token': client_info['token']},
+        data=content)
+    assert res.status_code == status.HTTP_201_CREATED
+    return res.json()['id']
+
+def test_upload_and_overwrite(api: TestClient):
+    assert used(api) == 0
+    upload(api, 0, 'a.txt', b'hello')
+    assert used(api) == 5
+    # 덮어쓰면 크기 차이만큼만 바뀐다
+    upload(api, 0, 'a.txt', b'hi')
+    assert used(api) == 2
+
+def test_bulk_create(api: TestClient):
+    user_id = client_info['id']
+    before = used(api)
+    datas = DataDBQuery().bulk_create([
+        DataInfoCreate(name='b.txt', root='/', user_id=user_id, is_dir=False, size=10),
+        DataInfoCreate(name='c.txt', root='/', user_id=user_id, is_dir=False, size=20),
+    ])
+    assert used(api) == before + 30
+    DataDBQuery().bulk_create([], overwrites={
+        datas[0].id: DataInfoCreate(
+            name='b.txt', root='/', user_id=user_id, is_dir=False, size=4),
+    })
+    assert used(api) == before + 24
+    for data in datas:
+        DataDBQuery().destroy(data_id=data.id)
+    assert used(api) == before
+
+def test_destroy_subtree(api: TestClient):
+    token, user_id = client_info['token'], client_info['id']
+    before = used(api)
+    dir_id = DataDirectoryCRUDManager().create(
+        root_id=0, user_id=user_id, dirname='dir').id
+    upload(api, dir_id, 'x.txt', b'x' * 100)
+    upload(api, dir_id, 'y.txt', b'y' * 50)
+    assert used(api) == before + 150
+    # 디렉토리를 지우면 하위 파일 크기만큼 줄어든다
+    res = api.delete(f'/api/users/{user_id}/datas/{dir_id}', headers={'token': token})
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+    assert used(api) == before
+
+def test_reconcile(api: TestClient):
+    user_id = client_info['id']
+    expected = used(api)
+    assert UserDBQuery().reconcile_usage() == dict()
+    # DB를 직접 수정한 경우, 이전 버전 DB처럼 비어있는 경우
+    for wrong in (12345, None):
+        session = DatabaseGenerator.get_session()
+        try:
+            session.query(User).filter(User.id == user_id) \
+                .update({User.used_bytes: wrong}, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+        assert UserDBQuery().reconcile_usage(user_id) == {user_id: wrong}
+        assert used(api) == expected
+    # 파일이 없는 사용자는 0
+    session = DatabaseGenerator.get_session()
+    try:
+        session.query(DataInfo).filter(DataInfo.user_id == user_id) \
+            .update({DataInfo.size: 0}, synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+    assert UserDBQuery().reconcile_usage() == {user_id: expected}
+    assert used(api) == 0
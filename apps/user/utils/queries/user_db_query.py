@@ -1,4 +1,4 @@
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select
 from sqlalchemy.sql import func
 from typing import Dict, List, Optional
 import bcrypt
@@ -6,7 +6,7 @@ import shutil
 
 from apps.user.models import User
 from apps.data_tag.models import DataTag
-from apps.storage.models import DataInfo
+from apps.storage.models import DataClosure, DataInfo
 from apps.tag.models import Tag
 from apps.user.schemas import UserCreate, UserUpdate
 from architecture.query.crud import (
@@ -49,8 +49,8 @@ class UserDBQueryCreator(QueryCreator):
             if user_all_size is None:
                 user_all_size = 0
             user_all_size *= (10 ** 9) # GB -> byte
-            # 실제로 사용되고 있는 용량 (모든 파일의 크기)
-            already_used = session.query(func.sum(DataInfo.size)).scalar()
+            # 실제로 사용되고 있는 용량 (모든 사용자의 사용량)
+            already_used = session.query(func.sum(User.used_bytes)).scalar()
             if already_used is None:
                 already_used = 0
             created_user_size = user_format.storage_size * (10 ** 9) # GB -> byte
@@ -175,6 +175,10 @@ class UserDBQueryDestroyer(QueryDestroyer):
                 )).all()
                 for _, _, tag in data_infos:
                     session.delete(tag)
+                # Data 계층(closure) 제거
+                session.query(DataClosure).filter(DataClosure.descendant_id.in_(
+                    select(DataInfo.id).where(DataInfo.user_id == user.id)
+                )).delete(synchronize_session=False)
                 session.delete(user)
                 session.commit()
             else:
@@ -212,18 +216,55 @@ class UserDBQuery(QueryCRUD):
     def read_usage(self, user_id: int) -> Dict[str, int]:
         # 사용량 구하기
         session = DatabaseGenerator.get_session()
-        # Check User Data
-        user: User = \
-            session.query(User) \
-                .filter(User.id == user_id).scalar()
-        if not user:
-            raise UserNotFound()
-        entire = user.storage_size * (10 ** 9) # GB -> Byte
-        # Check Usage size
-        used = session.query(func.sum(DataInfo.size)) \
-            .filter(DataInfo.user_id == user_id) \
-            .group_by(DataInfo.user_id).scalar()
-        return {
-            'entire': entire,
-            'used': used if used else 0
-        }
\ No newline at end of file
+        try:
+            # Check User Data
+            user: User = \
+                session.query(User) \
+                    .filter(User.id == user_id).scalar()
+            if not user:
+                raise UserNotFound()
+            entire = user.storage_size * (10 ** 9) # GB -> Byte
+            # 사용량은 파일 정보가 바뀔 때마다 갱신되는 used_bytes를 사용한다.
+            return {
+                'entire': entire,
+                'used': user.used_bytes or 0
+            }
+        finally:
+            session.close()
+
+    def reconcile_usage(self, user_id: Optional[int] = None) -> Dict[int, int]:
+        """
+        used_bytes를 실제 파일 크기의 합과 비교하여 다르면 고친다.
+        DB를 직접 수정했거나 이전 버전 DB처럼 used_bytes가 비어있는 경우 사용한다.
+
+        :param user_id: 특정 사용자만 확인 (없으면 전체)
+        :return: 고친 사용자의 {user_id: 고치기 전 used_bytes}
+        """
+        session = DatabaseGenerator.get_session()
+        try:
+            actual = func.coalesce(func.sum(DataInfo.size), 0)
+            q = session.query(User.id, User.used_bytes, actual) \
+                .outerjoin(DataInfo, DataInfo.user_id == User.id) \
+                .group_by(User.id, User.used_bytes)
+            if user_id is not None:
+                q = q.filter(User.id == user_id)
+            wrong = {
+                pk: used for pk, used, size in q if used is None or used != size
+            }
+            if wrong:
+                # 확인하는 동안 바뀌었을 수 있으므로 합계는 UPDATE 안에서 다시 구한다.
+                size = select(func.coalesce(func.sum(DataInfo.size), 0)) \
+                    .where(DataInfo.user_id == User.id) \
+                    .scalar_subquery()
+                ids = list(wrong.keys())
+                for i in range(0, len(ids), 500):
+                    session.query(User) \
+                        .filter(User.id.in_(ids[i:i + 500])) \
+                        .update({User.used_bytes: size}, synchronize_session=False)
+                session.commit()
+            return wrong
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
\ No newline at end of file
@@ -1,7 +1,7 @@
 import os
-import shutil
 
 
+from apps.storage.utils.chunk_store import remove_tree
 from architecture.query.crud import QueryCRUD, QueryCreator, QueryDestroyer
 from core.exc import UserStorageAlreadyExists
 from settings.base import SERVER
@@ -26,7 +26,7 @@ class UserStorageCreator(QueryCreator):
             # 이미 존재하는 경우
             if force:
                 # 강제성이 있는 경우 죄다 삭제
-                shutil.rmtree(main_root)
+                remove_tree(main_root)
             else:
                 # 아니면 Error 호출
                 raise UserStorageAlreadyExists()
@@ -39,7 +39,7 @@ class UserStorageDestroyer(QueryDestroyer):
     def __call__(self, user_id: int):
 
         main_root = f'{SERVER["storage"]}/storage/{user_id}'
-        shutil.rmtree(main_root)
+        remove_tree(main_root)
 
 
 class UserStorageQuery(QueryCRUD):
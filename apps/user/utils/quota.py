@@ -0,0 +1,85 @@
+import threading
+from typing import Dict
+
+from apps.user.utils.queries.user_db_query import UserDBQuery
+from core.exc import UsageLimited
+
+
+class UsageReservation:
+    """
+    업로드 용량 예약
+
+    파일을 쓰기 전에 사용할 용량을 미리 예약하고,
+    쓰는 도중 예약한 용량을 넘으면 예약을 늘리거나 바로 중단한다.
+    같은 사용자의 동시 업로드들이 남은 용량을 같이 넘지 않도록
+    (DB 사용량 + 진행 중인 예약의 합)으로 판단한다.
+
+    예약은 DB에 파일 크기가 반영된 다음 해제해야 한다.
+    해제를 먼저 하면 그 사이 다른 업로드가 용량을 적게 계산할 수 있다.
+    """
+    _lock = threading.Lock()
+    _reserved: Dict[int, int] = dict()   # user_id -> 예약된 용량의 합
+
+    def __init__(self, user_id: int, size: int = 0):
+        """
+        :param user_id: 대상 유저 아이디
+        :param size: 처음 예약할 용량 (byte), 보통 Content-Length
+
+        :exception UserNotFound: 유저가 없음
+        :exception UsageLimited: 남은 용량 부족
+        """
+        self.user_id = user_id
+        self.size = 0
+        self.extend(size)
+
+    def extend(self, size: int):
+        """
+        예약 용량을 size만큼 늘린다.
+
+        :exception UsageLimited: 남은 용량 부족
+        """
+        if size < 0:
+            raise ValueError('size must be positive')
+        with UsageReservation._lock:
+            usage = UserDBQuery().read_usage(self.user_id)
+            reserved = UsageReservation._reserved.get(self.user_id, 0)
+            if usage['used'] + reserved + size > usage['entire']:
+                raise UsageLimited()
+            UsageReservation._reserved[self.user_id] = reserved + size
+            self.size += size
+
+    def ensure(self, total: int):
+        """
+        예약 용량이 total 이상이 되도록 늘린다.
+        DB 조회를 줄이기 위해 예약 용량을 두배씩 늘리고,
+        실패하면 필요한 만큼만 다시 시도한다.
+
+        :exception UsageLimited: 남은 용량 부족
+        """
+        if total <= self.size:
+            return
+        need = total - self.size
+        try:
+            self.extend(max(need, self.size))
+        except UsageLimited as e:
+            if need >= self.size:
+                raise e
+            self.extend(need)
+
+    def release(self):
+        """
+        예약 해제
+        """
+        with UsageReservation._lock:
+            left = UsageReservation._reserved.get(self.user_id, 0) - self.size
+            if left > 0:
+                UsageReservation._reserved[self.user_id] = left
+            else:
+                UsageReservation._reserved.pop(self.user_id, None)
+            self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
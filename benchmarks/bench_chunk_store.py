@@ -0,0 +1,127 @@
+"""
+저장 방식(STORAGE_BACKEND)별 중복 제거율과 업로드/다운로드 처리량 측정
+
+같은 파일 몇 개를 여러번 올리고, 일부는 중간에 데이터를 끼워 넣은 버전을 올려서
+files와 chunks 방식에서 각각
+    - 논리 크기(사용자 용량) 대비 실제 디스크 사용량 (중복 제거율)
+    - PUT /content 업로드 처리량
+    - 다운로드 처리량
+을 출력한다.
+
+사용법
+    python benchmarks/bench_chunk_store.py --bases 4 --size-mb 8 --copies 4 --edits 4
+    python benchmarks/bench_chunk_store.py --chunk-kb 256     # 평균 청크 크기 변경
+"""
+import argparse
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ServerThread, boot_app, create_user, setup_env
+
+
+def make_files(bases, size, copies, edits, seed=0):
+    # (이름, 내용) 리스트, 원본 bases개를 copies번씩 + 중간을 고친 버전 edits개
+    rand = random.Random(seed)
+    originals = [rand.randbytes(size) for _ in range(bases)]
+    files = []
+    for _ in range(copies):
+        files += originals
+    for i in range(edits):
+        content = originals[i % bases]
+        pos = rand.randrange(len(content))
+        files.append(content[:pos] + rand.randbytes(64) + content[pos:])
+    rand.shuffle(files)
+    return [(f'{uuid.uuid4().hex}.bin', content) for content in files]
+
+
+def disk_usage(root):
+    total = 0
+    for dir_root, _, filenames in os.walk(root):
+        for name in filenames:
+            total += os.path.getsize(os.path.join(dir_root, name))
+    return total
+
+
+def run(base, user_id, token, files, clients):
+    import requests
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def put(item):
+        name, content = item
+        res = session().put(
+            f'{base}/api/users/{user_id}/datas/0/content',
+            params={'name': name}, headers={'token': token}, data=content)
+        assert res.status_code == 201, res.text
+        return res.json()['id']
+
+    def get(data_id):
+        res = session().get(
+            f'{base}/api/users/{user_id}/datas/{data_id}',
+            params={'method': 'download'}, headers={'token': token})
+        assert res.status_code == 200, res.text
+        return len(res.content)
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        started = time.perf_counter()
+        ids = list(pool.map(put, files))
+        ingest = time.perf_counter() - started
+        started = time.perf_counter()
+        read_bytes = sum(pool.map(get, ids))
+        read = time.perf_counter() - started
+    return ingest, read, read_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bases', type=int, default=4, help='서로 다른 원본 파일 수')
+    parser.add_argument('--size-mb', type=int, default=8, help='원본 파일 하나의 크기 (MB)')
+    parser.add_argument('--copies', type=int, default=4, help='원본마다 그대로 올리는 횟수')
+    parser.add_argument('--edits', type=int, default=4, help='중간에 데이터를 끼워 넣어 올리는 파일 수')
+    parser.add_argument('--chunk-kb', type=int, default=1024, help='평균 청크 크기 (KB)')
+    parser.add_argument('--clients', type=int, default=4, help='동시 요청 수')
+    parser.add_argument('--base-dir', default=None, help='스토리지를 만들 디렉토리 (측정할 디스크)')
+    parser.add_argument('--port', type=int, default=18003)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    setup_env(
+        base_dir=args.base_dir, SERVER_PORT=args.port, CHUNK_AVG_SIZE=args.chunk_kb)
+    app = boot_app()
+    from apps.storage.utils.chunk_store import ChunkStore
+    from settings.base import SERVER
+
+    files = make_files(args.bases, size, args.copies, args.edits)
+    logical = sum(len(content) for _, content in files)
+    print(f'{len(files)} files, logical {logical / 10 ** 6:.1f}MB '
+          f'({args.bases} originals x {args.copies} + {args.edits} edited), '
+          f'chunk avg {args.chunk_kb}KB, {args.clients} clients')
+
+    with ServerThread(app, args.port) as base:
+        for backend in ('files', 'chunks'):
+            SERVER['storage-backend'] = backend
+            user_id, token = create_user(
+                name=f'bench{backend}',
+                storage_size=math.ceil(logical / (10 ** 9)) + 1)
+            ingest, read, read_bytes = run(base, user_id, token, files, args.clients)
+            assert read_bytes == logical
+            physical = disk_usage(f'{SERVER["storage"]}/storage/{user_id}')
+            if backend == 'chunks':
+                physical += ChunkStore.read_stats()['stored']
+            print(f'[{backend}] physical {physical / 10 ** 6:.1f}MB '
+                  f'dedup ratio {logical / physical:.2f}x, '
+                  f'ingest {logical / ingest / 10 ** 6:.1f}MB/s, '
+                  f'read {logical / read / 10 ** 6:.1f}MB/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+경로 검색(root_prefix, parent_id 인덱스, closure table) 성능 측정
+
+사용자마다 디렉토리 dirs개 x 파일 files개의 데이터를 DB에 직접 넣고
+(기본 1000 x 1000 = 사용자당 100만개, 스토리지 파일은 만들지 않는다.)
+    - backfill_paths, backfill_closure: 기존 DB처럼 경로 컬럼과 closure table이 비어있는 상태에서 채우는 시간
+    - 디렉토리 목록, (root, name) 검색, 하위 데이터 전체 조회/개수
+를 이전 조건(root 직접 비교, LIKE)과 인덱스를 쓰는 조건으로 각각 측정한다.
+SQLite는 쿼리 계획(EXPLAIN QUERY PLAN)도 같이 출력한다.
+
+사용법
+    python benchmarks/bench_data_paths.py
+    python benchmarks/bench_data_paths.py --users 2 --dirs 100 --files 1000 --repeat 20
+"""
+import argparse
+import time
+
+from common import boot_app, format_stats, percentiles, setup_env
+
+
+def populate(engine, user_id, dirs, files, batch=50000):
+    # /d{i}/ 디렉토리 dirs개, 디렉토리마다 파일 files개
+    # 이전 버전 DB와 같이 root_prefix, parent_id는 비워둔다.
+    from apps.storage.models import DataInfo
+    rows = [
+        {'user_id': user_id, 'root': '/', 'name': f'd{i}', 'is_dir': True, 'size': files}
+        for i in range(dirs)
+    ]
+    with engine.begin() as conn:
+        conn.execute(DataInfo.__table__.insert(), rows)
+        buf = []
+        for i in range(dirs):
+            for j in range(files):
+                buf.append({
+                    'user_id': user_id, 'root': f'/d{i}/', 'name': f'f{j}.txt',
+                    'is_dir': False, 'size': 1,
+                })
+                if len(buf) == batch:
+                    conn.execute(DataInfo.__table__.insert(), buf)
+                    buf = []
+        if buf:
+            conn.execute(DataInfo.__table__.insert(), buf)
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1, help='사용자 수')
+    parser.add_argument('--dirs', type=int, default=1000, help='사용자마다 디렉토리 수')
+    parser.add_argument('--files', type=int, default=1000, help='디렉토리마다 파일 수')
+    parser.add_argument('--repeat', type=int, default=10, help='측정 반복 횟수')
+    parser.add_argument('--base-dir', default=None, help='DB를 만들 디렉토리')
+    args = parser.parse_args()
+
+    setup_env(base_dir=args.base_dir)
+    boot_app()
+    from sqlalchemy import and_, func, text
+    from apps.storage.models import DataClosure, DataInfo
+    from apps.storage.utils.queries.data_db_query import (
+        DataDBQuery,
+        root_is,
+        root_under,
+    )
+    from system.connection.generators import DatabaseGenerator
+    engine = DatabaseGenerator.get_engine()
+
+    started = time.perf_counter()
+    for user_id in range(1, args.users + 1):
+        populate(engine, user_id, args.dirs, args.files)
+    rows = args.users * args.dirs * (args.files + 1)
+    print(f'{args.users} users x {args.dirs} dirs x {args.files} files '
+          f'= {rows} rows, insert {time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    filled = DataDBQuery().backfill_paths()
+    print(f'backfill_paths {filled} values in {time.perf_counter() - started:.1f}s')
+    started = time.perf_counter()
+    filled = DataDBQuery().backfill_closure()
+    print(f'backfill_closure {filled} rows in {time.perf_counter() - started:.1f}s')
+
+    user_id = args.users
+    root = f'/d{args.dirs // 2}/'
+    name = f'f{args.files // 2}.txt'
+    session = DatabaseGenerator.get_session()
+    q = session.query(DataInfo)
+    dir_id = q.filter(and_(
+        DataInfo.user_id == user_id, root_is('/'), DataInfo.name == root[1:-1])).one().id
+    file_id = q.filter(and_(
+        DataInfo.user_id == user_id, root_is(root), DataInfo.name == name)).one().id
+    cases = {
+        'list': (
+            q.filter(and_(DataInfo.user_id == user_id, DataInfo.root == root)),
+            q.filter(and_(DataInfo.user_id == user_id, root_is(root))),
+        ),
+        'lookup': (
+            q.filter(and_(
+                DataInfo.user_id == user_id, DataInfo.root == root,
+                DataInfo.name == name)),
+            q.filter(and_(
+                DataInfo.user_id == user_id, root_is(root), DataInfo.name == name)),
+        ),
+        'subtree': (
+            q.filter(and_(DataInfo.user_id == user_id, DataInfo.root.startswith(root))),
+            q.filter(and_(DataInfo.user_id == user_id, root_under(root))),
+        ),
+        'subtree count': (
+            session.query(func.count(DataInfo.id)).filter(and_(
+                DataInfo.user_id == user_id, DataInfo.root.startswith(root))),
+            session.query(func.count(DataInfo.id)).filter(and_(
+                DataInfo.user_id == user_id, root_under(root))),
+        ),
+        'subtree (closure)': (
+            None,
+            q.join(DataClosure, and_(
+                DataClosure.descendant_id == DataInfo.id,
+                DataClosure.ancestor_id == dir_id,
+                DataClosure.depth > 0,
+            )),
+        ),
+        'children (parent_id)': (
+            None,
+            q.filter(DataInfo.parent_id == dir_id),
+        ),
+        'ancestors (closure)': (
+            None,
+            q.join(DataClosure, DataClosure.ancestor_id == DataInfo.id)
+                .filter(DataClosure.descendant_id == file_id)
+                .order_by(DataClosure.depth.desc()),
+        ),
+    }
+    try:
+        for case, queries in cases.items():
+            for label, query in zip(('legacy', 'indexed'), queries):
+                if query is None:
+                    continue
+                result = query.all()
+                stats = measure(query.all, args.repeat)
+                print(format_stats(f'{case} [{label}]', stats) + f' rows={len(result)}')
+                if engine.dialect.name == 'sqlite':
+                    statement = query.statement.compile(
+                        engine, compile_kwargs={'literal_binds': True})
+                    for plan in session.execute(text(f'EXPLAIN QUERY PLAN {statement}')):
+                        print(f'    {plan[-1]}')
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+fsync 정책(STORAGE_DURABILITY)별 업로드 처리량과 지연시간 측정
+
+같은 디스크, 같은 서버에서 정책만 바꿔가며
+여러 클라이언트가 동시에 PUT /content로 파일을 올리고
+요청별 지연시간(p50/p95/p99/max)과 전체 처리량을 출력한다.
+
+사용법
+    python benchmarks/bench_durability.py --files 400 --size-kb 256 --clients 16
+    python benchmarks/bench_durability.py --base-dir /mnt/data   # 측정할 디스크 지정
+"""
+import argparse
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (
+    ServerThread,
+    boot_app,
+    create_user,
+    format_stats,
+    percentiles,
+    setup_env,
+)
+
+
+def run_uploads(base, user_id, token, files, size, clients):
+    import requests
+    local = threading.local()
+    content = os.urandom(size)
+
+    def put(_):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        res = local.session.put(
+            f'{base}/api/users/{user_id}/datas/0/content',
+            params={'name': f'{uuid.uuid4().hex}.bin'},
+            headers={'token': token},
+            data=content,
+        )
+        return res.status_code, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(put, range(files)))
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=400, help='정책별 업로드 개수')
+    parser.add_argument('--size-kb', type=int, default=256, help='파일 하나의 크기 (KB)')
+    parser.add_argument('--clients', type=int, default=16, help='동시 업로드 개수')
+    parser.add_argument('--interval', type=int, default=10, help='group-commit 주기 (ms)')
+    parser.add_argument('--base-dir', default=None, help='스토리지를 만들 디렉토리 (측정할 디스크)')
+    parser.add_argument('--port', type=int, default=18002)
+    args = parser.parse_args()
+
+    size = args.size_kb * 1024
+    setup_env(
+        base_dir=args.base_dir,
+        SERVER_PORT=args.port,
+        STORAGE_GROUP_COMMIT_INTERVAL=args.interval)
+    app = boot_app()
+    from settings.base import DURABILITY_MODES, SERVER
+    user_id, token = create_user(
+        storage_size=math.ceil(size * args.files * len(DURABILITY_MODES) / (10 ** 9)) + 1)
+
+    print(f'{args.files} files x {args.size_kb}KB, {args.clients} clients, '
+          f'storage={SERVER["storage"]}')
+    with ServerThread(app, args.port) as base:
+        # 워밍업
+        run_uploads(base, user_id, token, args.clients, size, args.clients)
+        for mode in DURABILITY_MODES:
+            SERVER['storage-durability'] = mode
+            results, elapsed = run_uploads(
+                base, user_id, token, args.files, size, args.clients)
+            codes = sorted(set(code for code, _ in results))
+            print(f'[{mode}] status={codes} '
+                  f'throughput={size * args.files / elapsed / (10 ** 6):.1f}MB/s '
+                  f'({args.files / elapsed:.1f} files/s)')
+            print(format_stats('  latency', percentiles([ms for _, ms in results])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+대용량 업로드 중 다른 요청의 응답 지연 측정
+
+대용량 파일 업로드 여러개를 동시에 진행하면서
+가벼운 요청(/api/users/{id}/usage)을 반복해서 보내고 그 지연시간을 측정한다.
+업로드가 이벤트 루프를 막으면 업로드 중 지연시간이 크게 늘어난다.
+
+사용법
+    python benchmarks/bench_upload_latency.py --size-mb 2048 --uploads 2
+"""
+import argparse
+import math
+import threading
+import time
+import uuid
+
+from common import (
+    ServerThread,
+    boot_app,
+    create_user,
+    format_stats,
+    multipart_body,
+    percentiles,
+    setup_env,
+)
+
+
+def upload(base: str, user_id: int, token: str, size: int, results: list):
+    import requests
+    boundary = uuid.uuid4().hex
+    started = time.perf_counter()
+    res = requests.post(
+        f'{base}/api/users/{user_id}/datas/0',
+        headers={
+            'token': token,
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+        },
+        data=multipart_body(boundary, f'{uuid.uuid4().hex}.bin', size, 1 << 20),
+    )
+    results.append((res.status_code, time.perf_counter() - started))
+
+
+def probe(base: str, user_id: int, token: str, stop: threading.Event, interval: float):
+    import requests
+    samples = []
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        session.get(
+            f'{base}/api/users/{user_id}/usage', headers={'token': token})
+        samples.append((time.perf_counter() - started) * 1000)
+        time.sleep(interval)
+    return samples
+
+
+def run_probe(base, user_id, token, interval, duration=None, until=None):
+    stop = threading.Event()
+    out = []
+    t = threading.Thread(
+        target=lambda: out.extend(probe(base, user_id, token, stop, interval)))
+    t.start()
+    if duration is not None:
+        time.sleep(duration)
+    else:
+        for th in until:
+            th.join()
+    stop.set()
+    t.join()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=2048, help='업로드 하나의 크기 (MB)')
+    parser.add_argument('--uploads', type=int, default=2, help='동시 업로드 개수')
+    parser.add_argument('--interval', type=float, default=0.02, help='probe 요청 간격 (초)')
+    parser.add_argument('--idle-seconds', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=18000)
+    args = parser.parse_args()
+
+    size = args.size_mb * (10 ** 6)
+    setup_env(SERVER_PORT=args.port)
+    app = boot_app()
+    user_id, token = create_user(
+        storage_size=math.ceil(size * args.uploads / (10 ** 9)) + 1)
+
+    with ServerThread(app, args.port) as base:
+        idle = run_probe(base, user_id, token, args.interval, duration=args.idle_seconds)
+
+        results = []
+        uploads = [
+            threading.Thread(target=upload, args=(base, user_id, token, size, results))
+            for _ in range(args.uploads)
+        ]
+        started = time.perf_counter()
+        for th in uploads:
+            th.start()
+        busy = run_probe(base, user_id, token, args.interval, until=uploads)
+        elapsed = time.perf_counter() - started
+
+    print(f'uploads: {args.uploads} x {args.size_mb}MB, '
+          f'status={sorted(set(code for code, _ in results))}, '
+          f'throughput={size * args.uploads / elapsed / (10 ** 6):.1f}MB/s')
+    print(format_stats('probe latency (idle)', percentiles(idle)))
+    print(format_stats('probe latency (uploading)', percentiles(busy)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+업로드 하나당 서버의 최대 메모리 사용량(RSS)과 디스크 쓰기량 측정
+
+업로드 요청은 별도 프로세스에서 보내기 때문에
+측정값에는 서버 프로세스의 사용량만 포함된다.
+    - peak RSS: 업로드 전후 ru_maxrss 차이
+    - bytes written: /proc/self/io의 wchar 차이 (write 시스템 콜로 넘긴 바이트)
+      임시파일에 한번 저장한 뒤 다시 복사하면 업로드 크기의 2배가 된다.
+
+사용법
+    python benchmarks/bench_upload_memory.py --size-mb 1024
+"""
+import argparse
+import math
+import multiprocessing
+import resource
+import time
+import uuid
+
+from common import (
+    ServerThread,
+    boot_app,
+    create_user,
+    multipart_body,
+    setup_env,
+)
+
+
+class SizedBody:
+    """
+    Content-Length가 붙도록 길이를 알려주는 multipart 본문
+    """
+
+    def __init__(self, boundary: str, filename: str, size: int, chunk_size: int):
+        self.args = (boundary, filename, size, chunk_size)
+        self.length = sum(
+            len(chunk) for chunk in
+            multipart_body(boundary, filename, 0, chunk_size)) + size
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return multipart_body(*self.args)
+
+
+def upload(base: str, user_id: int, token: str, size: int, queue):
+    import requests
+    boundary = uuid.uuid4().hex
+    started = time.perf_counter()
+    res = requests.post(
+        f'{base}/api/users/{user_id}/datas/0',
+        headers={
+            'token': token,
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+        },
+        data=SizedBody(boundary, f'{uuid.uuid4().hex}.bin', size, 1 << 20),
+    )
+    queue.put((res.status_code, time.perf_counter() - started))
+
+
+def read_wchar() -> int:
+    with open('/proc/self/io', 'r') as f:
+        for line in f:
+            key, value = line.split(':')
+            if key == 'wchar':
+                return int(value)
+    return 0
+
+
+def max_rss_mb() -> float:
+    # Linux에서 ru_maxrss는 KB 단위
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=1024, help='업로드 크기 (MB)')
+    parser.add_argument('--repeat', type=int, default=3, help='반복 횟수')
+    parser.add_argument('--port', type=int, default=18001)
+    args = parser.parse_args()
+
+    size = args.size_mb * (10 ** 6)
+    setup_env(SERVER_PORT=args.port)
+    app = boot_app()
+    user_id, token = create_user(
+        storage_size=math.ceil(size * args.repeat / (10 ** 9)) + 1)
+
+    ctx = multiprocessing.get_context('spawn')
+    with ServerThread(app, args.port) as base:
+        for i in range(args.repeat):
+            queue = ctx.Queue()
+            rss, wchar = max_rss_mb(), read_wchar()
+            client = ctx.Process(
+                target=upload, args=(base, user_id, token, size, queue))
+            client.start()
+            status_code, elapsed = queue.get()
+            client.join()
+            written = read_wchar() - wchar
+            print(
+                f'#{i + 1} status={status_code} '
+                f'time={elapsed:.2f}s '
+                f'throughput={size / elapsed / (10 ** 6):.1f}MB/s '
+                f'peak-rss={max_rss_mb():.1f}MB (+{max_rss_mb() - rss:.1f}MB) '
+                f'written={written / (10 ** 6):.1f}MB '
+                f'({written / size:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+벤치마크 공용 유틸
+
+임시 디렉토리에 스토리지와 SQLite DB를 만들고
+실제 uvicorn 서버를 띄운 다음 테스트용 사용자를 생성한다.
+settings가 환경변수를 읽기 때문에 setup_env()는
+프로젝트 모듈을 import 하기 전에 호출해야 한다.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_env(base_dir: Optional[str] = None, **overrides) -> str:
+    """
+    벤치마크용 환경변수 설정 및 작업 디렉토리 생성
+
+    :param base_dir: 작업 디렉토리를 만들 위치 (디스크 지정용), 없으면 시스템 임시 디렉토리
+    :param overrides: 덮어쓸 환경변수
+    :return: 작업 디렉토리
+    """
+    workdir = tempfile.mkdtemp(prefix='cloudmodular-bench-', dir=base_dir)
+    os.mkdir(f'{workdir}/storage')
+    env = {
+        'SERVER_HOST': '127.0.0.1',
+        'SERVER_PORT': '18000',
+        'SERVER_STORAGE': f'{workdir}/storage',
+        'DB_TYPE': 'sqlite',
+        'ADMIN_EMAIL': 'bench@example.com',
+        'ADMIN_PASSWD': 'bench-passwd',
+        'JWT_KEY': 'bench',
+        'JWT_ALGORITHM': 'HS256',
+        'DATA_SHARED_LENGTH': '7',
+        'MAX_UPLOAD_LEN': str(10 ** 6),     # MB, 사실상 무제한
+    }
+    env.update({k: str(v) for k, v in overrides.items()})
+    os.environ.update(env)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    # SQLite DB(data.db)는 현재 디렉토리에 생성된다.
+    os.chdir(workdir)
+    return workdir
+
+
+def boot_app():
+    """
+    DB/스토리지 초기화 후 app을 반환한다.
+    """
+    from main import app
+    from system.bootloader import Bootloader
+    Bootloader.migrate_database()
+    Bootloader.init_storage()
+    return app
+
+
+def create_user(name: str = 'benchuser', storage_size: int = 1) -> Tuple[int, str]:
+    """
+    벤치마크용 사용자 생성
+
+    :param storage_size: 사용자 용량 (GB)
+    :return: (user_id, login token)
+    """
+    from apps.auth.utils.managers import AppAuthManager
+    from apps.user.utils.managers import UserCRUDManager
+    info = {
+        'email': f'{name}@example.com',
+        'name': name,
+        'passwd': 'password0123',
+        'storage_size': storage_size,
+    }
+    user = UserCRUDManager().create(**info)
+    token = AppAuthManager().login(info['email'], info['passwd'])
+    return user.id, token
+
+
+def multipart_body(boundary: str, filename: str, size: int, chunk_size: int):
+    """
+    메모리에 전부 올리지 않고 multipart 본문을 생성한다.
+    """
+    yield (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode()
+    block = os.urandom(chunk_size)
+    sent = 0
+    while sent < size:
+        n = min(chunk_size, size - sent)
+        yield block[:n]
+        sent += n
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+class ServerThread(threading.Thread):
+    """
+    uvicorn 서버를 별도 스레드에서 실행한다.
+    """
+
+    def __init__(self, app, port: int):
+        import uvicorn
+        super().__init__(daemon=True)
+        config = uvicorn.Config(
+            app, host='127.0.0.1', port=port, log_level='warning')
+        self.server = uvicorn.Server(config)
+        self.port = port
+
+    def run(self):
+        self.server.run()
+
+    def __enter__(self):
+        self.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return f'http://127.0.0.1:{self.port}'
+
+    def __exit__(self, *args):
+        self.server.should_exit = True
+        self.join()
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """
+    p50, p95, p99, max 계산 (단위는 samples와 동일)
+    """
+    if not samples:
+        return {'count': 0}
+    s = sorted(samples)
+
+    def pick(p: float) -> float:
+        return s[min(len(s) - 1, int(round(p * (len(s) - 1))))]
+
+    return {
+        'count': len(s),
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': s[-1],
+    }
+
+
+def format_stats(name: str, stats: Dict[str, float], unit: str = 'ms') -> str:
+    if not stats.get('count'):
+        return f'{name:<28} (no samples)'
+    return (
+        f'{name:<28} n={stats["count"]:<6} '
+        f'p50={stats["p50"]:.2f}{unit} p95={stats["p95"]:.2f}{unit} '
+        f'p99={stats["p99"]:.2f}{unit} max={stats["max"]:.2f}{unit}'
+    )
@@ -1,3 +1,6 @@
+from typing import Dict
+
+
 class UserStorageAlreadyExists(Exception):
     def __init__(self):
         super().__init__("User Storage Already Exists")
@@ -30,6 +33,10 @@ class DataNotFound(Exception):
     def __init__(self):
         super().__init__("Data Not Found")
 
+class DataContentNotFound(Exception):
+    def __init__(self):
+        super().__init__("Data with the same content not found")
+
 class DataFavoriteNotSelected(Exception):
     def __init__(self):
         super().__init__("This data is not selected by favorite")
@@ -44,4 +51,30 @@ class DataIsAlreadyShared(Exception):
 
 class DataIsNotShared(Exception):
     def __init__(self):
-        super().__init__("This data is not shared")
\ No newline at end of file
+        super().__init__("This data is not shared")
+
+class UploadSessionNotFound(Exception):
+    def __init__(self):
+        super().__init__("Upload session not found or expired")
+
+class UploadSessionIncomplete(Exception):
+    def __init__(self):
+        super().__init__("Upload session is not completed")
+
+class DataNotModified(Exception):
+    def __init__(self, headers: Dict[str, str]):
+        super().__init__("Data is not modified")
+        # 304 응답에 붙일 헤더 (ETag, Last-Modified)
+        self.headers = headers
+
+class DataTargetInSubtree(Exception):
+    def __init__(self):
+        super().__init__("Target directory is inside the data")
+
+class CopyJobNotFound(Exception):
+    def __init__(self):
+        super().__init__("Copy job not found or expired")
+
+class DataVersionMismatch(Exception):
+    def __init__(self):
+        super().__init__("Data is changed from the base version")
@@ -0,0 +1,305 @@
+import hashlib
+import os
+import stat
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, BinaryIO, Callable, Dict, List, Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+"""
+파일 다운로드 응답
+
+Range 요청(RFC 7233)을 처리해서 파일의 일부분만 보낸다.
+    Range: bytes=0-99           -> 206, 한 구간
+    Range: bytes=0-99,200-      -> 206, multipart/byteranges
+    Range: bytes=1000- (범위 밖) -> 416
+If-Range가 현재 파일과 맞지 않거나 Range 형식이 잘못되었으면 파일 전체를 보낸다.
+
+조건부 요청(RFC 7232)도 처리한다.
+    If-None-Match가 ETag와 맞거나, (If-None-Match가 없을 때)
+    If-Modified-Since 이후로 바뀌지 않았으면 -> 304, 본문 없음
+"""
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    # inode, 크기, 수정시각으로 만든 strong ETag
+    # 파일은 항상 교체(rename)로 저장되므로 내용이 바뀌면 inode가 바뀐다.
+    return '"{:x}-{:x}-{:x}"'.format(
+        stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    """
+    응답 내용을 결정하는 값들로 ETag를 만든다.
+
+    :param parts: 응답 내용을 결정하는 값
+    :param weak: 내용은 같아도 바이트 단위로 같다고 보장할 수 없으면 True
+    """
+    digest = hashlib.sha256(
+        '\0'.join(map(str, parts)).encode('utf-8')).hexdigest()[:32]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def validator_headers(etag: str, last_modified: Optional[float] = None) -> Dict[str, str]:
+    # 응답에 붙일 ETag, Last-Modified 헤더
+    headers = {'etag': etag}
+    if last_modified is not None:
+        headers['last-modified'] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(
+    request_headers: Mapping[str, str],
+    etag: str,
+    last_modified: Optional[float] = None,
+) -> bool:
+    """
+    조건부 요청에 대해 304를 보내도 되는 지 확인한다.
+    If-None-Match가 있으면 If-Modified-Since는 보지 않는다.
+
+    :param request_headers: 요청 헤더 (If-None-Match, If-Modified-Since)
+    :param etag: 현재 ETag
+    :param last_modified: 현재 수정 시각 (timestamp)
+    """
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        # weak 비교
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if '*' in tags:
+            return True
+        opaque = etag[2:] if etag.startswith('W/') else etag
+        return any((tag[2:] if tag.startswith('W/') else tag) == opaque for tag in tags)
+
+    if_modified_since = request_headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        # HTTP 날짜는 초 단위
+        return int(last_modified) \
+            <= int(parsedate_to_datetime(if_modified_since).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return False
+
+
+def parse_range(header: str, size: int, max_ranges: int = 16) \
+        -> Optional[List[Tuple[int, int]]]:
+    """
+    Range 헤더를 (start, end) 구간 리스트로 변환한다. end는 포함.
+    겹치거나 맞닿은 구간은 하나로 합친다.
+
+    :param header: Range 헤더 값
+    :param size: 파일 크기
+    :param max_ranges: 허용하는 최대 구간 수
+    :return: 형식이 잘못되었거나 구간이 너무 많으면 None (Range 무시),
+             만족하는 구간이 하나도 없으면 빈 리스트 (416)
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs.strip():
+        return None
+    specs = specs.split(',')
+    if len(specs) > max_ranges:
+        return None
+
+    ranges = []
+    for spec in specs:
+        first, sep, last = spec.strip().partition('-')
+        if not sep or not (first or last):
+            return None
+        if not all(v.isascii() and v.isdigit() for v in (first or '0', last or '0')):
+            return None
+        if not first:
+            # suffix: 마지막 n 바이트
+            length = int(last)
+            if length > 0 and size > 0:
+                ranges.append((max(size - length, 0), size - 1))
+            continue
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _open_file(path: str) -> BinaryIO:
+    return open(path, 'rb', buffering=0)
+
+
+def _pread(f: BinaryIO, length: int, offset: int) -> bytes:
+    if hasattr(f, 'pread'):
+        return f.pread(length, offset)
+    return os.pread(f.fileno(), length, offset)
+
+
+class RangeFileResponse(FileResponse):
+    """
+    Range 요청과 조건부 요청을 지원하는 FileResponse
+
+    파일을 먼저 열고 열린 파일 기준으로 stat과 읽기를 하기 때문에
+    전송 도중 파일이 교체되어도 처음 연 파일을 끝까지 일관되게 보낸다.
+    ASGI에는 sendfile 경로가 없으므로 threadpool에서 os.pread로 읽는다.
+
+    :param path: 파일 루트
+    :param request_headers: 요청 헤더 (Range, If-Range, If-None-Match, If-Modified-Since)
+    :param headers: 응답 헤더, etag가 있으면 열린 파일과 같을 때만 digest를 보낸다.
+    :param opener: 파일을 여는 함수, 리턴한 객체에 size와 pread가 있으면
+                   fstat 크기와 os.pread 대신 사용한다. (청크 저장소의 매니페스트)
+    """
+    chunk_size = 256 * 1024
+    max_ranges = 16
+
+    def __init__(
+        self,
+        path: str,
+        request_headers: Optional[Mapping[str, str]] = None,
+        opener: Optional[Callable[[str], BinaryIO]] = None,
+        **kwargs,
+    ):
+        super().__init__(path, **kwargs)
+        request_headers = request_headers or {}
+        self.opener = opener or _open_file
+        self.request_headers = request_headers
+        self.range_header = request_headers.get('range')
+        self.if_range = request_headers.get('if-range')
+
+    def _if_range_matches(self, etag: str, stat_result: os.stat_result) -> bool:
+        if self.if_range is None:
+            return True
+        if_range = self.if_range.strip()
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            # weak ETag는 If-Range에 쓸 수 없다.
+            return if_range == etag
+        try:
+            return int(parsedate_to_datetime(if_range).timestamp()) \
+                == int(stat_result.st_mtime)
+        except (TypeError, ValueError, IndexError):
+            return False
+
+    async def _send_file(self, send: Send, f: BinaryIO, start: int, end: int, more_body: bool):
+        # [start, end] 구간을 chunk_size 단위로 전송
+        offset = start
+        while offset <= end:
+            length = min(self.chunk_size, end - offset + 1)
+            chunk = await anyio.to_thread.run_sync(_pread, f, length, offset)
+            if not chunk:
+                raise RuntimeError(f'File at path {self.path} is truncated.')
+            offset += len(chunk)
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': more_body or offset <= end,
+            })
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            f = await anyio.to_thread.run_sync(self.opener, self.path)
+        except FileNotFoundError:
+            raise RuntimeError(f'File at path {self.path} does not exist.')
+        try:
+            stat_result = os.fstat(f.fileno())
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError(f'File at path {self.path} is not a file.')
+            await self._respond(send, f, stat_result)
+        finally:
+            f.close()
+        if self.background is not None:
+            await self.background()
+
+    async def _respond(self, send: Send, f: BinaryIO, stat_result: os.stat_result):
+        size = getattr(f, 'size', stat_result.st_size)
+        etag = file_etag(stat_result)
+        if self.headers.get('etag', etag) != etag and 'digest' in self.headers:
+            # 체크섬을 구한 뒤에 파일이 교체됨
+            del self.headers['digest']
+        self.headers['etag'] = etag
+        self.headers['last-modified'] = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers['accept-ranges'] = 'bytes'
+
+        if self.status_code == 200 \
+                and is_not_modified(self.request_headers, etag, stat_result.st_mtime):
+            # 바뀌지 않았으면 파일을 읽지 않는다
+            self.status_code = 304
+            for key in ('content-type', 'content-length', 'content-disposition'):
+                if key in self.headers:
+                    del self.headers[key]
+            await self._start(send)
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return
+
+        ranges = None
+        if self.range_header is not None \
+                and self.status_code == 200 \
+                and self._if_range_matches(etag, stat_result):
+            ranges = parse_range(self.range_header, size, self.max_ranges)
+
+        if ranges is None:
+            # 파일 전체
+            self.headers['content-length'] = str(size)
+            await self._start(send)
+            if self.send_header_only or size == 0:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            else:
+                await self._send_file(send, f, 0, size - 1, False)
+        elif not ranges:
+            # 범위를 만족하지 못함
+            self.status_code = 416
+            self.headers['content-range'] = f'bytes */{size}'
+            self.headers['content-length'] = '0'
+            await self._start(send)
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self.headers['content-range'] = f'bytes {start}-{end}/{size}'
+            self.headers['content-length'] = str(end - start + 1)
+            await self._start(send)
+            if self.send_header_only:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            else:
+                await self._send_file(send, f, start, end, False)
+        else:
+            # multipart/byteranges
+            boundary = uuid.uuid4().hex
+            content_type = self.headers['content-type']
+            parts = [
+                (
+                    (f'--{boundary}\r\n'
+                     f'Content-Type: {content_type}\r\n'
+                     f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('latin-1'),
+                    start, end,
+                )
+                for start, end in ranges
+            ]
+            closing = f'--{boundary}--\r\n'.encode('latin-1')
+            self.status_code = 206
+            self.headers['content-type'] = f'multipart/byteranges; boundary={boundary}'
+            self.headers['content-length'] = str(
+                sum(len(head) + end - start + 1 + 2 for head, start, end in parts)
+                + len(closing))
+            await self._start(send)
+            if self.send_header_only:
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                return
+            for head, start, end in parts:
+                await send({'type': 'http.response.body', 'body': head, 'more_body': True})
+                await self._send_file(send, f, start, end, True)
+                await send({'type': 'http.response.body', 'body': b'\r\n', 'more_body': True})
+            await send({'type': 'http.response.body', 'body': closing, 'more_body': False})
+
+    async def _start(self, send: Send):
+        await send({
+            'type': 'http.response.start',
+            'status': self.status_code,
+            'headers': self.raw_headers,
+        })
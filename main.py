@@ -22,6 +22,11 @@ DatabaseGenerator.load(db_type=DATABASE['type'], **DATABASE['data'])
 from core.init import init_app
 app: FastAPI = init_app()
 
+from apps.storage.utils.checksums import backfill_checksums
+from apps.storage.utils.queries.data_db_query import DataDBQuery
+from apps.upload.utils.queries import UploadSessionQuery, UploadSessionSweeper
+from apps.user.utils.queries.user_db_query import UserDBQuery
+
 if __name__ == '__main__':
     """
     COMMAND LIST
@@ -33,6 +38,9 @@ if __name__ == '__main__':
         - dev: For Development
         - prod: For Deploy
     clean: remove ALL Data of database and storage
+    backfill-checksums: compute checksums of files uploaded before checksums
+    sweep-uploads: remove expired upload sessions of all users
+    reconcile-usage: recompute users' used bytes and directory sizes from the sizes of their files
     """
 
     # Parser 생성
@@ -42,7 +50,8 @@ if __name__ == '__main__':
         metavar='method', 
         type=str, 
         help='Operation of running app',
-        choices=['run-app', 'migrate', 'clean'],
+        choices=['run-app', 'migrate', 'clean', 'backfill-checksums', 'reconcile-usage',
+                 'sweep-uploads'],
         required=True
     )
     parser.add_argument(
@@ -88,6 +97,8 @@ if __name__ == '__main__':
             allow_methods=['*'],
             allow_headers=['token'],
         )
+        # 만료된 업로드 세션 정리
+        UploadSessionSweeper.start()
         uvicorn.run(app, host='0.0.0.0', port=SERVER['port'])
 
     elif args.method == 'migrate':
@@ -106,3 +117,20 @@ if __name__ == '__main__':
         elif args.type == 'dev':
             Bootloader.remove_storage()
             Bootloader.remove_database()
+    elif args.method == 'backfill-checksums':
+        # 체크섬이 없는 파일들의 체크섬 계산
+        Bootloader.migrate_database()
+        updated, skipped = backfill_checksums()
+        print(f'checksums: {updated} updated, {skipped} skipped')
+    elif args.method == 'sweep-uploads':
+        # 만료된 업로드 세션 삭제
+        print(f'upload sessions: {UploadSessionQuery().sweep_all()} removed')
+    elif args.method == 'reconcile-usage':
+        # 사용자별 사용량을 파일 크기의 합으로 다시 맞춤
+        Bootloader.migrate_database()
+        fixed = UserDBQuery().reconcile_usage()
+        for user_id, used in fixed.items():
+            print(f'user {user_id}: used_bytes was {used}')
+        print(f'usage: {len(fixed)} users fixed')
+        # 디렉토리 집계 (하위 데이터 수, 파일 수, 크기)
+        print(f'directories: {DataDBQuery().rebuild_aggregates()} fixed')
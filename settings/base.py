@@ -16,12 +16,53 @@ def _get_database_info():
             'passwd': os.getenv('DB_PASSWD'),
         }
 
+# 파일 저장 시 fsync 정책 (apps/storage/utils/durability.py)
+DURABILITY_NONE = 'none'
+DURABILITY_ON_CLOSE = 'on-close'
+DURABILITY_GROUP_COMMIT = 'group-commit'
+DURABILITY_MODES = (DURABILITY_NONE, DURABILITY_ON_CLOSE, DURABILITY_GROUP_COMMIT)
+
+# 파일 저장 방식 (apps/storage/utils/chunk_store.py)
+STORAGE_BACKENDS = ('files', 'chunks')
+
+def _get_choice(name: str, default: str, choices: tuple) -> str:
+    # 정해진 값 중 하나만 허용, 잘못된 값은 서버 실행 전에 막는다.
+    value = os.getenv(name, default)
+    if value not in choices:
+        raise ValueError(f'{name} must be one of {", ".join(choices)}: {value}')
+    return value
+
 SERVER = {
     'host': os.getenv('SERVER_HOST'),
     'port': int(os.getenv('SERVER_PORT')),
     'storage': os.getenv('SERVER_STORAGE') + '/cloudmodular',
     'data-shared-length': int(os.getenv('DATA_SHARED_LENGTH')) * 24 * 60,
     'maximum-upload-size': int(os.getenv('MAX_UPLOAD_LEN')),
+    'upload-buffer-size': int(os.getenv('UPLOAD_BUFFER_SIZE', 1024)) * 1024,
+    'upload-session-length': int(os.getenv('UPLOAD_SESSION_LENGTH', 24 * 60)),
+    # 만료된 업로드 세션을 지우는 주기 (분)
+    'upload-sweep-interval': int(os.getenv('UPLOAD_SWEEP_INTERVAL', 60)),
+    # 파일 저장 시 fsync 정책 (none, on-close, group-commit)
+    'storage-durability': _get_choice(
+        'STORAGE_DURABILITY', DURABILITY_ON_CLOSE, DURABILITY_MODES),
+    # group-commit에서 교체 요청을 모으는 시간 (ms)
+    'storage-group-commit-interval': int(os.getenv('STORAGE_GROUP_COMMIT_INTERVAL', 10)),
+    # 디렉토리 다운로드 압축 레벨 (0 ~ 9), 0이면 압축하지 않는다.
+    'archive-compress-level': int(os.getenv('ARCHIVE_COMPRESS_LEVEL', 6)),
+    # 디렉토리 다운로드 하나가 동시에 쓸 수 있는 압축 스레드 수, 1이면 한 스레드에서 압축한다.
+    'archive-workers': int(os.getenv('ARCHIVE_WORKERS', min(4, os.cpu_count() or 1))),
+    # 디렉토리 압축 캐시 용량 (MB), 0이면 캐시하지 않는다.
+    'archive-cache-size': int(os.getenv('ARCHIVE_CACHE_SIZE', 1024)) * 1024 * 1024,
+    # 업로드 시 sha256과 함께 adler32도 계산할 지 여부
+    'checksum-fast': os.getenv('CHECKSUM_FAST', 'false').lower() == 'true',
+    # 파일 저장 방식 (files, chunks), chunks는 같은 내용의 청크를 한번만 저장한다.
+    'storage-backend': _get_choice('STORAGE_BACKEND', 'files', STORAGE_BACKENDS),
+    # chunks 저장 방식의 평균 청크 크기 (KB)
+    'chunk-avg-size': int(os.getenv('CHUNK_AVG_SIZE', 1024)) * 1024,
+    # 복사할 크기의 합이 이 값(MB)을 넘으면 백그라운드 작업으로 복사한다.
+    'copy-background-size': int(os.getenv('COPY_BACKGROUND_SIZE', 256)) * 1024 * 1024,
+    # 복사할 하위 데이터가 이 개수를 넘어도 백그라운드 작업으로 복사한다.
+    'copy-background-entries': int(os.getenv('COPY_BACKGROUND_ENTRIES', 1000)),
 }
 DATABASE = {
     'type': os.getenv('DB_TYPE'),
@@ -40,7 +40,11 @@ class Bootloader:
         """
         모든 스토리지들을 삭제한다.
         """
+        from apps.upload.utils.queries import UploadSessionQuery
+
         shutil.rmtree(SERVER['storage'])
+        # 지운 업로드 세션들의 용량 예약 해제
+        UploadSessionQuery().release_all()
 
     @staticmethod
     def migrate_database():
@@ -53,10 +57,52 @@ class Bootloader:
         from apps.tag.models import Tag
         from apps.data_tag.models import DataTag
         from apps.share.models import DataShared
+        from system.migrations import migrate
 
         Base = DatabaseGenerator.get_base()
         db_engine = DatabaseGenerator.get_engine()
         Base.metadata.create_all(db_engine)
+        Bootloader.add_missing_columns(Base, db_engine)
+        Bootloader.add_missing_indexes(Base, db_engine)
+        # 데이터 수정, 제약조건 추가 등 버전별 마이그레이션 (system/migrations.py)
+        migrate(db_engine)
+
+    @staticmethod
+    def add_missing_columns(Base, db_engine):
+        """
+        이미 생성된 테이블에 모델에 새로 추가된 컬럼을 추가한다.
+        create_all은 없는 테이블만 생성하기 때문에 기존 DB를 쓰는 경우 필요하다.
+        추가된 컬럼은 기존 데이터에 대해 NULL로 채워진다.
+        """
+        from sqlalchemy import inspect, text
+
+        inspector = inspect(db_engine)
+        quote = db_engine.dialect.identifier_preparer.quote
+        with db_engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                exists = {c['name'] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in exists:
+                        continue
+                    column_type = column.type.compile(dialect=db_engine.dialect)
+                    conn.execute(text(
+                        f'ALTER TABLE {quote(table.name)} '
+                        f'ADD COLUMN {quote(column.name)} {column_type}'))
+
+    @staticmethod
+    def add_missing_indexes(Base, db_engine):
+        """
+        이미 생성된 테이블에 모델에 새로 추가된 인덱스를 생성한다.
+        """
+        from sqlalchemy import inspect
+
+        inspector = inspect(db_engine)
+        with db_engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                exists = {i['name'] for i in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in exists:
+                        index.create(conn)
 
     @staticmethod
     def remove_database():
@@ -70,16 +116,20 @@ class Bootloader:
             os.remove('data.db')
         else:
             from apps.user.models import User
-            from apps.storage.models import DataInfo
+            from apps.storage.models import DataChunk, DataClosure, DataInfo
             from apps.tag.models import Tag
             from apps.data_tag.models import DataTag
             from apps.share.models import DataShared
+            from system.migrations import SchemaVersion
             
             session = DatabaseGenerator.get_session()
             session.query(DataShared).filter(DataShared.id >= 0).delete()
             session.query(DataTag).filter(DataTag.id >= 0).delete()
             session.query(Tag).filter(Tag.id >= 0).delete()
+            session.query(DataClosure).delete()
             session.query(DataInfo).filter(DataInfo.id >= 0).delete()
+            session.query(DataChunk).delete()
+            session.query(SchemaVersion).delete()
             session.query(User).filter(User.id >= 0).delete()
             session.commit()
 
@@ -1,3 +1,5 @@
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, sqlite
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.orm.decl_api import DeclarativeMeta
 from sqlalchemy.orm.session import sessionmaker
@@ -8,7 +10,7 @@ from architecture.system.generator import (
     RDBGenerator, 
     SQLiteGenerator
 )
-from typing import Dict, Type
+from typing import Dict, Type, Union
 
 
 class DatabaseGenerator:
@@ -42,4 +44,17 @@ class DatabaseGenerator:
     def get_session() -> sessionmaker:
         return DatabaseGenerator._get_gen().get_session()
 
-
+    @staticmethod
+    def insert_ignore(table: Union[Table, DeclarativeMeta]):
+        """
+        유니크 제약조건에 걸리는 행은 무시하는 INSERT
+        키 충돌만 무시하고 다른 오류(NOT NULL, 길이 초과 등)는 그대로 발생한다.
+        무시된 경우 결과의 rowcount가 0이거나 inserted_primary_key가 비어있다.
+        (mysql은 FOUND_ROWS 연결 옵션 때문에 바뀐 값이 없어도 rowcount가 1일 수 있다.)
+            sqlite: INSERT ... ON CONFLICT DO NOTHING
+            mysql, mariadb: INSERT ... ON DUPLICATE KEY UPDATE id = id
+        """
+        if DatabaseGenerator.db == 'sqlite':
+            return sqlite.insert(table).on_conflict_do_nothing()
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update(id=stmt.table.c.id)
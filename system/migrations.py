@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, String, inspect, text
+from sqlalchemy.engine.base import Engine
+
+from system.connection.generators import DatabaseGenerator
+
+"""
+버전별 DB 마이그레이션
+
+create_all은 없는 테이블만 만들고 add_missing_columns/indexes는 추가만 하므로
+기존 데이터를 고치거나 제약조건을 추가하는 작업은 여기에 버전 순서대로 등록한다.
+적용한 버전은 schema_version 테이블에 기록하고 각 버전은 한번만 실행한다.
+
+새 DB는 create_all로 이미 최신 스키마지만 마이그레이션은 똑같이 실행되므로
+이미 적용된 상태에서 실행해도 문제가 없어야 한다.
+"""
+
+Base = DatabaseGenerator.get_base()
+
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(255), nullable=False)
+    applied = Column(DateTime(timezone=True), default=datetime.now)
+
+
+# (버전, 이름, 함수)
+MIGRATIONS: List[Tuple[int, str, Callable[[Engine], None]]] = []
+
+
+def migration(version: int, name: str):
+    """
+    마이그레이션 등록, 버전은 마지막 버전보다 커야 한다.
+    """
+    def register(func: Callable[[Engine], None]):
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError('migration version must increase')
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+
+def current_version() -> int:
+    session = DatabaseGenerator.get_session()
+    try:
+        return session.query(SchemaVersion.version) \
+            .order_by(SchemaVersion.version.desc()).limit(1).scalar() or 0
+    finally:
+        session.close()
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    적용하지 않은 마이그레이션을 버전 순서대로 실행한다.
+
+    :return: 이번에 적용한 버전
+    """
+    applied = []
+    version = current_version()
+    for target, name, func in MIGRATIONS:
+        if target <= version:
+            continue
+        func(engine)
+        session = DatabaseGenerator.get_session()
+        try:
+            session.add(SchemaVersion(version=target, name=name))
+            session.commit()
+        finally:
+            session.close()
+        applied.append(target)
+    return applied
+
+
+def _create_unique_index(engine: Engine, table: str, name: str, columns: List[str]):
+    # 모델에 UniqueConstraint로 정의된 제약조건을 기존 테이블에 추가한다.
+    # SQLite는 ALTER TABLE ADD CONSTRAINT가 없으므로 같은 역할의 유니크 인덱스로 만든다.
+    inspector = inspect(engine)
+    exists = {c['name'] for c in inspector.get_unique_constraints(table)} \
+        | {i['name'] for i in inspector.get_indexes(table)}
+    if name in exists:
+        return
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        conn.execute(text(
+            f'CREATE UNIQUE INDEX {quote(name)} ON {quote(table)} '
+            f'({", ".join(quote(column) for column in columns)})'))
+
+
+@migration(1, 'backfill datainfo root_prefix and parent_id')
+def _backfill_paths(engine: Engine):
+    from apps.storage.utils.queries.data_db_query import DataDBQuery
+    DataDBQuery().backfill_paths()
+
+
+@migration(2, 'build dataclosure')
+def _build_closure(engine: Engine):
+    from apps.storage.utils.queries.data_db_query import DataDBQuery
+    DataDBQuery().backfill_closure()
+
+
+@migration(3, 'unique datainfo (user_id, parent_id, name)')
+def _unique_names(engine: Engine):
+    from apps.storage.utils.queries.data_db_query import DataDBQuery
+    # 같은 이름이 여러개면 유니크 인덱스를 만들 수 없으므로 먼저 정리한다.
+    DataDBQuery().dedupe_names()
+    _create_unique_index(
+        engine, 'datainfo', 'uq_datainfo_user_parent_name',
+        ['user_id', 'parent_id', 'name'])
+
+
+@migration(4, 'user used_bytes')
+def _used_bytes(engine: Engine):
+    from apps.user.utils.queries.user_db_query import UserDBQuery
+    # 이전 버전 DB는 used_bytes 컬럼이 비어있으므로 파일 크기의 합으로 채운다.
+    UserDBQuery().reconcile_usage()
+
+
+@migration(5, 'datainfo directory aggregates')
+def _directory_aggregates(engine: Engine):
+    from apps.storage.utils.queries.data_db_query import DataDBQuery
+    DataDBQuery().rebuild_aggregates()